@@ -0,0 +1,388 @@
+import argparse
+import json
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from badminton_game import (
+    MatchSimulator, Controller, GameRNG, Shuttlecock, rule_based_action, GAME_OVER, HIT_REACH,
+)
+from search_ai import LookaheadController
+from tournament import MAX_FRAMES
+
+# Adaptive difficulty. Telemetry keeps rolling player metrics during a match:
+# share of points won, rally length, and reaction time (how many frames later
+# than a flat-out sprint the player got within reach of a computer shot's
+# landing spot). After every point AdaptiveDifficulty looks up which
+# calibrated player skill those metrics match best at the AI levels the
+# recent points were played at, then moves the AI one level toward the one
+# that gives that skill an even match; a player doing better or worse than
+# every calibrated skill moves it a level up or down. The computer is the lookahead AI (search_ai.py); a
+# level sets its speed, how far it misreads each incoming shot (prediction
+# accuracy) and the window around its racket in which it plans to swing.
+# The rule-based AI is too weak at any setting to give a strong player a
+# match.
+#
+# The calibration curves come from headless matches played offline
+# (python adaptive.py --calibrate) between every AI level and a range of
+# stand-in players (SkillProxy: the rule-based AI at the player's speed,
+# reacting late and aiming loosely), so the online part is a handful of
+# table lookups per point. The stand-ins do not rank exactly in the order
+# of their handicaps (the three strongest trade places from level to
+# level), so each level's win rates are smoothed into a curve that never
+# falls as skill rises. Matches are deterministic given the calibration
+# file, so a replay re-runs the same adjustments - but only from the first
+# frame: the level, the telemetry window and the levels its points were
+# played at are in neither MatchSimulator snapshots nor the replay header,
+# so an adaptive match cannot be restored mid-way (no rollback) and its
+# replay needs the same calibration file.
+
+CALIBRATION_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "difficulty_calibration.json")
+CALIBRATION_MATCHES = 20  # Matches per (level, skill) pair
+TARGET_WIN_RATE = 0.5  # Share of points the player should win
+ROLLING_POINTS = 8  # Points the telemetry averages over
+MIN_POINTS = 3  # Points seen before the first adjustment
+# How far (share of points) beyond every calibrated skill's win rate the
+# player has to be before the level steps past them; over 8 points a
+# player level with the best stand-in is often a point or so above it
+RANGE_MARGIN = 0.15
+MAX_REACTION = 60  # Most frames one shot can count as lost
+# Spread of each metric, for weighing how far observed values are from the
+# table. One shot's reaction time can be off by tens of frames while the
+# stand-in skills are at most ~20 apart, so it only breaks near-ties.
+METRIC_SCALES = {"win_rate": 0.1, "rally": 1.0, "reaction": 16.0}
+
+DifficultySetting = namedtuple("DifficultySetting", "speed misjudge swing_window")
+# AI levels, easiest first, from a slow computer that misreads where the
+# shuttlecock is going by up to 390 px per second of flight to the
+# full-strength lookahead AI. Past the first few steps it outplays every
+# stand-in skill, so those steps are small and the last two are big.
+LEVELS = [DifficultySetting(2.75 + level / 4, 390 - 23 * level, 28 + level * 2)
+          for level in range(7)] + [DifficultySetting(5.5, 125, 50), DifficultySetting(7.0, 0, 60)]
+START_LEVEL = 3  # Even match for a middling stand-in
+
+SkillModel = namedtuple("SkillModel", "delay jitter")
+# Stand-in players for calibration, slowest to react first: frames they react
+# late by and their error (px) in where they run to
+SKILLS = [SkillModel(24, 60), SkillModel(16, 45), SkillModel(10, 35), SkillModel(6, 25),
+          SkillModel(3, 15), SkillModel(1, 8), SkillModel(0, 0)]
+
+
+class SkillProxy(Controller):
+    # Calibration stand-in for a human: the rule-based AI at the player's own
+    # speed, seeing the shuttlecock `delay` frames late
+    def __init__(self, skill, predictor=None, rng=None):
+        self.skill = skill
+        self.predictor = predictor
+        self.rng = rng if rng is not None else GameRNG()
+        self.seen = deque(maxlen=skill.delay + 1)
+
+    def reset(self):
+        self.seen.clear()
+
+    def act(self, observation):
+        self.seen.append(observation)
+        # Its own position is current, the shuttlecock is where it was
+        observation = observation[:9] + self.seen[0][9:]
+        return rule_based_action(observation, self.predictor, self.rng, self.skill.jitter)
+
+
+class Telemetry:
+    # Rolling metrics for the left player over the last `window` points
+    # (all of them for window=None). Call update() with every step's events.
+    def __init__(self, sim, window=ROLLING_POINTS):
+        self.sim = sim
+        self.points = deque(maxlen=window)  # (player won, rally length)
+        self.reactions = deque(maxlen=window)  # Frames lost getting to computer shots
+        self._landing = None  # Landing x of the computer shot being timed
+        self._frames = 0
+        self._sprint = 0.0  # Frames the player needs at full speed to reach it
+        self._scratch = Shuttlecock(GameRNG(0))
+
+    def _landing_x(self):
+        shuttle = self.sim.shuttlecock
+        if self.sim.predictor is not None:
+            return self.sim.predictor.predict(shuttle.x, shuttle.y, shuttle.vx, shuttle.vy)[0]
+        scratch = self._scratch
+        scratch.x, scratch.y, scratch.vx, scratch.vy = shuttle.x, shuttle.y, shuttle.vx, shuttle.vy
+        for _ in range(600):
+            if scratch.update():
+                break
+        return scratch.x
+
+    def _react(self):
+        self.reactions.append(min(MAX_REACTION, max(0.0, self._frames - self._sprint)))
+        self._landing = None
+
+    def update(self, events):
+        # Returns True when a point ended this step
+        sim = self.sim
+        racket_x = sim.player.reach_point()[0]
+        if self._landing is not None:
+            self._frames += 1
+            if abs(self._landing - racket_x) < HIT_REACH or self._frames - self._sprint >= MAX_REACTION:
+                self._react()
+
+        scored = False
+        for event in events:
+            if event.kind == "point":
+                if self._landing is not None:
+                    self._react()  # Did not get there in time
+                self.points.append((event.who is sim.player, sim.rally_count))
+                scored = True
+            elif event.who is sim.computer and (event.kind == "hit" or event.kind == "serve"):
+                # Shots that come straight to the player need no reaction
+                landing = self._landing_x()
+                distance = abs(landing - racket_x) - HIT_REACH
+                if distance > 0:
+                    self._landing = landing
+                    self._frames = 0
+                    self._sprint = distance / sim.player.speed
+        return scored
+
+    @property
+    def win_rate(self):
+        return sum(won for won, _ in self.points) / len(self.points) if self.points else None
+
+    @property
+    def rally(self):
+        return sum(length for _, length in self.points) / len(self.points) if self.points else None
+
+    @property
+    def reaction(self):
+        return sum(self.reactions) / len(self.reactions) if self.reactions else None
+
+
+class Calibration:
+    # Calibration curves, indexed [level][skill]: the player's share of
+    # points, mean rally length and mean reaction frames
+    def __init__(self, win_rate, rally, reaction):
+        if len(win_rate) != len(LEVELS) or any(len(row) != len(SKILLS) for row in win_rate):
+            raise ValueError("calibration does not match LEVELS and SKILLS; "
+                             "rerun python adaptive.py --calibrate")
+        self.win_rate = win_rate
+        self.rally = rally
+        self.reaction = reaction
+        # For each skill, the level that comes closest to an even match
+        self.best_level = [min(range(len(LEVELS)),
+                               key=lambda level: abs(win_rate[level][skill] - TARGET_WIN_RATE))
+                           for skill in range(len(SKILLS))]
+
+    def expected(self, curves, levels, skill):
+        # Mean of a calibrated metric for `skill` over points played at `levels`
+        return sum(curves[level][skill] for level in levels) / len(levels)
+
+    def estimate_skill(self, levels, telemetry):
+        # The skill whose calibrated metrics are nearest the observed ones,
+        # taken at the level each of the telemetry's points was played at
+        observed = {"win_rate": telemetry.win_rate, "rally": telemetry.rally,
+                    "reaction": telemetry.reaction}
+        curves = {"win_rate": self.win_rate, "rally": self.rally, "reaction": self.reaction}
+
+        def cost(skill):
+            return sum(((self.expected(curves[name], levels, skill) - value) / METRIC_SCALES[name]) ** 2
+                       for name, value in observed.items() if value is not None)
+        return min(range(len(SKILLS)), key=cost)
+
+    def to_json(self):
+        return {"levels": [list(level) for level in LEVELS], "skills": [list(skill) for skill in SKILLS],
+                "win_rate": self.win_rate, "rally": self.rally, "reaction": self.reaction}
+
+
+def load_calibration(path=CALIBRATION_PATH):
+    with open(path) as f:
+        data = json.load(f)
+    if (data["levels"] != [list(level) for level in LEVELS] or
+            data["skills"] != [list(skill) for skill in SKILLS]):
+        raise ValueError(f"{path} was made for other levels or skills; "
+                         "rerun python adaptive.py --calibrate")
+    return Calibration(data["win_rate"], data["rally"], data["reaction"])
+
+
+class AdaptiveDifficulty:
+    # Retunes sim's computer after every point; created by MatchSimulator
+    # for difficulty="adaptive". With adapt=False it holds `level` (for
+    # calibration) and needs no calibration data.
+    def __init__(self, sim, calibration=None, level=START_LEVEL, adapt=True):
+        self.sim = sim
+        self.adapt = adapt
+        if adapt and calibration is None:
+            calibration = load_calibration()
+        self.calibration = calibration
+        self.telemetry = Telemetry(sim)
+        self.point_levels = deque(maxlen=ROLLING_POINTS)  # Level each of the telemetry's points was played at
+        self.level = level
+        self.skill = None  # Estimated skill of the player (index into SKILLS)
+        self.history = [level]  # Level after each point
+        self.apply()
+
+    def apply(self, serving=False):
+        # The handicaps are for returns: the computer always gets its own
+        # serve (which starts in the air on its side) over the net
+        setting = LEVELS[self.level]
+        self.sim.computer.speed = setting.speed
+        controller = self.sim.computer_controller
+        controller.misjudge = 0 if serving else setting.misjudge
+        controller.swing_window = HIT_REACH if serving else setting.swing_window
+
+    def update(self, events):
+        computer = self.sim.computer
+        for event in events:
+            if event.who is computer and (event.kind == "serve" or event.kind == "hit"):
+                self.apply(serving=event.kind == "serve")
+        if not self.telemetry.update(events):
+            return
+        self.point_levels.append(self.level)
+        if not self.adapt or len(self.telemetry.points) < MIN_POINTS:
+            return
+        # Judged against the levels the points were played at: right after
+        # a change most of them are still from the level before
+        calibration = self.calibration
+        levels = self.point_levels
+        self.skill = calibration.estimate_skill(levels, self.telemetry)
+        target = calibration.best_level[self.skill]
+        # Win rates rise with skill, so the weakest and strongest stand-ins
+        # bound the calibrated range
+        win_rate = self.telemetry.win_rate
+        if win_rate < calibration.expected(calibration.win_rate, levels, 0) - RANGE_MARGIN:
+            target = self.level - 1
+        elif win_rate > calibration.expected(calibration.win_rate, levels, len(SKILLS) - 1) + RANGE_MARGIN:
+            target = self.level + 1
+        step = (target > self.level) - (target < self.level)
+        self.level = min(max(self.level + step, 0), len(LEVELS) - 1)
+        self.apply()
+        self.history.append(self.level)
+
+
+def _init_worker(use_table):
+    # Build the landing table once per worker process rather than per cell
+    if use_table:
+        from trajectory import get_landing_table
+        get_landing_table()
+
+
+def play_cell(level, skill, matches, seed, use_table=True, adaptive=False, calibration=None):
+    # Totals for `matches` matches of SKILLS[skill] against the AI at
+    # LEVELS[level] (or the adaptive AI starting from that level)
+    predictor = None
+    if use_table:
+        from trajectory import get_landing_table
+        predictor = get_landing_table()
+    seeds = GameRNG(seed)
+    totals = {"points": 0, "won": 0, "rally": 0, "reactions": 0, "reaction": 0, "levels": 0}
+    for _ in range(matches):
+        proxy = SkillProxy(SKILLS[skill], predictor, GameRNG(seeds.next64()))
+        if adaptive:
+            sim = MatchSimulator(predictor=predictor, seed=seeds.next64(), player_controller=proxy,
+                                 difficulty="adaptive", calibration=calibration)
+            sim.adaptive.level = level
+            sim.adaptive.apply()
+        else:
+            computer = LookaheadController(predictor, GameRNG(seeds.next64()), budget=None)
+            sim = MatchSimulator(predictor=predictor, seed=seeds.next64(), player_controller=proxy,
+                                 computer_controller=computer)
+            sim.adaptive = AdaptiveDifficulty(sim, level=level, adapt=False)
+        telemetry = Telemetry(sim, window=None)
+        while sim.game_state != GAME_OVER and sim.frame < MAX_FRAMES:
+            telemetry.update(sim.step())
+        totals["points"] += len(telemetry.points)
+        totals["won"] += sum(won for won, _ in telemetry.points)
+        totals["rally"] += sum(length for _, length in telemetry.points)
+        totals["reactions"] += len(telemetry.reactions)
+        totals["reaction"] += sum(telemetry.reactions)
+        if adaptive:
+            totals["levels"] += sim.adaptive.level
+    return level, skill, totals
+
+
+def monotone(values, weights):
+    # Closest non-decreasing sequence to values in the weighted least-squares
+    # sense (pool adjacent violators): runs that go down are replaced by
+    # their weighted mean
+    blocks = []  # [mean, weight, length]
+    for value, weight in zip(values, weights):
+        blocks.append([value, weight, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            mean, weight, length = blocks.pop()
+            last = blocks[-1]
+            total = last[1] + weight
+            last[0] = (last[0] * last[1] + mean * weight) / total if total else (last[0] + mean) / 2
+            last[1] = total
+            last[2] += length
+    return [mean for mean, _, length in blocks for _ in range(length)]
+
+
+def calibrate(matches=CALIBRATION_MATCHES, workers=None, seed=0, use_table=True, progress=None):
+    master = GameRNG(seed)
+    cells = [(level, skill, master.next64()) for level in range(len(LEVELS)) for skill in range(len(SKILLS))]
+    win_rate = [[0.0] * len(SKILLS) for _ in LEVELS]
+    points = [[0] * len(SKILLS) for _ in LEVELS]
+    rally = [[0.0] * len(SKILLS) for _ in LEVELS]
+    reaction = [[0.0] * len(SKILLS) for _ in LEVELS]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(use_table,)) as pool:
+        futures = [pool.submit(play_cell, level, skill, matches, cell_seed, use_table)
+                   for level, skill, cell_seed in cells]
+        for done, future in enumerate(futures, 1):
+            level, skill, totals = future.result()
+            points[level][skill] = totals["points"]
+            win_rate[level][skill] = totals["won"] / max(1, totals["points"])
+            rally[level][skill] = round(totals["rally"] / max(1, totals["points"]), 4)
+            reaction[level][skill] = round(totals["reaction"] / max(1, totals["reactions"]), 4)
+            if progress is not None:
+                progress(done, len(cells))
+    # Better players win more points; what is left over is noise and quirks
+    # of the stand-ins
+    win_rate = [[round(value, 4) for value in monotone(row, weights)]
+                for row, weights in zip(win_rate, points)]
+    return Calibration(win_rate, rally, reaction)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate and check the adaptive difficulty")
+    parser.add_argument("--calibrate", action="store_true",
+                        help=f"play every level against every stand-in skill and write {CALIBRATION_PATH}")
+    parser.add_argument("--matches", type=int, default=CALIBRATION_MATCHES,
+                        help="matches per level and skill (default %(default)s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--seed", type=int, default=0, help="master seed (default %(default)s)")
+    parser.add_argument("--output", default=CALIBRATION_PATH, help="calibration file to write or read")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.calibrate:
+        def progress(done, total):
+            print(f"\r{done}/{total} cells", end="", flush=True)
+        calibration = calibrate(args.matches, args.workers, args.seed, progress=progress)
+        print()
+        data = dict(calibration.to_json(), matches=args.matches, seed=args.seed)
+        with open(args.output, "w") as f:
+            # One line per table, small enough to diff
+            f.write("{\n" + ",\n".join(f"  {json.dumps(key)}: {json.dumps(value)}"
+                                        for key, value in data.items()) + "\n}\n")
+        print(f"wrote {args.output} in {time.perf_counter() - start:.0f}s")
+    else:
+        calibration = load_calibration(args.output)
+
+    print("player win rate by AI level (rows) and stand-in skill (columns)")
+    for level, row in enumerate(calibration.win_rate):
+        print(f"{level:>5} " + " ".join(f"{value:6.1%}" for value in row))
+    print("level for an even match: " + " ".join(map(str, calibration.best_level)))
+
+    if not args.calibrate:
+        # Adaptive AI against each stand-in, starting from the middle level
+        print(f"{'skill':>5} {'fixed level':>12} {'adaptive':>9} {'end level':>10}")
+        for skill in range(len(SKILLS)):
+            _, _, fixed = play_cell(START_LEVEL, skill, args.matches, args.seed)
+            _, _, adapted = play_cell(START_LEVEL, skill, args.matches, args.seed,
+                                      adaptive=True, calibration=calibration)
+            print(f"{skill:>5} {fixed['won'] / max(1, fixed['points']):>12.1%} "
+                  f"{adapted['won'] / max(1, adapted['points']):>9.1%} "
+                  f"{adapted['levels'] / args.matches:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+import argparse
+import array
+import json
+import math
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from badminton_game import (
+    MatchSimulator, GameRNG, GAME_OVER, NET_X, COURT_LEFT, COURT_RIGHT, FLOOR_Y, winning_score,
+)
+from tournament import MAX_FRAMES, rally_percentile
+
+# Match statistics. ShotRecorder turns a match's step() events into one row
+# per shot (serves included), ShotWriter appends the rows to a columnar file
+# in blocks, and ShotAggregator streams such files back block by block into
+# hit heatmaps, landing histograms and rally-length distributions, so memory
+# stays at one block plus the fixed-size tables however many shots there are.
+#
+# File layout (little endian):
+#
+#   header  "BMSH", version u16, column count u8, then for each column its
+#           name (length u8, ASCII) and array typecode (1 byte)
+#   blocks  row count u32, then each column's values back to back
+#
+# Writers append blocks to an existing file with the same columns, so game
+# sessions and batch runs can keep adding to one file. A block is written in
+# one piece; a reader ignores a truncated block at the end (a writer that was
+# killed mid-write).
+
+MAGIC = b"BMSH"
+VERSION = 1
+BLOCK_ROWS = 65536  # Rows buffered before a block is written
+SHOT_COLUMNS = (
+    ("match", "Q"),  # Seed of the match
+    ("frame", "I"),  # Simulation frame of the shot
+    ("side", "B"),  # 0 for the left player, 1 for the right
+    ("serve", "B"),
+    ("smash", "B"),  # Hit in the air
+    ("hit_x", "f"),  # last_hit_pos
+    ("hit_y", "f"),
+    ("vx", "f"),  # Shuttlecock velocity after the hit
+    ("vy", "f"),
+    ("landing_x", "f"),  # Where the shot hit the floor, NaN if it was returned
+    ("rally", "H"),  # Length of the rally the shot was part of (rally_count at the point)
+)
+_DTYPES = {"B": "u1", "H": "<u2", "I": "<u4", "Q": "<u8", "f": "<f4", "d": "<f8"}
+_BLOCK = struct.Struct("<I")
+
+HEATMAP_CELL = 25  # Pixels per heatmap cell, both ways
+MAX_RALLY = 1000  # Longer rallies are counted as this long
+_HEAT_X = (COURT_RIGHT - COURT_LEFT + HEATMAP_CELL - 1) // HEATMAP_CELL
+_HEAT_Y = (FLOOR_Y + HEATMAP_CELL - 1) // HEATMAP_CELL
+
+
+def _header(columns):
+    out = bytearray(MAGIC)
+    out += struct.pack("<HB", VERSION, len(columns))
+    for name, code in columns:
+        out += struct.pack("<B", len(name)) + name.encode("ascii") + code.encode("ascii")
+    return bytes(out)
+
+
+class ShotWriter:
+    # Buffered, append-only columnar writer: append() adds a row to one
+    # array per column and every block_rows rows the arrays go to the file
+    # as one block
+    def __init__(self, path, columns=SHOT_COLUMNS, block_rows=BLOCK_ROWS):
+        self.path = path
+        self.columns = columns
+        self.block_rows = block_rows
+        self.rows = 0  # Rows buffered
+        self.written = 0  # Rows in blocks written by this writer
+        self._new_buffers()
+        header = _header(columns)
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                if f.read(len(header)) != header:
+                    raise ValueError(f"{path} is not a shot file with these columns")
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "wb")
+            self.file.write(header)
+
+    def _new_buffers(self):
+        self.buffers = [array.array(code) for _, code in self.columns]
+
+    def append(self, row):
+        for buffer, value in zip(self.buffers, row):
+            buffer.append(value)
+        self.rows += 1
+        if self.rows >= self.block_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        parts = [_BLOCK.pack(self.rows)]
+        for buffer in self.buffers:
+            if sys.byteorder == "big":
+                buffer.byteswap()
+            parts.append(buffer.tobytes())
+        self.file.write(b"".join(parts))
+        self.file.flush()
+        self.written += self.rows
+        self.rows = 0
+        self._new_buffers()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_blocks(path):
+    # Yield each block of a shot file as {column name: NumPy array}
+    with open(path, "rb") as f:
+        magic = f.read(4)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a shot file")
+        version, count = struct.unpack("<HB", f.read(3))
+        if version != VERSION:
+            raise ValueError(f"unsupported shot file version {version}")
+        columns = []
+        for _ in range(count):
+            length = f.read(1)[0]
+            name = f.read(length).decode("ascii")
+            columns.append((name, np.dtype(_DTYPES[f.read(1).decode("ascii")])))
+        row_size = sum(dtype.itemsize for _, dtype in columns)
+        while True:
+            head = f.read(_BLOCK.size)
+            if len(head) < _BLOCK.size:
+                return
+            rows, = _BLOCK.unpack(head)
+            data = f.read(rows * row_size)
+            if len(data) < rows * row_size:
+                return  # Truncated block
+            block = {}
+            offset = 0
+            for name, dtype in columns:
+                block[name] = np.frombuffer(data, dtype, rows, offset)
+                offset += rows * dtype.itemsize
+            yield block
+
+
+class ShotRecorder:
+    # Feeds a match's shots to a writer: call record() with the events of
+    # every step. A rally's shots are held until it ends, when its length
+    # and where the last shot landed are known. In a drill, where several
+    # shuttlecocks are in the air, a landing ends all the shots since the
+    # previous one.
+    def __init__(self, sim, writer):
+        self.sim = sim
+        self.writer = writer
+        self.rally = []  # Rows of the rally in progress
+        self.shots = 0
+
+    def record(self, events):
+        for event in events:
+            if event.kind == "hit" or event.kind == "serve":
+                self.rally.append([self.sim.seed, self.sim.frame, int(event.who.is_computer),
+                                   event.kind == "serve", event.smash, event.x, event.y,
+                                   event.vx, event.vy, math.nan, 0])
+            elif event.kind == "floor" and self.rally:
+                rally = self.rally
+                rally[-1][9] = event.x
+                length = min(sum(not row[3] for row in rally), 0xFFFF)
+                for row in rally:
+                    row[10] = length
+                    self.writer.append(row)
+                self.shots += len(rally)
+                self.rally = []
+
+
+class ShotAggregator:
+    # Running totals over any number of shot blocks, in fixed-size arrays
+    # indexed by side (0 left, 1 right)
+    def __init__(self):
+        self.shots = np.zeros(2, dtype=np.int64)
+        self.smashes = np.zeros(2, dtype=np.int64)
+        self.winners = np.zeros(2, dtype=np.int64)  # Shots that landed on the other side
+        self.errors = np.zeros(2, dtype=np.int64)  # Shots that landed on the hitter's side
+        self.smash_winners = np.zeros(2, dtype=np.int64)
+        self.hits = np.zeros((2, _HEAT_X, _HEAT_Y), dtype=np.int64)  # Where shots were hit
+        self.landings = np.zeros((2, _HEAT_X), dtype=np.int64)  # Where rally-ending shots landed
+        self.rallies = np.zeros(MAX_RALLY + 1, dtype=np.int64)  # Rally length histogram
+
+    def add(self, block):
+        side = block["side"].astype(np.intp)
+        smash = block["smash"].astype(bool)
+        landing = block["landing_x"]
+        ended = ~np.isnan(landing)
+        won = ended & ((landing > NET_X) == (side == 0))
+        self.shots += np.bincount(side, minlength=2)
+        self.smashes += np.bincount(side[smash], minlength=2)
+        self.winners += np.bincount(side[won], minlength=2)
+        self.errors += np.bincount(side[ended & ~won], minlength=2)
+        self.smash_winners += np.bincount(side[won & smash], minlength=2)
+
+        cell_x = np.clip((block["hit_x"] - COURT_LEFT) // HEATMAP_CELL, 0, _HEAT_X - 1).astype(np.intp)
+        cell_y = np.clip(block["hit_y"] // HEATMAP_CELL, 0, _HEAT_Y - 1).astype(np.intp)
+        cells = (side * _HEAT_X + cell_x) * _HEAT_Y + cell_y
+        self.hits += np.bincount(cells, minlength=self.hits.size).reshape(self.hits.shape)
+
+        land_x = np.clip((landing[ended] - COURT_LEFT) // HEATMAP_CELL, 0, _HEAT_X - 1).astype(np.intp)
+        cells = side[ended] * _HEAT_X + land_x
+        self.landings += np.bincount(cells, minlength=self.landings.size).reshape(self.landings.shape)
+
+        rally = np.minimum(block["rally"][ended], MAX_RALLY)
+        self.rallies += np.bincount(rally, minlength=MAX_RALLY + 1)
+
+    def add_file(self, path):
+        for block in read_blocks(path):
+            self.add(block)
+
+    def merge(self, other):
+        for name in ("shots", "smashes", "winners", "errors", "smash_winners",
+                     "hits", "landings", "rallies"):
+            getattr(self, name)[...] += getattr(other, name)
+
+    def summary(self):
+        rallies = {int(length): int(count) for length, count in enumerate(self.rallies) if count}
+        points = sum(rallies.values())
+        sides = {}
+        for side, name in enumerate(("left", "right")):
+            shots = int(self.shots[side])
+            hot_x, hot_y = np.unravel_index(np.argmax(self.hits[side]), self.hits[side].shape)
+            sides[name] = {
+                "shots": shots,
+                "smash_rate": int(self.smashes[side]) / max(1, shots),
+                "winners": int(self.winners[side]),
+                "errors": int(self.errors[side]),
+                "smash_winners": int(self.smash_winners[side]),
+                "hottest_cell": [int(COURT_LEFT + hot_x * HEATMAP_CELL), int(hot_y * HEATMAP_CELL)],
+            }
+        return {
+            "shots": int(self.shots.sum()),
+            "points": points,
+            "mean_rally": sum(length * count for length, count in rallies.items()) / max(1, points),
+            "median_rally": rally_percentile(rallies, 0.5),
+            "p90_rally": rally_percentile(rallies, 0.9),
+            "longest_rally": max(rallies, default=0),
+            "sides": sides,
+            "rally_histogram": {str(length): count for length, count in rallies.items()},
+        }
+
+    def write_heatmap(self, path):
+        # CSV of hit counts: side, cell x, cell y (top-left corner in pixels), shots
+        with open(path, "w") as f:
+            f.write("side,x,y,shots\n")
+            for side, x, y in zip(*np.nonzero(self.hits)):
+                f.write(f"{('left', 'right')[side]},{COURT_LEFT + x * HEATMAP_CELL},"
+                        f"{y * HEATMAP_CELL},{self.hits[side, x, y]}\n")
+
+
+def record_matches(path, matches, seed=0, target_score=winning_score, use_table=True):
+    # Play AI-vs-AI matches and append their shots to path; returns the shot count
+    predictor = None
+    if use_table:
+        from trajectory import get_landing_table
+        predictor = get_landing_table()
+    seeds = GameRNG(seed)
+    shots = 0
+    with ShotWriter(path) as writer:
+        for _ in range(matches):
+            sim = MatchSimulator(target_score, predictor=predictor, seed=seeds.next64(), player_ai=True)
+            recorder = ShotRecorder(sim, writer)
+            while sim.game_state != GAME_OVER and sim.frame < MAX_FRAMES:
+                recorder.record(sim.step())
+            shots += recorder.shots
+    return shots
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record and aggregate per-shot badminton statistics")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="play AI-vs-AI matches and append their shots to a file")
+    record.add_argument("path")
+    record.add_argument("--matches", type=int, default=100, help="matches to play (default %(default)s)")
+    record.add_argument("--seed", type=int, default=0, help="master seed (default %(default)s)")
+    record.add_argument("--winning-score", type=int, default=winning_score)
+    record.add_argument("--no-landing-table", action="store_true",
+                        help="use the AI's simple landing estimate instead of the trajectory table")
+    report = commands.add_parser("report", help="aggregate one or more shot files")
+    report.add_argument("paths", nargs="+")
+    report.add_argument("--json", metavar="PATH", help="also write the summary as JSON")
+    report.add_argument("--heatmap", metavar="PATH", help="write the hit heatmap as CSV")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == "record":
+        shots = record_matches(args.path, args.matches, args.seed, args.winning_score,
+                               not args.no_landing_table)
+        elapsed = time.perf_counter() - start
+        print(f"{args.matches} matches, {shots} shots appended to {args.path} in {elapsed:.1f}s")
+        return
+
+    aggregator = ShotAggregator()
+    for path in args.paths:
+        aggregator.add_file(path)
+    summary = aggregator.summary()
+    elapsed = time.perf_counter() - start
+    print(f"{summary['shots']} shots, {summary['points']} rallies in {elapsed:.1f}s")
+    print(f"rally length: mean {summary['mean_rally']:.2f}, median {summary['median_rally']}, "
+          f"p90 {summary['p90_rally']}, longest {summary['longest_rally']}")
+    print(f"{'side':>6} {'shots':>10} {'smash':>7} {'winners':>9} {'errors':>8} {'hottest cell':>13}")
+    for name, side in summary["sides"].items():
+        print(f"{name:>6} {side['shots']:>10} {side['smash_rate']:>7.1%} {side['winners']:>9} "
+              f"{side['errors']:>8} {str(tuple(side['hottest_cell'])):>13}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+    if args.heatmap:
+        aggregator.write_heatmap(args.heatmap)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import os
+import threading
+
+import numpy as np
+import pygame
+
+# Sound effects. The mixer gets a fixed pool of channels at startup and every
+# effect is decoded once, on a background thread, into a pygame.mixer.Sound,
+# so play() never touches the disk or allocates. When every channel is busy
+# a new effect steals the voice of the lowest-priority sound playing (the
+# oldest among equals), or is dropped if everything playing matters more:
+# a fast rally cuts old hits short instead of queueing sounds or stalling a
+# frame. Effects play off GameEvents (see play_event), so the simulation
+# itself stays silent and headless.
+#
+# Effects are read from SOUND_DIR; one whose file is missing is synthesized
+# instead. No audio device means no sound, never an error.
+
+SOUND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sounds")
+MUSIC_FILE = "background_music.mp3"  # Streamed by the mixer if present in SOUND_DIR
+MUSIC_VOLUME = 0.5
+AUDIO_CHANNELS = 8  # Voices that can sound at once
+MIXER_FREQUENCY = 44100
+MIXER_BUFFER = 512  # Samples per mixer callback; small keeps the latency near 10 ms
+
+# Effect name -> (file, priority, volume). Higher priorities steal voices
+# from lower ones, never the other way round.
+EFFECTS = {
+    "hit": ("hit.wav", 1, 0.8),
+    "net": ("net_hit.wav", 1, 0.7),
+    "point": ("point.wav", 2, 1.0),
+    "cheer": ("cheer.wav", 3, 0.6),
+}
+
+# GameEvent kind -> effect
+EVENT_EFFECTS = {"serve": "hit", "hit": "hit", "net": "net", "point": "point", "game_over": "cheer"}
+
+
+# Stand-in effects for missing files, as int16 samples at `frequency`
+def synthesize(name, frequency=MIXER_FREQUENCY, seed=0):
+    rng = np.random.default_rng(seed)
+    def envelope(seconds, decay):
+        t = np.arange(int(frequency * seconds)) / frequency
+        return t, np.exp(-t * decay)
+    if name == "hit":
+        # Racket thwack: a noise burst over a falling tone
+        t, env = envelope(0.12, 40)
+        wave = 0.6 * rng.uniform(-1, 1, len(t)) + np.sin(2 * np.pi * (900 - 2000 * t) * t)
+    elif name == "net":
+        # Dull thud
+        t, env = envelope(0.2, 18)
+        wave = np.sin(2 * np.pi * 140 * t) + 0.3 * rng.uniform(-1, 1, len(t))
+    elif name == "point":
+        # Two-note chime
+        t, env = envelope(0.5, 5)
+        wave = np.sin(2 * np.pi * np.where(t < 0.15, 660, 880) * t)
+    else:
+        # Crowd: noise swelling in and dying away
+        t, env = envelope(1.5, 2)
+        wave = rng.uniform(-1, 1, len(t))
+        wave = np.convolve(wave, np.ones(8) / 8, mode="same")  # Take the hiss off
+        env = env * np.minimum(1, t / 0.3)
+    return (np.clip(wave * env, -1, 1) * 12000).astype(np.int16)
+
+
+class AudioManager:
+    def __init__(self, sound_dir=SOUND_DIR, channels=AUDIO_CHANNELS, effects=EFFECTS):
+        self.sound_dir = sound_dir
+        self.channel_count = channels
+        self.effects = effects
+        self.sounds = {}  # Effect name -> Sound, filled in by the loader thread
+        self.channels = []
+        self.voices = []  # Per channel: (priority, sequence number) of its last sound
+        self.sequence = 0
+        self.loader = None
+        # Statistics
+        self.played = 0
+        self.stolen = 0
+        self.dropped = 0
+        self.synthesized = []  # Effects with no file
+
+    def start(self):
+        # Open the mixer and start decoding; False (and silence) without a device
+        try:
+            pygame.mixer.pre_init(MIXER_FREQUENCY, -16, 2, MIXER_BUFFER)
+            pygame.mixer.init()
+        except pygame.error as error:
+            print(f"No audio device ({error}); playing without sound")
+            return False
+        pygame.mixer.set_num_channels(self.channel_count)
+        # Reserved, so nothing else (Sound.play()) picks these channels
+        pygame.mixer.set_reserved(self.channel_count)
+        self.channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+        self.voices = [(0, 0)] * self.channel_count
+        self.loader = threading.Thread(target=self._load, daemon=True)
+        self.loader.start()
+        music = os.path.join(self.sound_dir, MUSIC_FILE)
+        if os.path.exists(music):
+            try:
+                pygame.mixer.music.load(music)
+                pygame.mixer.music.set_volume(MUSIC_VOLUME)
+                pygame.mixer.music.play(-1)
+            except pygame.error as error:
+                print(f"Could not play {music} ({error}); playing without music")
+        return True
+
+    def _load(self):
+        frequency, _, channels = pygame.mixer.get_init()
+        for name, (filename, _, volume) in self.effects.items():
+            path = os.path.join(self.sound_dir, filename)
+            sound = None
+            if os.path.exists(path):
+                try:
+                    sound = pygame.mixer.Sound(path)
+                except pygame.error as error:
+                    print(f"Could not load {path} ({error}); using a synthesized sound")
+            if sound is None:
+                samples = synthesize(name, frequency)
+                if channels > 1:
+                    samples = np.repeat(samples[:, None], channels, axis=1)
+                sound = pygame.sndarray.make_sound(samples)
+                self.synthesized.append(name)
+            sound.set_volume(volume)
+            self.sounds[name] = sound  # Playable from here on
+
+    def wait_loaded(self, timeout=None):
+        if self.loader is not None:
+            self.loader.join(timeout)
+
+    def play(self, name):
+        # Plays at once on a free channel, steals one or drops the sound;
+        # effects not decoded yet are skipped
+        sound = self.sounds.get(name)
+        if sound is None:
+            return False
+        priority = self.effects[name][1]
+        voices = self.voices
+        victim = None
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                victim = i
+                break
+            if victim is None or voices[i] < voices[victim]:
+                victim = i
+        else:
+            if voices[victim][0] > priority:
+                self.dropped += 1
+                return False
+            self.stolen += 1
+        self.sequence += 1
+        self.channels[victim].play(sound)  # Cuts off whatever the channel was playing
+        voices[victim] = (priority, self.sequence)
+        self.played += 1
+        return True
+
+    def play_event(self, event):
+        name = EVENT_EFFECTS.get(event.kind)
+        if name is not None:
+            self.play(name)
+
+    def report(self):
+        return f"{self.played} sounds played, {self.stolen} voices stolen, {self.dropped} dropped"
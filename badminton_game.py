@@ -1,16 +1,89 @@
+import os
+import time
+_import_started = time.perf_counter()
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
 import pygame
 import sys
 import random
 import math
+import json
+import csv
+import struct
+import warnings
+from collections import OrderedDict, deque, namedtuple
+from contextlib import contextmanager
 
-# Initialize Pygame
-pygame.init()
-
-# Screen dimensions
+# Logical court dimensions. The simulation, and every position and size the
+# drawing code uses, is in these units whatever the size of the window.
 WIDTH = 1000
 HEIGHT = 700
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Badminton Championship")
+
+# Render pixels per logical unit. Frames are drawn at (WIDTH, HEIGHT) *
+# view_scale, which SDL's renderer stretches to the window when that is
+# smaller than the window's court area (see init_display); drawing code converts logical
+# coordinates with px(), view_pos() and view_rect(). At 1.0 these return
+# their arguments unchanged.
+view_scale = 1.0
+
+def px(length):
+    return length if view_scale == 1.0 else length * view_scale
+
+def px_width(width):
+    # Line and outline thickness in whole render pixels (a width of 0 would
+    # mean "filled" to pygame.draw)
+    return width if view_scale == 1.0 else max(1, round(width * view_scale))
+
+def view_pos(x, y):
+    if view_scale == 1.0:
+        return x, y
+    return x * view_scale, y * view_scale
+
+def view_rect(rect):
+    # Rect or (x, y, width, height) in logical units -> Rect in render pixels,
+    # covering every pixel the logical area touches
+    if view_scale == 1.0:
+        return pygame.Rect(rect)
+    x, y, width, height = rect
+    left, top = math.floor(x * view_scale), math.floor(y * view_scale)
+    return pygame.Rect(left, top, math.ceil((x + width) * view_scale) - left,
+                       math.ceil((y + height) * view_scale) - top)
+
+# Fonts are opened the first time something is drawn with them. Font(None, size)
+# is pygame's bundled default font, which is what SysFont(None, size) resolves
+# to after enumerating every font installed on the system. The point size is
+# in logical units; the font itself is opened at the current view scale.
+class LazyFont:
+    def __init__(self, size):
+        self.point_size = size
+        self._font = None
+        self._scale = None
+    
+    def __getattr__(self, name):
+        # Only reached for Font attributes (render, size, get_linesize, ...)
+        if self._font is None or self._scale != view_scale:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            self._font = pygame.font.Font(None, max(1, round(self.point_size * view_scale)))
+            self._scale = view_scale
+        return getattr(self._font, name)
+
+# The display surface is created by main(), so the simulation below can be
+# imported and stepped without opening a window. Frames are drawn into
+# screen, which is the window's display surface itself or a subsurface of
+# it (letterboxed).
+screen = None
+window = None
+font = LazyFont(36)
+large_font = LazyFont(72)
+small_font = LazyFont(28)
+
+# Milliseconds since the display came up, for UI animation. (pygame's
+# get_ticks() stays at 0 unless pygame.init() has started every subsystem.)
+_ticks_started = time.perf_counter()
+
+def ui_ticks():
+    return int((time.perf_counter() - _ticks_started) * 1000)
 
 # Colors
 WHITE = (255, 255, 255)
@@ -28,13 +101,20 @@ BUTTON_HOVER_COLOR = (80, 220, 200)
 
 # Game constants
 FPS = 60
+SIM_RATE = 60  # Simulation steps per second; all physics constants are per step
+MAX_FRAME_TIME = 0.25  # Longest real-time gap the simulation catches up on
+MAX_STEPS_PER_FRAME = 8  # Simulation steps run before a frame must be drawn
+FAST_FORWARD_FPS = 10  # Frames drawn per second while fast-forwarding
+IDLE_FPS = 10  # Frames drawn per second on the static screens (menu, between points, game over)
 GRAVITY = 0.4
 AIR_RESISTANCE = 0.98
 PLAYER_SPEED = 7  # Increased from 5
 COMPUTER_SPEED = 5  # Increased from 4
+AI_JITTER = 20  # Random error (px) in where the computer AI runs to
 PLAYER_WIDTH = 40  # Increased from 30
 PLAYER_HEIGHT = 70  # Increased from 60
 SHUTTLE_RADIUS = 10  # Increased from 8
+TRAIL_LENGTH = 10  # Positions kept for the shuttlecock's trail
 NET_WIDTH = 5
 NET_HEIGHT = 180  # Increased from 150
 COURT_WIDTH = WIDTH - 100  # 50px margin on each side
@@ -46,6 +126,10 @@ COURT_RIGHT = COURT_LEFT + COURT_WIDTH
 NET_X = WIDTH // 2
 NET_TOP = COURT_BOTTOM - NET_HEIGHT
 FLOOR_Y = COURT_BOTTOM
+NET_RECT = pygame.Rect(NET_X - NET_WIDTH // 2, NET_TOP, NET_WIDTH, NET_HEIGHT)
+HIT_REACH = 60  # Furthest the shuttlecock can be from the racket, on either axis, for a hit
+GRID_CELL = 2 * HIT_REACH  # Broad-phase cell size, so a racket's reach spans at most 2x2 cells
+GRID_MIN_SHUTTLES = 48  # Below this many shuttlecocks, testing them all is cheaper than the grid
 
 # Game states
 MENU = 0
@@ -54,18 +138,369 @@ SERVE = 2
 POINT_SCORED = 3
 GAME_OVER = 4
 
-# Initialize game variables
-game_state = MENU
-player_score = 0
-computer_score = 0
+STATE_NAMES = {MENU: "menu", PLAYING: "playing", SERVE: "serve",
+               POINT_SCORED: "point scored", GAME_OVER: "game over"}
+IDLE_STATES = (MENU, POINT_SCORED, GAME_OVER)  # Nothing moves but the overlay animation
+
 winning_score = 11  # First to 11 points
-serving = True  # Player serves first
-rally_started = False
+
+# Sprite atlas of alpha circles shared by the shuttle trail and the particles.
+# Sprites are keyed on (radius, color, alpha bucket) and created once, so
+# drawing them costs a blit instead of a new SRCALPHA surface per circle.
+# init_display() prebakes every sprite the game can draw at the view scale
+# (the trail's radius/alpha steps, 4 particle sizes in 5 effect colours at
+# 31 visible alpha buckets) and grows the cap to hold them all, so nothing
+# is evicted or allocated after startup.
+ALPHA_BUCKETS = 32
+ATLAS_SIZE = 1024  # Most distinct sprites kept before the least recently used is dropped
+ATLAS_HEADROOM = 64  # Room above the prebaked set for sprites nobody prebaked
+
+# Particle colours of the hit, serve and floor impact effects
+PLAYER_HIT_COLOR = (255, 165, 0)
+PLAYER_SMASH_COLOR = (255, 100, 0)
+COMPUTER_HIT_COLOR = (150, 150, 255)
+COMPUTER_SMASH_COLOR = (100, 100, 255)
+IMPACT_COLOR = (200, 200, 200)
+EFFECT_COLORS = (PLAYER_HIT_COLOR, PLAYER_SMASH_COLOR, COMPUTER_HIT_COLOR, COMPUTER_SMASH_COLOR,
+                 IMPACT_COLOR)
+
+class SpriteAtlas:
+    def __init__(self, max_entries=ATLAS_SIZE, alpha_buckets=ALPHA_BUCKETS):
+        self.max_entries = max_entries
+        self.alpha_buckets = alpha_buckets
+        self.sprites = OrderedDict()
+        self.created = 0  # Total sprite surfaces ever allocated
+    
+    def circle(self, radius, color, alpha):
+        # Returns the sprite for an alpha circle, or None if it would be invisible
+        bucket = alpha * self.alpha_buckets // 256
+        if bucket <= 0 or radius <= 0:
+            return None
+        key = (radius, color[0], color[1], color[2], bucket)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            bucket_alpha = min(255, bucket * 256 // self.alpha_buckets + 255 // self.alpha_buckets)
+            sprite = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            pygame.draw.circle(sprite, (color[0], color[1], color[2], bucket_alpha), (radius, radius), radius)
+            self.sprites[key] = sprite
+            self.created += 1
+            if len(self.sprites) > self.max_entries:
+                self.sprites.popitem(last=False)
+        else:
+            self.sprites.move_to_end(key)
+        return sprite
+    
+    def prebake(self, radii, color):
+        # Fill the atlas ahead of time for every alpha level of the given radii
+        for radius in radii:
+            for bucket in range(1, self.alpha_buckets):
+                self.circle(radius, color, bucket * 256 // self.alpha_buckets)
+
+sprite_atlas = SpriteAtlas()
+
+# Rendered text keyed on (font, text, color, scale) with LRU eviction, so a
+# label is only re-rendered when its content changes
+TEXT_CACHE_SIZE = 128
+
+class TextCache:
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.renders = 0  # Total font.render calls, for checking the hit rate
+    
+    def render(self, font, text, color, scale=1.0):
+        key = (font, text, color, scale)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        if scale == 1.0:
+            surface = font.render(text, True, color)
+            self.renders += 1
+        else:
+            base = self.render(font, text, color)
+            surface = pygame.transform.scale(base, (int(base.get_width() * scale),
+                                                    int(base.get_height() * scale)))
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+text_cache = TextCache()
+
+# Static UI pieces (overlays, trophy, buttons) are painted once into a
+# transparent surface and blitted from then on. They are painted in logical
+# units and scaled to the view once, when cached.
+ui_layers = {}
+
+def ui_layer(key, size, paint):
+    layer = ui_layers.get(key)
+    if layer is None:
+        layer = pygame.Surface(size, pygame.SRCALPHA)
+        paint(layer)
+        if view_scale != 1.0:
+            layer = pygame.transform.smoothscale(layer, view_rect((0, 0) + tuple(size)).size)
+        ui_layers[key] = layer
+    return layer
+
+def overlay_layer(alpha):
+    # Semi-transparent full-screen overlay
+    return ui_layer(("overlay", alpha), (WIDTH, HEIGHT), lambda layer: layer.fill((0, 0, 0, alpha)))
+
+def button_layer(width, height, color, radius=10):
+    def paint(layer):
+        pygame.draw.rect(layer, color, (0, 0, width, height), border_radius=radius)
+        pygame.draw.rect(layer, (255, 255, 255), (0, 0, width, height), 2, border_radius=radius)
+    return ui_layer(("button", width, height, color, radius), (width, height), paint)
+
+def paint_trophy(layer):
+    # Trophy cup
+    pygame.draw.ellipse(layer, (255, 215, 0), (20, 0, 80, 40))
+    pygame.draw.rect(layer, (255, 215, 0), (30, 40, 60, 60))
+    # Trophy handles
+    pygame.draw.ellipse(layer, (255, 215, 0), (0, 10, 30, 20))
+    pygame.draw.ellipse(layer, (255, 215, 0), (90, 10, 30, 20))
+    # Trophy base
+    pygame.draw.rect(layer, (255, 215, 0), (40, 100, 40, 20))
+    pygame.draw.rect(layer, (255, 215, 0), (30, 120, 60, 10))
+
+# Frame profiler: named sections timed with perf_counter_ns and summed per
+# frame, the last PROFILE_HISTORY frames kept in ring buffers for rolling
+# percentiles, an on-screen overlay and CSV / JSON traces. Disabled, a
+# section costs one attribute check and an empty with-block.
+PROFILE_HISTORY = 600  # Frames kept (10 seconds at 60 FPS)
+PROFILE_SECTIONS = ("events", "ai", "player_update", "shuttle_update", "particles",
+                    "draw_court", "draw_ui", "flip", "idle")
+PROFILE_OVERLAY_REFRESH = 30  # Frames between overlay text updates
+PROFILE_OVERLAY_POS = (10, 60)
+PROFILE_OVERLAY_WIDTH = 380
+
+class _ProfileSection:
+    __slots__ = ("profiler", "name", "start")
+    
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+    
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+    
+    def __exit__(self, *exc):
+        current = self.profiler.current
+        current[self.name] = current.get(self.name, 0) + time.perf_counter_ns() - self.start
+
+class _NullSection:
+    __slots__ = ()
+    
+    def __enter__(self):
+        pass
+    
+    def __exit__(self, *exc):
+        pass
+
+_NULL_SECTION = _NullSection()
+
+class FrameProfiler:
+    def __init__(self, sections=PROFILE_SECTIONS, history=PROFILE_HISTORY, enabled=False):
+        self.enabled = enabled
+        self.history = history
+        self.samples = {}  # Section name -> ring buffer of per-frame nanoseconds
+        self.sections = {}
+        for name in sections + ("frame",):
+            self._add_section(name)
+        self.frames = 0  # Frames recorded so far
+        self.current = {}  # Section totals for the frame in progress
+        self.frame_start = None
+        self.overlay = None
+        self.overlay_frame = -PROFILE_OVERLAY_REFRESH
+    
+    def _add_section(self, name):
+        self.samples[name] = [0] * self.history
+        self.sections[name] = _ProfileSection(self, name)
+    
+    def section(self, name):
+        # Context manager timing one section; time adds up over repeated
+        # sections within a frame (several simulation steps, say)
+        if not self.enabled:
+            return _NULL_SECTION
+        if name not in self.sections:
+            self._add_section(name)
+        return self.sections[name]
+    
+    def begin_frame(self):
+        self.current.clear()
+        self.frame_start = time.perf_counter_ns() if self.enabled else None
+    
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        self.current["frame"] = time.perf_counter_ns() - self.frame_start
+        slot = self.frames % self.history
+        for name, ring in self.samples.items():
+            ring[slot] = self.current.get(name, 0)
+        self.frames += 1
+        self.frame_start = None
+    
+    def recent(self, name):
+        # Recorded samples for a section, oldest first
+        ring = self.samples[name]
+        if self.frames <= self.history:
+            return ring[:self.frames]
+        slot = self.frames % self.history
+        return ring[slot:] + ring[:slot]
+    
+    def summary(self):
+        # Milliseconds per frame for every section: mean and nearest-rank percentiles
+        result = {}
+        for name in self.samples:
+            values = sorted(self.recent(name))
+            if not values:
+                continue
+            def percentile(p):
+                return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))] / 1e6
+            result[name] = {"mean_ms": sum(values) / len(values) / 1e6,
+                            "p50_ms": percentile(50), "p95_ms": percentile(95),
+                            "p99_ms": percentile(99), "max_ms": values[-1] / 1e6}
+        return result
+    
+    def export(self, path):
+        # Write the recorded frames as a trace: JSON (summary plus per-frame
+        # milliseconds) for .json paths, otherwise CSV with a row per frame
+        names = list(self.samples)
+        first = max(0, self.frames - self.history)
+        columns = [self.recent(name) for name in names]
+        rows = [[first + i] + [round(column[i] / 1e6, 4) for column in columns]
+                for i in range(self.frames - first)]
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({"frames": self.frames, "sections": names, "summary": self.summary(),
+                           "trace": rows}, f, indent=1)
+        else:
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["frame"] + [f"{name}_ms" for name in names])
+                writer.writerows(rows)
+    
+    def overlay_surface(self):
+        # p50 / p95 / p99 table, re-rendered every PROFILE_OVERLAY_REFRESH frames
+        # (the numbers change every frame, so they bypass the text cache)
+        if self.overlay is not None and self.frames - self.overlay_frame < PROFILE_OVERLAY_REFRESH:
+            return self.overlay
+        stats = self.summary()
+        # Laid out in render pixels, to match the (view-scaled) font
+        line_height = small_font.get_linesize()
+        columns = [px(x + 8) for x in (0, 170, 240, 310)]
+        layer = pygame.Surface((px(PROFILE_OVERLAY_WIDTH), line_height * (len(self.samples) + 1) + px(10)),
+                               pygame.SRCALPHA)
+        layer.fill((0, 0, 0, 170))
+        for x, label in zip(columns, ("ms", "p50", "p95", "p99")):
+            layer.blit(small_font.render(label, True, TEXT_COLOR), (x, px(5)))
+        for row, name in enumerate(self.samples, 1):
+            y = px(5) + row * line_height
+            layer.blit(small_font.render(name, True, WHITE), (columns[0], y))
+            if name in stats:
+                for x, key in zip(columns[1:], ("p50_ms", "p95_ms", "p99_ms")):
+                    layer.blit(small_font.render(f"{stats[name][key]:.2f}", True, WHITE), (x, y))
+        self.overlay = layer
+        self.overlay_frame = self.frames
+        return layer
+    
+    def overlay_rect(self):
+        line_height = small_font.get_linesize() / view_scale
+        return pygame.Rect(PROFILE_OVERLAY_POS, (PROFILE_OVERLAY_WIDTH, line_height * (len(self.samples) + 1) + 10))
+
+# Profiler for the game client, toggled with F3; simulations only time
+# themselves when given one
+profiler = FrameProfiler()
+_NO_PROFILER = FrameProfiler(history=1)
+
+# Seeded random number stream for gameplay (shot targeting, AI jitter).
+# SplitMix64 keeps its whole state in one integer, so a game can be reproduced
+# from its seed alone and the stream does not depend on the Python version.
+# Cosmetic effects use their own generator so they never disturb this one.
+_MASK64 = (1 << 64) - 1
+
+class GameRNG:
+    __slots__ = ("state",)
+    
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.state = seed & _MASK64
+    
+    def next64(self):
+        self.state = z = (self.state + 0x9E3779B97F4A7C15) & _MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+        return z ^ (z >> 31)
+    
+    def random(self):
+        # Float in [0, 1)
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+    
+    def uniform(self, a, b):
+        return a + (b - a) * self.random()
+    
+    def randint(self, a, b):
+        # Integer in [a, b], both ends included
+        return a + self.next64() % (b - a + 1)
+    
+    def choice(self, seq):
+        return seq[self.next64() % len(seq)]
+
+# Broad-phase for hit detection: shuttlecocks are bucketed by grid cell so
+# a swing only tests the few shuttlecocks near the racket, not every one in
+# play. Building the grid is O(n) and a query touches at most 2x2 cells.
+class UniformGrid:
+    def __init__(self, cell_size=GRID_CELL):
+        self.cell_size = cell_size
+        self.cells = {}
+    
+    def clear(self):
+        self.cells.clear()
+    
+    def insert(self, item, x, y):
+        key = (int(x // self.cell_size), int(y // self.cell_size))
+        bucket = self.cells.get(key)
+        if bucket is None:
+            self.cells[key] = [item]
+        else:
+            bucket.append(item)
+    
+    def query(self, left, top, right, bottom):
+        # Items in every cell the box touches (a superset of those inside it)
+        size = self.cell_size
+        found = []
+        for cx in range(int(left // size), int(right // size) + 1):
+            for cy in range(int(top // size), int(bottom // size) + 1):
+                bucket = self.cells.get((cx, cy))
+                if bucket:
+                    found.extend(bucket)
+        return found
 
 # Player class
+# pygame.Rect stores float coordinates rounded half away from zero
+def _rect_coord(value):
+    return int(value + math.copysign(0.5, value))
+
+_NET_LEFT = NET_RECT.left
+_NET_RIGHT = NET_RECT.right
+_NET_TOP = NET_RECT.top
+_NET_BOTTOM = NET_RECT.bottom
+
+# pygame.Rect.colliderect() between a size x size box and the net
+def _net_overlap(left, top, size):
+    return left < _NET_RIGHT and left + size > _NET_LEFT and top < _NET_BOTTOM and top + size > _NET_TOP
+
 class Player:
+    # Match state (what MatchSimulator.snapshot() records) first, then fixed attributes
+    __slots__ = ("x", "y", "jump_speed", "speed", "on_ground", "swinging", "swing_cooldown", "jump_cooldown",
+                 "start_x", "min_x", "max_x", "width", "height", "jump_height", "color", "is_computer")
+    
     def __init__(self, x, y, is_computer=False):
         self.x = x
+        self.start_x = x
         self.y = y
         self.width = PLAYER_WIDTH
         self.height = PLAYER_HEIGHT
@@ -74,12 +509,17 @@ class Player:
         self.is_computer = is_computer
         self.swinging = False
         self.swing_cooldown = 0
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
         self.jump_speed = 0
-        self.jumping = False
         self.on_ground = True
         self.jump_height = -12
         self.jump_cooldown = 0
+        # Part of the court this player may move in (narrowed in doubles)
+        if is_computer:
+            # Computer stays on right side
+            self.min_x, self.max_x = NET_X + 10, COURT_RIGHT - self.width
+        else:
+            # Player stays on left side
+            self.min_x, self.max_x = COURT_LEFT, NET_X - self.width - 10
         
     def move(self, direction):
         if direction == "left":
@@ -88,21 +528,11 @@ class Player:
             self.x += self.speed
         elif direction == "jump" and self.on_ground and self.jump_cooldown <= 0:
             self.jump_speed = self.jump_height
-            self.jumping = True
             self.on_ground = False
             self.jump_cooldown = 30  # Prevent continuous jumping
         
         # Boundary checks
-        if self.is_computer:
-            # Computer stays on right side
-            self.x = max(NET_X + 10, min(self.x, COURT_RIGHT - self.width))
-        else:
-            # Player stays on left side
-            self.x = max(COURT_LEFT, min(self.x, NET_X - self.width - 10))
-        
-        # Update rectangle position
-        self.rect.x = self.x
-        self.rect.y = self.y
+        self.x = max(self.min_x, min(self.x, self.max_x))
     
     def swing(self):
         if self.swing_cooldown <= 0:
@@ -121,7 +551,6 @@ class Player:
             if self.y >= FLOOR_Y - self.height:
                 self.y = FLOOR_Y - self.height
                 self.on_ground = True
-                self.jumping = False
                 self.jump_speed = 0
         
         # Update cooldowns
@@ -132,20 +561,31 @@ class Player:
             
         if self.jump_cooldown > 0:
             self.jump_cooldown -= 1
-        
-        # Update rectangle position
-        self.rect.x = self.x
-        self.rect.y = self.y
+    
+    @property
+    def rect(self):
+        # Body rectangle on screen, only needed for drawing
+        return pygame.Rect(_rect_coord(self.x), _rect_coord(self.y), self.width, self.height)
+    
+    def reach_point(self):
+        # Where the racket meets the shuttlecock: the net-side edge at mid height
+        if self.is_computer:
+            return self.x, self.y + self.height / 2
+        return self.x + self.width, self.y + self.height / 2
+    
+    def bounds(self):
+        # Screen area the player can cover when drawn: head, body and racket
+        return pygame.Rect(self.x - 35, self.y - 25, self.width + 70, self.height + 30)
     
     def draw(self):
         # Draw player body
-        pygame.draw.rect(screen, self.color, self.rect)
+        pygame.draw.rect(screen, self.color, view_rect(self.rect))
         
         # Draw player head
         head_radius = 15
         head_y = self.y - head_radius // 2
         head_x = self.x + self.width // 2
-        pygame.draw.circle(screen, self.color, (head_x, head_y), head_radius)
+        pygame.draw.circle(screen, self.color, view_pos(head_x, head_y), px(head_radius))
         
         # Draw racket when swinging
         if self.swinging:
@@ -155,30 +595,32 @@ class Player:
                 racket_x = self.x - 25
                 racket_y = self.y + 20
                 # Draw racket handle
-                pygame.draw.line(screen, (139, 69, 19), (self.x + 5, self.y + 25), 
-                                (racket_x + 15, racket_y + 10), 5)
+                pygame.draw.line(screen, (139, 69, 19), view_pos(self.x + 5, self.y + 25), 
+                                view_pos(racket_x + 15, racket_y + 10), px_width(5))
                 # Draw racket head
-                pygame.draw.ellipse(screen, racket_color, (racket_x, racket_y, 30, 25), 3)
+                pygame.draw.ellipse(screen, racket_color, view_rect((racket_x, racket_y, 30, 25)), px_width(3))
             else:
                 # Draw racket on right side for player
                 racket_x = self.x + self.width
                 racket_y = self.y + 20
                 # Draw racket handle
-                pygame.draw.line(screen, (139, 69, 19), (self.x + self.width - 5, self.y + 25), 
-                                (racket_x + 15, racket_y + 10), 5)
+                pygame.draw.line(screen, (139, 69, 19), view_pos(self.x + self.width - 5, self.y + 25), 
+                                view_pos(racket_x + 15, racket_y + 10), px_width(5))
                 # Draw racket head
-                pygame.draw.ellipse(screen, racket_color, (racket_x, racket_y, 30, 25), 3)
+                pygame.draw.ellipse(screen, racket_color, view_rect((racket_x, racket_y, 30, 25)), px_width(3))
 
-# Shuttlecock class
+# Shuttlecock class. Only position and velocity are match state; the trail
+# is drawn from positions the client records (see record_trails) and is not
+# touched by update(). net_hits counts net bounces until MatchSimulator
+# turns them into events.
 class Shuttlecock:
-    def __init__(self):
+    __slots__ = ("x", "y", "vx", "vy", "radius", "rng", "shuttle_trail", "net_hits")
+    
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else GameRNG()
+        self.shuttle_trail = deque(maxlen=TRAIL_LENGTH)  # Recent positions for the trail effect
+        self.net_hits = 0
         self.reset()
-        # Load shuttlecock images for animation
-        self.shuttle_frames = []
-        self.frame_index = 0
-        self.animation_speed = 0.2
-        self.shuttle_trail = []  # Store positions for trail effect
-        self.max_trail_length = 10
     
     def reset(self, for_serve=True, server_is_player=True):
         if for_serve:
@@ -194,26 +636,13 @@ class Shuttlecock:
             # Reset to middle for non-serve situations
             self.x = WIDTH // 2
             self.y = HEIGHT // 3
-            self.vx = random.choice([-3, 3])
+            self.vx = self.rng.choice([-3, 3])
             self.vy = -8
         
         self.radius = SHUTTLE_RADIUS
-        self.rect = pygame.Rect(self.x - self.radius, self.y - self.radius, 
-                               self.radius * 2, self.radius * 2)
-        self.shuttle_trail = []  # Clear trail on reset
-        self.frame_index = 0
+        self.shuttle_trail.clear()  # Clear trail on reset
     
     def update(self):
-        # Store current position for trail effect
-        self.shuttle_trail.append((self.x, self.y))
-        if len(self.shuttle_trail) > self.max_trail_length:
-            self.shuttle_trail.pop(0)
-        
-        # Update animation frame
-        self.frame_index += self.animation_speed
-        if self.frame_index >= 4:  # Assuming 4 frames of animation
-            self.frame_index = 0
-            
         # Apply physics
         self.vy += GRAVITY
         self.vx *= AIR_RESISTANCE
@@ -223,13 +652,14 @@ class Shuttlecock:
         self.x += self.vx
         self.y += self.vy
         
-        # Update rectangle position
-        self.rect.x = self.x - self.radius
-        self.rect.y = self.y - self.radius
-        
-        # Check for net collision
-        net_rect = pygame.Rect(NET_X - NET_WIDTH // 2, NET_TOP, NET_WIDTH, NET_HEIGHT)
-        if self.rect.colliderect(net_rect):
+        # Check for net collision, against the shuttlecock's bounding box
+        # in whole pixels as a pygame.Rect would hold it (rounded only when
+        # it is within a pixel of the net)
+        size = self.radius * 2
+        left = self.x - self.radius
+        top = self.y - self.radius
+        if (_NET_LEFT - size - 1 < left < _NET_RIGHT + 1 and top < _NET_BOTTOM + 1 and
+                _net_overlap(_rect_coord(left), _rect_coord(top), size)):
             # Bounce off net with reduced velocity
             if self.x < NET_X:
                 self.x = NET_X - NET_WIDTH // 2 - self.radius
@@ -237,8 +667,8 @@ class Shuttlecock:
                 self.x = NET_X + NET_WIDTH // 2 + self.radius
             self.vx = -self.vx * 0.5
             self.vy *= 0.8
-            # Play net hit sound
-            # net_hit_sound.play()
+            # Counted for the "net" event (and its sound); not match state
+            self.net_hits += 1
         
         # Check for wall collisions
         if self.x - self.radius < 0:
@@ -251,18 +681,20 @@ class Shuttlecock:
         # Check if hit floor
         return self.y + self.radius >= FLOOR_Y
     
-    def hit(self, player, power=10):
-        # Calculate hit direction and power
+    def hit(self, player, power=10, target_x=None):
+        # Calculate hit direction and power. A controller may choose the
+        # target_x to aim at; otherwise it is picked here.
         if player.is_computer:
             # Computer aims toward player's side with more strategy
             # Sometimes aim for corners, sometimes for middle
-            target_type = random.randint(0, 10)
-            if target_type < 3:  # 30% chance for corner shot
-                target_x = random.choice([COURT_LEFT + 30, NET_X - 80])
-            elif target_type < 7:  # 40% chance for middle shot
-                target_x = (COURT_LEFT + NET_X) // 2
-            else:  # 30% chance for random shot
-                target_x = random.randint(COURT_LEFT, NET_X - 50)
+            if target_x is None:
+                target_type = self.rng.randint(0, 10)
+                if target_type < 3:  # 30% chance for corner shot
+                    target_x = self.rng.choice([COURT_LEFT + 30, NET_X - 80])
+                elif target_type < 7:  # 40% chance for middle shot
+                    target_x = (COURT_LEFT + NET_X) // 2
+                else:  # 30% chance for random shot
+                    target_x = self.rng.randint(COURT_LEFT, NET_X - 50)
                 
             dx = target_x - self.x
             self.vx = dx * 0.05
@@ -275,11 +707,12 @@ class Shuttlecock:
         else:
             # Player hits toward computer's side
             # More control based on player position relative to shuttlecock
-            dx = self.x - player.x
-            if dx < player.width // 2:  # Hit on left side
-                target_x = NET_X + 50 + random.randint(0, 100)
-            else:  # Hit on right side
-                target_x = COURT_RIGHT - 50 - random.randint(0, 100)
+            if target_x is None:
+                dx = self.x - player.x
+                if dx < player.width // 2:  # Hit on left side
+                    target_x = NET_X + 50 + self.rng.randint(0, 100)
+                else:  # Hit on right side
+                    target_x = COURT_RIGHT - 50 - self.rng.randint(0, 100)
                 
             dx = target_x - self.x
             self.vx = dx * 0.05
@@ -291,27 +724,41 @@ class Shuttlecock:
                 self.vy = -power
         
         # Add slight randomness to make game less predictable
-        self.vx += random.uniform(-0.5, 0.5)
-        self.vy += random.uniform(-0.5, 0.5)
-        
-        # Play hit sound
-        # hit_sound.play()
+        self.vx += self.rng.uniform(-0.5, 0.5)
+        self.vy += self.rng.uniform(-0.5, 0.5)
+        # (The hit sound plays off the "hit"/"serve" event MatchSimulator
+        # records for this, see audio.py)
+    
+    def bounds(self):
+        # Screen area covered by the shuttlecock, its feathers and its trail
+        reach = self.radius * 1.5 + 2
+        left = right = self.x
+        top = bottom = self.y
+        for trail_x, trail_y in self.shuttle_trail:
+            left = min(left, trail_x)
+            right = max(right, trail_x)
+            top = min(top, trail_y)
+            bottom = max(bottom, trail_y)
+        return pygame.Rect(left - reach, top - reach, right - left + 2 * reach + 1, bottom - top + 2 * reach + 1)
+    
+    @staticmethod
+    def trail_circle(radius, i, count):
+        # Render radius and alpha of the i-th of `count` trail positions
+        # (oldest first): the trail shrinks and fades out towards its tail
+        alpha = int(255 * (i / count))
+        return round(px(int(radius * (0.3 + 0.7 * i / count)))), alpha
     
     def draw(self):
-        # Draw trail effect
+        # Draw trail effect from the sprite atlas
         for i, (trail_x, trail_y) in enumerate(self.shuttle_trail):
-            # Make trail fade out
-            alpha = int(255 * (i / len(self.shuttle_trail)))
-            radius = int(self.radius * (0.3 + 0.7 * i / len(self.shuttle_trail)))
-            trail_color = (255, 255, 240, alpha)
-            
-            # Create a surface for the trail circle with alpha
-            trail_surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
-            pygame.draw.circle(trail_surface, trail_color, (radius, radius), radius)
-            screen.blit(trail_surface, (trail_x - radius, trail_y - radius))
+            radius, alpha = self.trail_circle(self.radius, i, len(self.shuttle_trail))
+            trail_sprite = sprite_atlas.circle(radius, SHUTTLE_COLOR, alpha)
+            if trail_sprite is not None:
+                trail_x, trail_y = view_pos(trail_x, trail_y)
+                screen.blit(trail_sprite, (trail_x - radius, trail_y - radius))
         
         # Draw shuttlecock
-        pygame.draw.circle(screen, SHUTTLE_COLOR, (int(self.x), int(self.y)), self.radius)
+        pygame.draw.circle(screen, SHUTTLE_COLOR, view_pos(int(self.x), int(self.y)), px(self.radius))
         
         # Draw feathers
         feather_length = self.radius * 1.5
@@ -322,33 +769,118 @@ class Shuttlecock:
             feather_angle = angle + i * math.pi / 2
             end_x = self.x + math.cos(feather_angle) * feather_length
             end_y = self.y + math.sin(feather_angle) * feather_length
-            pygame.draw.line(screen, WHITE, (self.x, self.y), (end_x, end_y), 2)
+            pygame.draw.line(screen, WHITE, view_pos(self.x, self.y), view_pos(end_x, end_y), px_width(2))
+
+# Per-frame input for the human player: held LEFT/RIGHT keys plus the
+# one-shot UP (jump), SPACE (start/serve/swing/continue) and R (restart)
+# presses. A controller may also set aim, the target_x for Shuttlecock.hit()
+# if its swing connects (in its own mirrored frame, see OBSERVATION_FIELDS).
+FrameInput = namedtuple("FrameInput", "left right jump swing restart aim",
+                        defaults=(False, False, False, False, False, None))
+NO_INPUT = FrameInput()
+
+# Something that happened during a simulation step (hits, net bounces, floor
+# impacts, points); vx, vy are the shuttlecock's velocity just after a hit or serve
+GameEvent = namedtuple("GameEvent", "kind who x y smash vx vy", defaults=(0.0, 0.0))
+
+# Controllers drive a Player: an observation of the court goes in, a
+# FrameInput with left/right/jump/swing set comes out. Observations are taken
+# from the controlled player's point of view, mirrored about the net for the
+# player on the left, so one controller can play either side; "left" in its
+# action means "left as seen from the right-hand side".
+OBSERVATION_FIELDS = (
+    "side",                 # 1 for the right-hand (computer) side, -1 for the left
+    "own_x", "own_y",       # Top-left corner, x mirrored for the left side
+    "own_on_ground",        # 1.0 or 0.0
+    "own_swing_cooldown", "own_jump_cooldown",
+    "own_speed",
+    "opponent_x", "opponent_y",
+    "shuttle_x", "shuttle_y", "shuttle_vx", "shuttle_vy",
+)
+OBSERVATION_SIZE = len(OBSERVATION_FIELDS)
 
-# Initialize objects
-player = Player(COURT_LEFT + 50, FLOOR_Y - PLAYER_HEIGHT)
-computer = Player(COURT_RIGHT - 50 - PLAYER_WIDTH, FLOOR_Y - PLAYER_HEIGHT, is_computer=True)
-shuttlecock = Shuttlecock()
+def observe(player, opponent, shuttlecock):
+    if player.is_computer:
+        side = 1.0
+        own_x = player.x
+        shuttle_x = shuttlecock.x
+        shuttle_vx = shuttlecock.vx
+        opponent_x = opponent.x if opponent is not None else 0.0
+    else:
+        side = -1.0
+        own_x = 2 * NET_X - player.x - player.width
+        shuttle_x = 2 * NET_X - shuttlecock.x
+        shuttle_vx = -shuttlecock.vx
+        opponent_x = 2 * NET_X - opponent.x - opponent.width if opponent is not None else 0.0
+    return (side, own_x, player.y, 1.0 if player.on_ground else 0.0,
+            player.swing_cooldown, player.jump_cooldown, player.speed,
+            opponent_x, opponent.y if opponent is not None else 0.0,
+            shuttle_x, shuttlecock.y, shuttle_vx, shuttlecock.vy)
+
+# Carry out a controller's action; returns True if the player swung
+def apply_action(player, action):
+    mirrored = not player.is_computer
+    if action.left:
+        player.move("right" if mirrored else "left")
+    elif action.right:
+        player.move("left" if mirrored else "right")
+    if action.jump:
+        player.move("jump")
+    return action.swing and player.swing()
 
-# Font setup
-font = pygame.font.SysFont(None, 36)
-large_font = pygame.font.SysFont(None, 72)
+class Controller:
+    # struct format of what the controller carries from one frame to the
+    # next, packed into MatchSimulator snapshots by get_state()/set_state()
+    state_record = ""
+    
+    def act(self, observation):
+        # Return a FrameInput (left, right, jump, swing) for one observation
+        raise NotImplementedError
+    
+    def reset(self):
+        # Called when a new match starts
+        pass
+    
+    def get_state(self):
+        return ()
+    
+    def set_state(self, values):
+        pass
 
 # Computer AI logic
-def computer_ai():
+def rule_based_action(observation, predictor=None, rng=random, jitter=AI_JITTER, swing_window=HIT_REACH):
     # Advanced AI: Move toward the shuttlecock with prediction and strategy
-    target_x = shuttlecock.x
+    (side, own_x, own_y, on_ground, _, _, _, _, _,
+     shuttle_x, shuttle_y, shuttle_vx, shuttle_vy) = observation
+    target_x = shuttle_x
     
     # If shuttlecock is moving toward computer, predict landing spot
-    if shuttlecock.vx > 0 and shuttlecock.x > NET_X:
-        # Better prediction - adjust based on shuttlecock trajectory
-        time_to_impact = (FLOOR_Y - shuttlecock.y) / max(0.1, shuttlecock.vy)
-        target_x = shuttlecock.x + (shuttlecock.vx * time_to_impact)
+    landing_x = None
+    if shuttle_vx > 0:
+        if predictor is not None:
+            # Precomputed landing spot of the real trajectory (see trajectory.py),
+            # net and wall bounces included, so the AI can start moving while
+            # the shuttlecock is still on the player's side
+            if side > 0:
+                landing_x, _ = predictor.predict(shuttle_x, shuttle_y, shuttle_vx, shuttle_vy)
+            else:
+                landing_x, _ = predictor.predict(2 * NET_X - shuttle_x, shuttle_y, -shuttle_vx, shuttle_vy)
+                landing_x = 2 * NET_X - landing_x
+            if landing_x <= NET_X:
+                landing_x = None
+        elif shuttle_x > NET_X:
+            # Better prediction - adjust based on shuttlecock trajectory
+            time_to_impact = (FLOOR_Y - shuttle_y) / max(0.1, shuttle_vy)
+            landing_x = shuttle_x + (shuttle_vx * time_to_impact)
+    
+    if landing_x is not None:
+        target_x = landing_x
         
         # Add strategic positioning
-        if shuttlecock.y < HEIGHT * 0.3 and abs(shuttlecock.vy) > 5:
+        if shuttle_y < HEIGHT * 0.3 and abs(shuttle_vy) > 5:
             # Prepare for smash - move back
             target_x = min(target_x, COURT_RIGHT - 100)
-        elif shuttlecock.y > HEIGHT * 0.6:
+        elif shuttle_y > HEIGHT * 0.6:
             # Prepare for drop shot - move forward
             target_x = max(target_x, NET_X + 100)
     else:
@@ -356,106 +888,499 @@ def computer_ai():
         target_x = (NET_X + COURT_RIGHT) / 2
     
     # Add some randomness to make AI imperfect but still challenging
-    target_x += random.randint(-20, 20)
+    target_x += rng.randint(-jitter, jitter)
     
     # Move toward target
-    if target_x < computer.x + computer.width / 2:
-        computer.move("left")
-    else:
-        computer.move("right")
+    move_left = target_x < own_x + PLAYER_WIDTH / 2
     
     # Jump logic - jump for high shuttlecocks
-    if (shuttlecock.y < computer.y - 50 and 
-        shuttlecock.x > NET_X and 
-        abs(shuttlecock.x - computer.x) < 100 and
-        computer.on_ground):
-        computer.move("jump")
+    jump = (shuttle_y < own_y - 50 and 
+            shuttle_x > NET_X and 
+            abs(shuttle_x - own_x) < 100 and
+            on_ground)
     
     # Decide whether to swing with improved timing
-    if (shuttlecock.x > NET_X and  # Shuttlecock on computer's side
-        abs(shuttlecock.x - (computer.x + computer.width / 2)) < 60 and  # Close horizontally
-        abs(shuttlecock.y - (computer.y + computer.height / 3)) < 60):  # Close vertically
+    swing = False
+    if (shuttle_x > NET_X and  # Shuttlecock on computer's side
+        abs(shuttle_x - (own_x + PLAYER_WIDTH / 2)) < swing_window and  # Close horizontally
+        abs(shuttle_y - (own_y + PLAYER_HEIGHT / 3)) < swing_window):  # Close vertically
         
         # Better timing based on shuttlecock trajectory
-        if shuttlecock.vy > 0 or abs(shuttlecock.y - computer.y) < 30:
-            return computer.swing()
-    return False
+        swing = shuttle_vy > 0 or abs(shuttle_y - own_y) < 30
+    return FrameInput(move_left, not move_left, bool(jump), swing)
 
-# Draw court
-def draw_court():
+class RuleBasedController(Controller):
+    # The built-in computer opponent; jitter and swing_window are its
+    # accuracy knobs (see adaptive.py)
+    def __init__(self, predictor=None, rng=random, jitter=AI_JITTER, swing_window=HIT_REACH):
+        self.predictor = predictor
+        self.rng = rng
+        self.jitter = jitter
+        self.swing_window = swing_window
+        if isinstance(rng, GameRNG):
+            # Usually the match's own stream, which the snapshot holds anyway
+            self.state_record = "Q"
+    
+    def act(self, observation):
+        return rule_based_action(observation, self.predictor, self.rng, self.jitter, self.swing_window)
+    
+    def get_state(self):
+        return (self.rng.state,) if self.state_record else ()
+    
+    def set_state(self, values):
+        if self.state_record:
+            self.rng.state = values[0]
+
+# Decide and move in one call; returns True if the computer swung
+def computer_ai(shuttlecock, computer, predictor=None, rng=random):
+    return apply_action(computer, rule_based_action(observe(computer, None, shuttlecock), predictor, rng))
+
+# Snapshot record layout (little endian, no padding): frame, RNG state, game
+# state, scores, serving, rally started, rally count and last hit position
+# (NaN before the first hit); then x, y, jump speed, speed, on ground,
+# swinging and the two cooldowns for each player; then x, y, vx, vy for each
+# shuttlecock; then each controller's state_record. A singles match against
+# the rule-based AI packs into 159 bytes.
+_MATCH_RECORD = "QQBHH??Idd"
+_PLAYER_RECORD = "dddd??hh"
+_SHUTTLE_RECORD = "dddd"
+_MATCH_FIELDS = len(_MATCH_RECORD)
+_PLAYER_FIELDS = len(_PLAYER_RECORD)
+_NO_HIT_POS = (math.nan, math.nan)
+
+# Headless match simulation - all game rules, no rendering. In doubles each
+# side has a second, AI-driven player sharing the half with the first (the
+# front player covers the forecourt, the first player the whole half for
+# the human and the back court for the computer). In a drill several
+# shuttlecocks are in play at once and a landed one is scored and
+# relaunched without stopping play.
+DIFFICULTIES = ("normal", "hard", "adaptive")
+
+
+class MatchSimulator:
+    def __init__(self, winning_score=winning_score, predictor=None, seed=None, player_ai=False,
+                 player_controller=None, computer_controller=None, doubles=False, shuttles=1,
+                 profiler=None, difficulty="normal", ai_budget=None, calibration=None):
+        self.winning_score = winning_score
+        self.profiler = profiler if profiler is not None else _NO_PROFILER
+        self.predictor = predictor  # Landing predictor for the computer AI
+        # Every random gameplay decision comes from this one seeded stream, so
+        # the same seed and inputs always replay the same match
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.rng = GameRNG(self.seed)
+        # The left player follows FrameInputs passed to step() unless a
+        # controller drives it; player_ai=True is shorthand for the built-in
+        # AI on the left (AI vs AI)
+        if player_controller is None and player_ai:
+            player_controller = RuleBasedController(predictor, self.rng)
+        if difficulty not in DIFFICULTIES:
+            raise ValueError(f"difficulty must be one of {', '.join(DIFFICULTIES)}, not {difficulty!r}")
+        if computer_controller is None:
+            if difficulty != "normal":
+                # Lookahead search (see search_ai.py); without ai_budget its
+                # plans depend only on the match, so replays stay exact
+                from search_ai import LookaheadController
+                computer_controller = LookaheadController(predictor, self.rng, budget=ai_budget)
+            else:
+                computer_controller = RuleBasedController(predictor, self.rng)
+        self.difficulty = difficulty
+        self.player_controller = player_controller
+        self.computer_controller = computer_controller
+        self.player = Player(COURT_LEFT + 50, FLOOR_Y - PLAYER_HEIGHT)
+        self.computer = Player(COURT_RIGHT - 50 - PLAYER_WIDTH, FLOOR_Y - PLAYER_HEIGHT, is_computer=True)
+        self.doubles = doubles
+        self.teammates = []  # (Player, Controller) for the doubles partners
+        if doubles:
+            half = (NET_X - COURT_LEFT) // 2
+            partner = Player(NET_X - PLAYER_WIDTH - 60, FLOOR_Y - PLAYER_HEIGHT)
+            partner.min_x = COURT_LEFT + half
+            rival = Player(NET_X + 60, FLOOR_Y - PLAYER_HEIGHT, is_computer=True)
+            rival.max_x = NET_X + half - PLAYER_WIDTH
+            self.computer.min_x = NET_X + half
+            self.teammates = [(partner, RuleBasedController(predictor, self.rng)),
+                              (rival, RuleBasedController(predictor, self.rng))]
+        self.left_team = [self.player] + [p for p, _ in self.teammates if not p.is_computer]
+        self.right_team = [self.computer] + [p for p, _ in self.teammates if p.is_computer]
+        self.bodies = self.left_team + self.right_team
+        self.shuttles = [Shuttlecock(self.rng) for _ in range(shuttles)]
+        self.shuttlecock = self.shuttles[0]
+        self.grid = UniformGrid()
+        self._grid_frame = -1
+        self.game_state = MENU
+        self.player_score = 0
+        self.computer_score = 0
+        self.serving = True  # Player serves first
+        self.rally_started = False
+        self.rally_count = 0  # Count consecutive hits
+        self.last_hit_pos = None
+        self.frame = 0
+        self.events = []
+        self._controllers = [controller for controller in
+                             [player_controller, computer_controller] + [c for _, c in self.teammates]
+                             if controller is not None]
+        self._record = struct.Struct("<" + _MATCH_RECORD + _PLAYER_RECORD * len(self.bodies) +
+                                     _SHUTTLE_RECORD * len(self.shuttles) +
+                                     "".join(c.state_record for c in self._controllers))
+        self.snapshot_size = self._record.size
+        self.adaptive = None
+        if difficulty == "adaptive":
+            # The lookahead AI, retuned after every point from how the
+            # player is doing (see adaptive.py)
+            from adaptive import AdaptiveDifficulty
+            self.adaptive = AdaptiveDifficulty(self, calibration)
+    
+    def set_predictor(self, predictor):
+        # Attach a landing predictor after construction, for the built-in AI
+        # too (the client builds its table while the menu is up)
+        self.predictor = predictor
+        controllers = [self.player_controller, self.computer_controller]
+        for controller in controllers + [c for _, c in self.teammates]:
+            if isinstance(controller, RuleBasedController):
+                controller.predictor = predictor
+    
+    def snapshot(self, out=None):
+        # The whole match state packed into a flat binary record of
+        # snapshot_size bytes (written into `out` when given, so a caller can
+        # reuse preallocated buffers); restore() puts it back. The same
+        # snapshot and inputs always step to the same match, as long as every
+        # controller that remembers anything between frames records it in
+        # its state_record (the built-in and lookahead AIs do; SkillProxy's
+        # delay line and the batch policies' NumPy generators are not kept,
+        # so matches they play are not restored mid-way). Adaptive
+        # difficulty's state is not kept either, and restore() refuses it.
+        values = [self.frame, self.rng.state, self.game_state, self.player_score,
+                  self.computer_score, self.serving, self.rally_started, self.rally_count]
+        values += self.last_hit_pos or _NO_HIT_POS
+        for body in self.bodies:
+            values += (body.x, body.y, body.jump_speed, body.speed, body.on_ground, body.swinging,
+                       body.swing_cooldown, body.jump_cooldown)
+        for shuttle in self.shuttles:
+            values += (shuttle.x, shuttle.y, shuttle.vx, shuttle.vy)
+        for controller in self._controllers:
+            values += controller.get_state()
+        if out is None:
+            return self._record.pack(*values)
+        self._record.pack_into(out, 0, *values)
+        return out
+    
+    def restore(self, snapshot):
+        if self.adaptive is not None:
+            raise ValueError("adaptive difficulty matches cannot be restored from a snapshot")
+        values = self._record.unpack_from(snapshot)
+        (self.frame, self.rng.state, self.game_state, self.player_score, self.computer_score,
+         self.serving, self.rally_started, self.rally_count, hit_x, hit_y) = values[:_MATCH_FIELDS]
+        self.last_hit_pos = None if hit_x != hit_x else (hit_x, hit_y)  # NaN marks "no hit yet"
+        i = _MATCH_FIELDS
+        for body in self.bodies:
+            (body.x, body.y, body.jump_speed, body.speed, body.on_ground, body.swinging,
+             body.swing_cooldown, body.jump_cooldown) = values[i:i + _PLAYER_FIELDS]
+            i += _PLAYER_FIELDS
+        for shuttle in self.shuttles:
+            shuttle.x, shuttle.y, shuttle.vx, shuttle.vy = values[i:i + 4]
+            i += 4
+        for controller in self._controllers:
+            fields = len(controller.state_record)
+            controller.set_state(values[i:i + fields])
+            i += fields
+        self._grid_frame = -1  # The grid may hold positions from another timeline
+        self.events = []
+    
+    def reset_game(self):
+        self.player_score = 0
+        self.computer_score = 0
+        self.serving = True  # Player serves first
+        self.rally_started = False
+        self.rally_count = 0
+        self.game_state = SERVE
+        self._reset_shuttles()
+        for body in self.bodies:
+            body.x = body.start_x
+    
+    def _reset_shuttles(self):
+        # Serve position for the main shuttlecock; drill shuttlecocks wait mid-court
+        self.shuttlecock.reset(True, self.serving)
+        for shuttle in self.shuttles[1:]:
+            shuttle.reset(False)
+    
+    def _hit(self, hitter, power=10, serve=False, shuttle=None, aim=None):
+        smash = not hitter.on_ground
+        if aim is not None and not hitter.is_computer:
+            aim = 2 * NET_X - aim  # Controllers aim in their mirrored frame
+        shuttle = shuttle or self.shuttlecock
+        shuttle.hit(hitter, power, aim)
+        if hitter.is_computer:
+            self.last_hit_pos = (hitter.x, hitter.y + hitter.height // 2)
+        else:
+            self.last_hit_pos = (hitter.x + hitter.width, hitter.y + hitter.height // 2)
+        if not serve:
+            self.rally_count += 1
+        self.events.append(GameEvent("serve" if serve else "hit", hitter,
+                                     self.last_hit_pos[0], self.last_hit_pos[1], smash,
+                                     shuttle.vx, shuttle.vy))
+    
+    def shuttle_in_reach(self, hitter):
+        # The shuttlecock on the hitter's side closest to its racket within
+        # HIT_REACH, or None. With many shuttlecocks the candidates come from
+        # the grid, rebuilt once per step because shuttlecocks only move at
+        # the end of a step (see benchmarks.bench_broadphase for the crossover).
+        if len(self.shuttles) < GRID_MIN_SHUTTLES:
+            candidates = self.shuttles
+        else:
+            if self._grid_frame != self.frame:
+                self.grid.clear()
+                for shuttle in self.shuttles:
+                    self.grid.insert(shuttle, shuttle.x, shuttle.y)
+                self._grid_frame = self.frame
+            reach_x, reach_y = hitter.reach_point()
+            candidates = self.grid.query(reach_x - HIT_REACH, reach_y - HIT_REACH,
+                                         reach_x + HIT_REACH, reach_y + HIT_REACH)
+        reach_x, reach_y = hitter.reach_point()
+        best, best_dx = None, math.inf
+        for shuttle in candidates:
+            if ((shuttle.x > NET_X) if hitter.is_computer else (shuttle.x < NET_X)):
+                dx = abs(shuttle.x - reach_x)
+                if (dx < HIT_REACH and  # Close horizontally
+                    abs(shuttle.y - reach_y) < HIT_REACH and  # Close vertically
+                    dx < best_dx):
+                    best, best_dx = shuttle, dx
+        return best
+    
+    def focus(self, body):
+        # The shuttlecock a controller should play: on its side or heading
+        # there, nearest first
+        if len(self.shuttles) == 1:
+            return self.shuttlecock
+        center = body.x + body.width / 2
+        return min(self.shuttles, key=lambda s: ((s.x > NET_X) != body.is_computer,
+                                                 (s.vx > 0) != body.is_computer,
+                                                 abs(s.x - center)))
+    
+    def _drivers(self):
+        # Controller-driven players in the order they act each frame
+        drivers = []
+        if self.player_controller is not None:
+            drivers.append((self.player, self.player_controller, self.computer))
+        drivers += [(p, c, self.computer) for p, c in self.teammates if not p.is_computer]
+        drivers.append((self.computer, self.computer_controller, self.player))
+        drivers += [(p, c, self.player) for p, c in self.teammates if p.is_computer]
+        return drivers
+    
+    def step(self, inputs=NO_INPUT):
+        # Advance the match by one frame and return the events it produced
+        self.events = []
+        self.frame += 1
+        player = self.player
+        
+        if self.player_controller is not None and self.game_state in (MENU, SERVE, POINT_SCORED):
+            # A controller-driven player presses SPACE to start, serve and continue
+            inputs = FrameInput(swing=True)
+        
+        if inputs.swing:
+            if self.game_state == MENU:
+                self.game_state = SERVE
+                self._reset_shuttles()
+            
+            elif self.game_state == SERVE:
+                if self.serving:  # Player's serve
+                    self.rally_started = True
+                    player.swing()
+                    self._hit(player, 8, serve=True)  # Lighter hit for serve
+                else:
+                    # The computer's serve is already in the air from the reset
+                    shuttle = self.shuttlecock
+                    self.events.append(GameEvent("serve", self.computer, shuttle.x, shuttle.y, False,
+                                                 shuttle.vx, shuttle.vy))
+                self.game_state = PLAYING
+            
+            elif self.game_state == POINT_SCORED:
+                self.game_state = SERVE
+                self._reset_shuttles()
+                self.rally_count = 0  # Reset rally count
+        
+        if inputs.restart and self.game_state == GAME_OVER:
+            self.reset_game()
+        
+        if inputs.jump and (self.game_state == PLAYING or self.game_state == SERVE):
+            player.move("jump")
+        
+        if inputs.swing and self.game_state == PLAYING:
+            # Player swing - check if player can hit the shuttlecock
+            if player.swing():
+                target = self.shuttle_in_reach(player)
+                if target is not None:
+                    self.rally_started = True
+                    self._hit(player, shuttle=target)
+        
+        # Held keys for continuous movement
+        if self.game_state == PLAYING or self.game_state == SERVE:
+            if inputs.left:
+                player.move("left")
+            if inputs.right:
+                player.move("right")
+        
+        if self.game_state != PLAYING:
+            return self.events
+        
+        section = self.profiler.section
+        
+        # Update players
+        with section("player_update"):
+            for body in self.bodies:
+                body.update()
+        
+        # Controllers: the left side (if it is not keyboard driven), then the computer
+        with section("ai"):
+            for body, controller, opponent in self._drivers():
+                action = controller.act(observe(body, opponent, self.focus(body)))
+                if apply_action(body, action):
+                    target = self.shuttle_in_reach(body)
+                    if target is not None:
+                        if not body.is_computer:
+                            self.rally_started = True
+                        self._hit(body, shuttle=target, aim=action.aim)
+        
+        # Update shuttlecocks and check if one hit the net or the floor
+        with section("shuttle_update"):
+            landed = [shuttle for shuttle in self.shuttles if shuttle.update()]
+        for shuttle in self.shuttles:
+            if shuttle.net_hits:
+                shuttle.net_hits = 0
+                self.events.append(GameEvent("net", None, shuttle.x, shuttle.y, False))
+        for shuttle in landed:
+            self._score(shuttle)
+            if self.game_state != PLAYING:
+                break
+        
+        if self.adaptive is not None:
+            self.adaptive.update(self.events)
+        return self.events
+    
+    def _score(self, shuttle):
+        self.events.append(GameEvent("floor", None, shuttle.x, FLOOR_Y, False))
+        
+        # Determine who scored
+        if shuttle.x < NET_X:
+            self.computer_score += 1
+            self.serving = False  # Computer serves next
+            scorer = self.computer
+        else:
+            self.player_score += 1
+            self.serving = True  # Player serves next
+            scorer = self.player
+        self.events.append(GameEvent("point", scorer, shuttle.x, FLOOR_Y, False))
+        
+        if len(self.shuttles) > 1:
+            # Drill: relaunch this shuttlecock and keep playing
+            shuttle.reset(False)
+            self.rally_count = 0
+        else:
+            self.game_state = POINT_SCORED
+        
+        # Check for game over
+        if self.player_score >= self.winning_score or self.computer_score >= self.winning_score:
+            self.game_state = GAME_OVER
+            self.events.append(GameEvent("game_over", scorer, shuttle.x, FLOOR_Y, False))
+
+# Paint the static court (background, lines, net, posts, shadow) onto a surface
+def render_court(surface):
     # Court background with gradient
     for y in range(COURT_TOP, COURT_BOTTOM):
         # Create a gradient from darker to lighter green
         color_value = 60 + int(30 * (y - COURT_TOP) / COURT_HEIGHT)
         court_color = (60, color_value, 113)
-        pygame.draw.line(screen, court_color, (COURT_LEFT, y), (COURT_RIGHT, y))
+        pygame.draw.line(surface, court_color, (COURT_LEFT, y), (COURT_RIGHT, y))
     
     # Court border
-    pygame.draw.rect(screen, COURT_LINES, (COURT_LEFT, COURT_TOP, COURT_WIDTH, COURT_HEIGHT), 3)
+    pygame.draw.rect(surface, COURT_LINES, (COURT_LEFT, COURT_TOP, COURT_WIDTH, COURT_HEIGHT), 3)
     
     # Net with texture
-    net_rect = pygame.Rect(NET_X - NET_WIDTH // 2, NET_TOP, NET_WIDTH, NET_HEIGHT)
-    pygame.draw.rect(screen, NET_COLOR, net_rect)
+    pygame.draw.rect(surface, NET_COLOR, NET_RECT)
     
     # Net texture (horizontal lines)
     for y in range(NET_TOP, NET_TOP + NET_HEIGHT, 10):
-        pygame.draw.line(screen, (180, 180, 180), (NET_X - NET_WIDTH // 2, y), 
+        pygame.draw.line(surface, (180, 180, 180), (NET_X - NET_WIDTH // 2, y), 
                         (NET_X + NET_WIDTH // 2, y), 1)
     
     # Net post
-    pygame.draw.rect(screen, (150, 75, 0), (NET_X - NET_WIDTH // 2 - 5, NET_TOP - 10, 10, NET_HEIGHT + 10))
-    pygame.draw.rect(screen, (150, 75, 0), (NET_X + NET_WIDTH // 2 - 5, NET_TOP - 10, 10, NET_HEIGHT + 10))
+    pygame.draw.rect(surface, (150, 75, 0), (NET_X - NET_WIDTH // 2 - 5, NET_TOP - 10, 10, NET_HEIGHT + 10))
+    pygame.draw.rect(surface, (150, 75, 0), (NET_X + NET_WIDTH // 2 - 5, NET_TOP - 10, 10, NET_HEIGHT + 10))
     
     # Service lines
     service_y = COURT_TOP + COURT_HEIGHT // 3
-    pygame.draw.line(screen, COURT_LINES, (COURT_LEFT, service_y), (COURT_RIGHT, service_y), 2)
+    pygame.draw.line(surface, COURT_LINES, (COURT_LEFT, service_y), (COURT_RIGHT, service_y), 2)
     
     # Center line
-    pygame.draw.line(screen, COURT_LINES, (NET_X, COURT_TOP), (NET_X, service_y), 2)
+    pygame.draw.line(surface, COURT_LINES, (NET_X, COURT_TOP), (NET_X, service_y), 2)
     
     # Service boxes
     mid_left = (COURT_LEFT + NET_X) // 2
     mid_right = (NET_X + COURT_RIGHT) // 2
-    pygame.draw.line(screen, COURT_LINES, (mid_left, COURT_TOP), (mid_left, service_y), 1)
-    pygame.draw.line(screen, COURT_LINES, (mid_right, COURT_TOP), (mid_right, service_y), 1)
+    pygame.draw.line(surface, COURT_LINES, (mid_left, COURT_TOP), (mid_left, service_y), 1)
+    pygame.draw.line(surface, COURT_LINES, (mid_right, COURT_TOP), (mid_right, service_y), 1)
     
     # Court markings for better visual reference
     for x in range(COURT_LEFT, COURT_RIGHT, 50):
-        pygame.draw.line(screen, (70, 160, 120), (x, COURT_BOTTOM - 5), (x, COURT_BOTTOM), 1)
+        pygame.draw.line(surface, (70, 160, 120), (x, COURT_BOTTOM - 5), (x, COURT_BOTTOM), 1)
         
     # Draw shadows
     shadow_surface = pygame.Surface((COURT_WIDTH, 20), pygame.SRCALPHA)
     shadow_surface.fill((0, 0, 0, 30))
-    screen.blit(shadow_surface, (COURT_LEFT, COURT_BOTTOM - 15))
+    surface.blit(shadow_surface, (COURT_LEFT, COURT_BOTTOM - 15))
+
+# Pre-rendered court layer. Nothing on the court moves, so it is painted once
+# into a cached surface and blitted each frame; the cache is rebuilt only when
+# the court geometry or the frame size changes. It is painted in logical units
+# and scaled to the frame.
+court_layer = None
+court_layer_key = None
+
+def draw_court():
+    global court_layer, court_layer_key
+    key = (screen.get_size(), COURT_LEFT, COURT_TOP, COURT_WIDTH, COURT_HEIGHT,
+           NET_X, NET_TOP, NET_WIDTH, NET_HEIGHT)
+    if key != court_layer_key:
+        court_layer = pygame.Surface((WIDTH, HEIGHT))
+        court_layer.fill(BLACK)
+        render_court(court_layer)
+        if court_layer.get_size() != screen.get_size():
+            court_layer = pygame.transform.smoothscale(court_layer, screen.get_size())
+        court_layer = court_layer.convert(screen)
+        court_layer_key = key
+    screen.blit(court_layer, (0, 0))
 
 # Draw scores and game info
-def draw_ui():
+def draw_ui(sim):
+    game_state = sim.game_state
+    player_score = sim.player_score
+    computer_score = sim.computer_score
+    player = sim.player
+    computer = sim.computer
+    
     # Draw scores with better styling
     score_bg = pygame.Rect(10, 10, 180, 40)
-    pygame.draw.rect(screen, (0, 0, 0, 128), score_bg, border_radius=10)
-    pygame.draw.rect(screen, (255, 255, 255), score_bg, 2, border_radius=10)
+    pygame.draw.rect(screen, (0, 0, 0, 128), view_rect(score_bg), border_radius=px_width(10))
+    pygame.draw.rect(screen, (255, 255, 255), view_rect(score_bg), px_width(2), border_radius=px_width(10))
     
     computer_score_bg = pygame.Rect(WIDTH - 190, 10, 180, 40)
-    pygame.draw.rect(screen, (0, 0, 0, 128), computer_score_bg, border_radius=10)
-    pygame.draw.rect(screen, (255, 255, 255), computer_score_bg, 2, border_radius=10)
+    pygame.draw.rect(screen, (0, 0, 0, 128), view_rect(computer_score_bg), border_radius=px_width(10))
+    pygame.draw.rect(screen, (255, 255, 255), view_rect(computer_score_bg), px_width(2), border_radius=px_width(10))
     
-    player_text = font.render(f"Player: {player_score}", True, TEXT_COLOR)
-    computer_text = font.render(f"Computer: {computer_score}", True, TEXT_COLOR)
-    screen.blit(player_text, (20, 15))
-    screen.blit(computer_text, (WIDTH - 180, 15))
+    # Score labels come from the text cache, so they only re-render when a score changes
+    player_text = text_cache.render(font, f"Player: {player_score}", TEXT_COLOR)
+    computer_text = text_cache.render(font, f"Computer: {computer_score}", TEXT_COLOR)
+    screen.blit(player_text, view_pos(20, 15))
+    screen.blit(computer_text, view_pos(WIDTH - 180, 15))
     
     # Draw game state messages
     if game_state == MENU:
         # Draw a semi-transparent overlay
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        screen.blit(overlay, (0, 0))
+        screen.blit(overlay_layer(180), (0, 0))
         
         # Draw title with shadow effect
-        title_shadow = large_font.render("BADMINTON CHAMPIONSHIP", True, (0, 0, 0))
-        title = large_font.render("BADMINTON CHAMPIONSHIP", True, (255, 215, 0))  # Gold color
-        screen.blit(title_shadow, (WIDTH // 2 - title.get_width() // 2 + 3, HEIGHT // 3 + 3))
-        screen.blit(title, (WIDTH // 2 - title.get_width() // 2, HEIGHT // 3))
+        title_shadow = text_cache.render(large_font, "BADMINTON CHAMPIONSHIP", (0, 0, 0))
+        title = text_cache.render(large_font, "BADMINTON CHAMPIONSHIP", (255, 215, 0))  # Gold color
+        screen.blit(title_shadow, (px(WIDTH // 2 + 3) - title.get_width() // 2, px(HEIGHT // 3 + 3)))
+        screen.blit(title, (px(WIDTH // 2) - title.get_width() // 2, px(HEIGHT // 3)))
         
         # Draw animated start button
         button_width, button_height = 250, 60
@@ -463,21 +1388,22 @@ def draw_ui():
         button_y = HEIGHT // 2
         
         # Check if mouse is hovering over button
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = mouse_position()
         button_rect = pygame.Rect(button_x, button_y, button_width, button_height)
         button_color = BUTTON_HOVER_COLOR if button_rect.collidepoint(mouse_pos) else BUTTON_COLOR
         
         # Draw button with pulsing effect
-        pulse = math.sin(pygame.time.get_ticks() * 0.005) * 5 + 5
-        pygame.draw.rect(screen, button_color, (button_x - pulse/2, button_y - pulse/2, 
-                                              button_width + pulse, button_height + pulse), 
-                        border_radius=15)
-        pygame.draw.rect(screen, (255, 255, 255), (button_x - pulse/2, button_y - pulse/2, 
-                                                 button_width + pulse, button_height + pulse), 
-                        3, border_radius=15)
+        pulse = math.sin(ui_ticks() * 0.005) * 5 + 5
+        pygame.draw.rect(screen, button_color, view_rect((button_x - pulse/2, button_y - pulse/2, 
+                                                        button_width + pulse, button_height + pulse)), 
+                        border_radius=px_width(15))
+        pygame.draw.rect(screen, (255, 255, 255), view_rect((button_x - pulse/2, button_y - pulse/2, 
+                                                           button_width + pulse, button_height + pulse)), 
+                        px_width(3), border_radius=px_width(15))
         
-        start_text = font.render("Press SPACE to Start", True, (255, 255, 255))
-        screen.blit(start_text, (WIDTH // 2 - start_text.get_width() // 2, button_y + button_height // 2 - start_text.get_height() // 2))
+        start_text = text_cache.render(font, "Press SPACE to Start", (255, 255, 255))
+        screen.blit(start_text, (px(WIDTH // 2) - start_text.get_width() // 2,
+                                 px(button_y + button_height // 2) - start_text.get_height() // 2))
         
         # Draw instructions
         instructions = [
@@ -489,102 +1415,86 @@ def draw_ui():
         ]
         
         for i, line in enumerate(instructions):
-            instr_text = pygame.font.SysFont(None, 28).render(line, True, (200, 200, 200))
-            screen.blit(instr_text, (WIDTH // 2 - instr_text.get_width() // 2, HEIGHT // 2 + 100 + i * 30))
+            instr_text = text_cache.render(small_font, line, (200, 200, 200))
+            screen.blit(instr_text, (px(WIDTH // 2) - instr_text.get_width() // 2, px(HEIGHT // 2 + 100 + i * 30)))
     
     elif game_state == SERVE:
         # Draw serve indicator
         serve_bg = pygame.Rect(WIDTH // 2 - 200, 10, 400, 40)
-        pygame.draw.rect(screen, (0, 0, 0, 150), serve_bg, border_radius=10)
-        pygame.draw.rect(screen, (255, 255, 255), serve_bg, 2, border_radius=10)
+        pygame.draw.rect(screen, (0, 0, 0, 150), view_rect(serve_bg), border_radius=px_width(10))
+        pygame.draw.rect(screen, (255, 255, 255), view_rect(serve_bg), px_width(2), border_radius=px_width(10))
         
-        if serving:
-            serve_text = font.render("Player to Serve - Press SPACE", True, (255, 255, 255))
+        if sim.serving:
+            serve_text = text_cache.render(font, "Player to Serve - Press SPACE", (255, 255, 255))
         else:
-            serve_text = font.render("Computer to Serve", True, (255, 255, 255))
-        screen.blit(serve_text, (WIDTH // 2 - serve_text.get_width() // 2, 15))
+            serve_text = text_cache.render(font, "Computer to Serve", (255, 255, 255))
+        screen.blit(serve_text, (px(WIDTH // 2) - serve_text.get_width() // 2, px(15)))
         
         # Draw arrow indicating serve direction
-        if serving:
+        if sim.serving:
             arrow_start = (player.x + player.width + 10, player.y + player.height // 2)
             arrow_end = (arrow_start[0] + 50, arrow_start[1] - 30)
-            pygame.draw.line(screen, (255, 255, 0), arrow_start, arrow_end, 3)
+            pygame.draw.line(screen, (255, 255, 0), view_pos(*arrow_start), view_pos(*arrow_end), px_width(3))
             pygame.draw.polygon(screen, (255, 255, 0), [
-                (arrow_end[0], arrow_end[1]),
-                (arrow_end[0] - 10, arrow_end[1] - 5),
-                (arrow_end[0] - 5, arrow_end[1] + 10)
+                view_pos(arrow_end[0], arrow_end[1]),
+                view_pos(arrow_end[0] - 10, arrow_end[1] - 5),
+                view_pos(arrow_end[0] - 5, arrow_end[1] + 10)
             ])
         else:
             arrow_start = (computer.x - 10, computer.y + computer.height // 2)
             arrow_end = (arrow_start[0] - 50, arrow_start[1] - 30)
-            pygame.draw.line(screen, (255, 255, 0), arrow_start, arrow_end, 3)
+            pygame.draw.line(screen, (255, 255, 0), view_pos(*arrow_start), view_pos(*arrow_end), px_width(3))
             pygame.draw.polygon(screen, (255, 255, 0), [
-                (arrow_end[0], arrow_end[1]),
-                (arrow_end[0] + 10, arrow_end[1] - 5),
-                (arrow_end[0] + 5, arrow_end[1] + 10)
+                view_pos(arrow_end[0], arrow_end[1]),
+                view_pos(arrow_end[0] + 10, arrow_end[1] - 5),
+                view_pos(arrow_end[0] + 5, arrow_end[1] + 10)
             ])
     
     elif game_state == POINT_SCORED:
         # Draw a semi-transparent overlay
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 120))
-        screen.blit(overlay, (0, 0))
+        screen.blit(overlay_layer(120), (0, 0))
         
-        # Draw point scored message with animation
-        scale = 1 + math.sin(pygame.time.get_ticks() * 0.01) * 0.1
+        # Draw point scored message with animation, rounding the scale so the
+        # scaled text can be reused from the cache
+        scale = round(1 + math.sin(ui_ticks() * 0.01) * 0.1, 2)
         
-        if serving:  # Player scored
-            point_text = large_font.render("Player Scored!", True, (255, 215, 0))
+        if sim.serving:  # Player scored
+            scaled_text = text_cache.render(large_font, "Player Scored!", (255, 215, 0), scale)
         else:  # Computer scored
-            point_text = large_font.render("Computer Scored!", True, (255, 215, 0))
-            
-        # Apply scaling to text
-        scaled_text = pygame.transform.scale(point_text, 
-                                           (int(point_text.get_width() * scale), 
-                                            int(point_text.get_height() * scale)))
+            scaled_text = text_cache.render(large_font, "Computer Scored!", (255, 215, 0), scale)
         
-        screen.blit(scaled_text, (WIDTH // 2 - scaled_text.get_width() // 2, HEIGHT // 3))
+        screen.blit(scaled_text, (px(WIDTH // 2) - scaled_text.get_width() // 2, px(HEIGHT // 3)))
         
         # Draw continue button
         button_width, button_height = 300, 50
         button_x = WIDTH // 2 - button_width // 2
         button_y = HEIGHT // 2 + 50
         
-        pygame.draw.rect(screen, BUTTON_COLOR, (button_x, button_y, button_width, button_height), border_radius=10)
-        pygame.draw.rect(screen, (255, 255, 255), (button_x, button_y, button_width, button_height), 2, border_radius=10)
+        screen.blit(button_layer(button_width, button_height, BUTTON_COLOR), view_pos(button_x, button_y))
         
-        continue_text = font.render("Press SPACE to Continue", True, (255, 255, 255))
-        screen.blit(continue_text, (WIDTH // 2 - continue_text.get_width() // 2, button_y + button_height // 2 - continue_text.get_height() // 2))
+        continue_text = text_cache.render(font, "Press SPACE to Continue", (255, 255, 255))
+        screen.blit(continue_text, (px(WIDTH // 2) - continue_text.get_width() // 2,
+                                    px(button_y + button_height // 2) - continue_text.get_height() // 2))
     
     elif game_state == GAME_OVER:
         # Draw a semi-transparent overlay
-        overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        screen.blit(overlay, (0, 0))
+        screen.blit(overlay_layer(180), (0, 0))
         
         # Draw game over message with trophy icon
         if player_score > computer_score:
-            winner_text = large_font.render("Player Wins!", True, (255, 215, 0))
+            winner_text = text_cache.render(large_font, "Player Wins!", (255, 215, 0))
             # Draw trophy
             trophy_x = WIDTH // 2
             trophy_y = HEIGHT // 3 - 80
-            # Trophy cup
-            pygame.draw.ellipse(screen, (255, 215, 0), (trophy_x - 40, trophy_y, 80, 40))
-            pygame.draw.rect(screen, (255, 215, 0), (trophy_x - 30, trophy_y + 40, 60, 60))
-            # Trophy handles
-            pygame.draw.ellipse(screen, (255, 215, 0), (trophy_x - 60, trophy_y + 10, 30, 20))
-            pygame.draw.ellipse(screen, (255, 215, 0), (trophy_x + 30, trophy_y + 10, 30, 20))
-            # Trophy base
-            pygame.draw.rect(screen, (255, 215, 0), (trophy_x - 20, trophy_y + 100, 40, 20))
-            pygame.draw.rect(screen, (255, 215, 0), (trophy_x - 30, trophy_y + 120, 60, 10))
+            screen.blit(ui_layer("trophy", (120, 130), paint_trophy), view_pos(trophy_x - 60, trophy_y))
         else:
-            winner_text = large_font.render("Computer Wins!", True, (255, 100, 100))
+            winner_text = text_cache.render(large_font, "Computer Wins!", (255, 100, 100))
         
-        screen.blit(winner_text, (WIDTH // 2 - winner_text.get_width() // 2, HEIGHT // 3))
+        screen.blit(winner_text, (px(WIDTH // 2) - winner_text.get_width() // 2, px(HEIGHT // 3)))
         
         # Draw final score
-        score_text = font.render(f"Final Score: Player {player_score} - {computer_score} Computer", True, (255, 255, 255))
-        screen.blit(score_text, (WIDTH // 2 - score_text.get_width() // 2, HEIGHT // 2))
+        score_text = text_cache.render(font, f"Final Score: Player {player_score} - {computer_score} Computer", (255, 255, 255))
+        screen.blit(score_text, (px(WIDTH // 2) - score_text.get_width() // 2, px(HEIGHT // 2)))
         
         # Draw restart button
         button_width, button_height = 200, 50
@@ -592,283 +1502,643 @@ def draw_ui():
         button_y = HEIGHT // 2 + 80
         
         # Check if mouse is hovering over button
-        mouse_pos = pygame.mouse.get_pos()
+        mouse_pos = mouse_position()
         button_rect = pygame.Rect(button_x, button_y, button_width, button_height)
         button_color = BUTTON_HOVER_COLOR if button_rect.collidepoint(mouse_pos) else BUTTON_COLOR
         
-        pygame.draw.rect(screen, button_color, button_rect, border_radius=10)
-        pygame.draw.rect(screen, (255, 255, 255), button_rect, 2, border_radius=10)
-        
-        restart_text = font.render("Play Again (R)", True, (255, 255, 255))
-        screen.blit(restart_text, (WIDTH // 2 - restart_text.get_width() // 2, button_y + button_height // 2 - restart_text.get_height() // 2))
-
-# Reset game
-def reset_game():
-    global game_state, player_score, computer_score, serving, rally_started
-    player_score = 0
-    computer_score = 0
-    serving = True  # Player serves first
-    rally_started = False
-    game_state = SERVE
-    shuttlecock.reset(True, serving)
-    player.x = COURT_LEFT + 50
-    computer.x = COURT_RIGHT - 50 - PLAYER_WIDTH
-
-# Main game loop
-clock = pygame.time.Clock()
-running = True
-
-# Add sound effects (commented out for now)
-# try:
-#     pygame.mixer.init()
-#     hit_sound = pygame.mixer.Sound('hit.wav')
-#     net_hit_sound = pygame.mixer.Sound('net_hit.wav')
-#     point_sound = pygame.mixer.Sound('point.wav')
-#     crowd_cheer = pygame.mixer.Sound('cheer.wav')
-#     pygame.mixer.music.load('background_music.mp3')
-#     pygame.mixer.music.set_volume(0.5)
-#     pygame.mixer.music.play(-1)  # Loop background music
-# except:
-#     print("Sound files not found. Game will run without sound.")
-
-# Particle system for visual effects
-particles = []
-
-# Function to add particles
-def add_particles(x, y, color, count=10, speed=3, size_range=(2, 5)):
-    for _ in range(count):
-        angle = random.uniform(0, 2 * math.pi)
-        speed_val = random.uniform(1, speed)
-        size = random.randint(size_range[0], size_range[1])
-        lifetime = random.randint(20, 60)  # Frames
-        particles.append({
-            'x': x,
-            'y': y,
-            'vx': math.cos(angle) * speed_val,
-            'vy': math.sin(angle) * speed_val,
-            'size': size,
-            'color': color,
-            'lifetime': lifetime
-        })
-
-# Function to update and draw particles
-def update_particles():
-    to_remove = []
-    for i, particle in enumerate(particles):
-        # Update position
-        particle['x'] += particle['vx']
-        particle['y'] += particle['vy']
-        
-        # Apply gravity and fade
-        particle['vy'] += 0.1
-        particle['lifetime'] -= 1
-        
-        # Draw particle
-        alpha = min(255, int(255 * (particle['lifetime'] / 60)))
-        color = list(particle['color'])
-        if len(color) == 3:
-            color.append(alpha)
-        else:
-            color[3] = alpha
-            
-        # Create surface with alpha
-        particle_surface = pygame.Surface((particle['size'] * 2, particle['size'] * 2), pygame.SRCALPHA)
-        pygame.draw.circle(particle_surface, color, (particle['size'], particle['size']), particle['size'])
-        screen.blit(particle_surface, (particle['x'] - particle['size'], particle['y'] - particle['size']))
-        
-        # Mark for removal if lifetime is over
-        if particle['lifetime'] <= 0:
-            to_remove.append(i)
-    
-    # Remove dead particles
-    for i in sorted(to_remove, reverse=True):
-        if i < len(particles):
-            particles.pop(i)
-
-# Game variables for visual effects
-last_hit_pos = None
-rally_count = 0  # Count consecutive hits
-combo_display_time = 0
-
-while running:
-    # Event handling
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
-                running = False
-            
-            if event.key == pygame.K_SPACE:
-                if game_state == MENU:
-                    game_state = SERVE
-                    shuttlecock.reset(True, serving)
-                
-                elif game_state == SERVE:
-                    if serving:  # Player's serve
-                        rally_started = True
-                        player.swing()
-                        shuttlecock.hit(player, 8)  # Lighter hit for serve
-                        last_hit_pos = (player.x + player.width, player.y + player.height // 2)
-                        add_particles(last_hit_pos[0], last_hit_pos[1], (255, 165, 0), 15)
-                    game_state = PLAYING
-                
-                elif game_state == POINT_SCORED:
-                    game_state = SERVE
-                    shuttlecock.reset(True, serving)
-                    rally_count = 0  # Reset rally count
-            
-            if event.key == pygame.K_r and game_state == GAME_OVER:
-                reset_game()
-                rally_count = 0
-            
-            if event.key == pygame.K_UP and (game_state == PLAYING or game_state == SERVE):
-                player.move("jump")
-            
-            if game_state == PLAYING:
-                if event.key == pygame.K_SPACE:
-                    # Player swing
-                    if player.swing() and not player.is_computer:
-                        # Check if player can hit the shuttlecock
-                        if (shuttlecock.x < NET_X and  # Shuttlecock on player's side
-                            abs(shuttlecock.x - (player.x + player.width)) < 60 and  # Close horizontally
-                            abs(shuttlecock.y - (player.y + player.height / 2)) < 60):  # Close vertically
-                            
-                            shuttlecock.hit(player)
-                            rally_started = True
-                            rally_count += 1
-                            last_hit_pos = (player.x + player.width, player.y + player.height // 2)
-                            
-                            # Add hit particles
-                            if not player.on_ground:  # Jumping hit (smash)
-                                add_particles(last_hit_pos[0], last_hit_pos[1], (255, 100, 0), 25, 5)
-                            else:
-                                add_particles(last_hit_pos[0], last_hit_pos[1], (255, 165, 0), 15)
-                            
-                            # Update combo display
-                            if rally_count >= 3:
-                                combo_display_time = 120  # Show for 2 seconds
-        
-        # Mouse click for buttons
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            mouse_pos = pygame.mouse.get_pos()
-            
-            # Menu start button
-            if game_state == MENU:
-                button_width, button_height = 250, 60
-                button_x = WIDTH // 2 - button_width // 2
-                button_y = HEIGHT // 2
-                button_rect = pygame.Rect(button_x, button_y, button_width, button_height)
-                
-                if button_rect.collidepoint(mouse_pos):
-                    game_state = SERVE
-                    shuttlecock.reset(True, serving)
-            
-            # Game over restart button
-            elif game_state == GAME_OVER:
-                button_width, button_height = 200, 50
-                button_x = WIDTH // 2 - button_width // 2
-                button_y = HEIGHT // 2 + 80
-                button_rect = pygame.Rect(button_x, button_y, button_width, button_height)
-                
-                if button_rect.collidepoint(mouse_pos):
-                    reset_game()
-                    rally_count = 0
-    
-    # Get keyboard state for continuous movement
-    keys = pygame.key.get_pressed()
-    if game_state == PLAYING or game_state == SERVE:
-        if keys[pygame.K_LEFT]:
-            player.move("left")
-        if keys[pygame.K_RIGHT]:
-            player.move("right")
-    
-    # Game logic
-    if game_state == PLAYING:
-        # Update player and computer
-        player.update()
-        computer.update()
-        
-        # Computer AI
-        if computer_ai() and shuttlecock.x > NET_X:
-            # Check if computer can hit the shuttlecock
-            if (abs(shuttlecock.x - computer.x) < 60 and  # Close horizontally
-                abs(shuttlecock.y - (computer.y + computer.height / 2)) < 60):  # Close vertically
-                
-                shuttlecock.hit(computer)
-                rally_count += 1
-                last_hit_pos = (computer.x, computer.y + computer.height // 2)
-                
-                # Add hit particles
-                if not computer.on_ground:  # Jumping hit
-                    add_particles(last_hit_pos[0], last_hit_pos[1], (100, 100, 255), 20, 4)
-                else:
-                    add_particles(last_hit_pos[0], last_hit_pos[1], (150, 150, 255), 15)
-                
-                # Update combo display
-                if rally_count >= 3:
-                    combo_display_time = 120  # Show for 2 seconds
-        
-        # Update shuttlecock
-        hit_floor = shuttlecock.update()
+        screen.blit(button_layer(button_width, button_height, button_color), view_pos(button_x, button_y))
         
-        # Check if shuttlecock hit the floor
-        if hit_floor:
-            # Add impact particles
-            add_particles(shuttlecock.x, FLOOR_Y, (200, 200, 200), 30, 3)
-            
-            # Determine who scored
-            if shuttlecock.x < NET_X:
-                # Computer scores
-                computer_score += 1
-                serving = False  # Computer serves next
-            else:
-                # Player scores
-                player_score += 1
-                serving = True  # Player serves next
-            
-            game_state = POINT_SCORED
-            
-            # Check for game over
-            if player_score >= winning_score or computer_score >= winning_score:
-                game_state = GAME_OVER
+        restart_text = text_cache.render(font, "Play Again (R)", (255, 255, 255))
+        screen.blit(restart_text, (px(WIDTH // 2) - restart_text.get_width() // 2,
+                                   px(button_y + button_height // 2) - restart_text.get_height() // 2))
+
+# Output resolution. The court keeps its shape in any window: it is drawn in
+# the largest WIDTH:HEIGHT area that fits (output_rect, letterboxed), at
+# render_scale times that area's resolution. At 1.0 frames are drawn straight
+# into the window. Below it the display surface itself is the smaller frame
+# and SDL's renderer stretches it to the window on the GPU (pygame.SCALED),
+# which saves fill rate (drawing cost falls roughly with the square of the
+# scale, see bench_render_scale() in benchmarks.py) at the price of a softer
+# picture. Without an accelerated renderer the stretch would be done in
+# software and cost more than it saves, so frames are drawn at 1.0 instead.
+RENDER_SCALE = 1.0
+MIN_RENDER_SCALE = 0.25
+output_rect = pygame.Rect(0, 0, WIDTH, HEIGHT)
+
+def parse_window_size(text):
+    # "1280x720" -> (1280, 720), for the --window option
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+# Switch the drawing code to a new view scale: fonts reopen themselves, and
+# everything cached at the old scale is dropped
+def set_view_scale(scale):
+    global view_scale, court_layer_key
+    if scale == view_scale:
+        return
+    view_scale = scale
+    text_cache.surfaces.clear()
+    sprite_atlas.sprites.clear()
+    ui_layers.clear()
+    profiler.overlay = None
+    court_layer_key = None
+
+# Open a display surface of render_scale times the window's court area
+# that SDL's renderer stretches (letterboxed) to the window. Returns False,
+# with nothing left open, when there is no accelerated renderer to do it.
+def _open_scaled_display(window_size, fullscreen, render_scale):
+    global window
+    if fullscreen:
+        window_size = pygame.display.get_desktop_sizes()[0]
+    fit = min(window_size[0] / WIDTH, window_size[1] / HEIGHT) * render_scale
+    frame_size = (max(1, round(WIDTH * fit)), max(1, round(HEIGHT * fit)))
+    if pygame.display.get_surface() is not None:
+        # The renderer needs a window of its own
+        pygame.display.quit()
+        pygame.display.init()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        try:
+            window = pygame.display.set_mode(frame_size, pygame.SCALED | (pygame.FULLSCREEN if fullscreen else 0))
+        except pygame.error:
+            window = None
+    if window is None or any("no fast renderer" in str(warning.message) for warning in caught):
+        pygame.display.quit()
+        pygame.display.init()
+        return False
+    if not fullscreen:
+        # SDL opens the window at a whole multiple of the frame size
+        try:
+            from pygame._sdl2.video import Window
+        except ImportError:
+            pass
+        else:
+            Window.from_display_module().size = window_size
+    return True
+
+# Open the window. Only the display is initialised - the game has no use
+# for the joystick and other subsystems pygame.init() would start, and the
+# mixer is opened by the audio manager (audio.py).
+# With fullscreen the window takes the desktop's native resolution.
+def init_display(window_size=(WIDTH, HEIGHT), fullscreen=False, render_scale=RENDER_SCALE):
+    global screen, window, output_rect, _ticks_started
     
-    # Update combo display time
-    if combo_display_time > 0:
-        combo_display_time -= 1
+    pygame.display.init()
+    scaled = render_scale < 1 and _open_scaled_display(window_size, fullscreen, render_scale)
+    if not scaled:
+        if render_scale < 1:
+            print("No accelerated renderer to scale frames up; drawing at render scale 1")
+        if fullscreen:
+            window = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+        else:
+            window = pygame.display.set_mode(window_size)
+    pygame.display.set_caption("Badminton Championship")
+    _ticks_started = time.perf_counter()
     
-    # Update particles
-    update_particles()
+    if scaled:
+        # Mouse positions come back in display surface pixels too
+        output_rect = window.get_rect()
+    else:
+        window_width, window_height = window.get_size()
+        fit = min(window_width / WIDTH, window_height / HEIGHT)
+        output_rect = pygame.Rect(0, 0, round(WIDTH * fit), round(HEIGHT * fit))
+        output_rect.center = window.get_rect().center
+    set_view_scale(output_rect.width / WIDTH)
+    screen = window.subsurface(output_rect) if output_rect != window.get_rect() else window
     
-    # Drawing
-    screen.fill(BLACK)
-    draw_court()
+    # Bake the shuttle trail and particle sprites before the first frame,
+    # exactly the ones draw_frame() can ask for at this view scale
+    from particles import PARTICLE_SIZES
+    for count in range(1, TRAIL_LENGTH + 1):
+        for i in range(count):
+            radius, alpha = Shuttlecock.trail_circle(SHUTTLE_RADIUS, i, count)
+            sprite_atlas.circle(radius, SHUTTLE_COLOR, alpha)
+    particle_radii = sorted({round(px(size)) for size in range(PARTICLE_SIZES[0], PARTICLE_SIZES[1] + 1)})
+    for color in EFFECT_COLORS:
+        sprite_atlas.prebake(particle_radii, color)
+    sprite_atlas.max_entries = max(ATLAS_SIZE, len(sprite_atlas.sprites) + ATLAS_HEADROOM)
+
+# Put the drawn frame on the display: all of it, or just the dirty rects
+# (in frame pixels)
+def present_frame(dirty=None):
+    if dirty is not None and screen is not window:
+        dirty = [rect.move(output_rect.topleft) for rect in dirty]
+    if dirty is None:
+        pygame.display.flip()
+    else:
+        pygame.display.update(dirty)
+
+# Mouse position in logical coordinates
+def mouse_position():
+    x, y = pygame.mouse.get_pos()
+    scale = output_rect.width / WIDTH
+    return (x - output_rect.x) / scale, (y - output_rect.y) / scale
+
+# Particle bursts for hits and floor impacts
+def spawn_effects(particles, event):
+    if event.kind == "serve":
+        particles.emit(event.x, event.y, COMPUTER_HIT_COLOR if event.who.is_computer else PLAYER_HIT_COLOR, 15)
+    elif event.kind == "hit":
+        # Add hit particles
+        if event.who.is_computer:
+            if event.smash:  # Jumping hit
+                particles.emit(event.x, event.y, COMPUTER_SMASH_COLOR, 20, 4)
+            else:
+                particles.emit(event.x, event.y, COMPUTER_HIT_COLOR, 15)
+        else:
+            if event.smash:  # Jumping hit (smash)
+                particles.emit(event.x, event.y, PLAYER_SMASH_COLOR, 25, 5)
+            else:
+                particles.emit(event.x, event.y, PLAYER_HIT_COLOR, 15)
+    elif event.kind == "floor":
+        # Add impact particles
+        particles.emit(event.x, event.y, IMPACT_COLOR, 30, 3)
+
+# Draw one complete frame
+def draw_frame(sim, particles, combo_display_time):
+    # The cached court layer covers the whole screen
+    with profiler.section("draw_court"):
+        draw_court()
     
-    # Draw players and shuttlecock
-    player.draw()
-    computer.draw()
-    if game_state != MENU:
-        shuttlecock.draw()
+    # Draw players and shuttlecocks
+    for body in sim.bodies:
+        body.draw()
+    if sim.game_state != MENU:
+        for shuttle in sim.shuttles:
+            shuttle.draw()
+    particles.draw(screen, view_scale)
     
     # Draw rally combo
-    if combo_display_time > 0 and rally_count >= 3:
-        combo_text = font.render(f"{rally_count}x Rally!", True, (255, 215, 0))
-        # Pulse effect
-        scale = 1 + math.sin(pygame.time.get_ticks() * 0.01) * 0.1
-        combo_text = pygame.transform.scale(combo_text, 
-                                          (int(combo_text.get_width() * scale), 
-                                           int(combo_text.get_height() * scale)))
-        screen.blit(combo_text, (WIDTH // 2 - combo_text.get_width() // 2, HEIGHT // 4))
+    if combo_display_time > 0 and sim.rally_count >= 3:
+        # Pulse effect, with the scale rounded so frames can share cached text
+        scale = round(1 + math.sin(ui_ticks() * 0.01) * 0.1, 2)
+        combo_text = text_cache.render(font, f"{sim.rally_count}x Rally!", (255, 215, 0), scale)
+        screen.blit(combo_text, (px(WIDTH // 2) - combo_text.get_width() // 2, px(HEIGHT // 4)))
     
     # Draw UI
-    draw_ui()
+    with profiler.section("draw_ui"):
+        draw_ui(sim)
+    
+    if profiler.enabled:
+        screen.blit(profiler.overlay_surface(), view_pos(*PROFILE_OVERLAY_POS))
+
+# Parts of the frame that can change from one frame to the next while the
+# game state and scores stay the same
+def dynamic_regions(sim, particles, combo_display_time):
+    regions = [body.bounds() for body in sim.bodies]
+    if sim.game_state != MENU:
+        regions += [shuttle.bounds() for shuttle in sim.shuttles]
+    if len(particles):
+        regions.append(particles.bounds())
+    if profiler.enabled:
+        regions.append(profiler.overlay_rect())
+    
+    if combo_display_time > 0 and sim.rally_count >= 3:
+        # Combo banner at its largest pulse
+        text_width, text_height = (size / view_scale for size in font.size(f"{sim.rally_count}x Rally!"))
+        regions.append(pygame.Rect(WIDTH // 2 - text_width * 0.55 - 1, HEIGHT // 4,
+                                   text_width * 1.1 + 2, text_height * 1.1 + 1))
+    
+    if sim.game_state == MENU:
+        # Pulsing start button
+        regions.append(pygame.Rect(WIDTH // 2 - 125 - 6, HEIGHT // 2 - 6, 250 + 12, 60 + 12))
+    elif sim.game_state == SERVE:
+        # Serve arrow follows the server
+        if sim.serving:
+            arrow_x = sim.player.x + sim.player.width + 5
+        else:
+            arrow_x = sim.computer.x - 70
+        arrow_y = sim.player.y if sim.serving else sim.computer.y
+        regions.append(pygame.Rect(arrow_x, arrow_y + PLAYER_HEIGHT // 2 - 45, 65, 60))
+    elif sim.game_state == POINT_SCORED:
+        # Pulsing "... Scored!" banner
+        text = "Player Scored!" if sim.serving else "Computer Scored!"
+        text_width, text_height = (size / view_scale for size in large_font.size(text))
+        regions.append(pygame.Rect(WIDTH // 2 - text_width * 0.55 - 1, HEIGHT // 3,
+                                   text_width * 1.1 + 2, text_height * 1.1 + 1))
+    elif sim.game_state == GAME_OVER:
+        # Restart button hover
+        regions.append(pygame.Rect(WIDTH // 2 - 100, HEIGHT // 2 + 80, 200, 50))
+    return regions
+
+# Merge overlapping rectangles so each screen area is redrawn at most once
+def merge_rects(rects):
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
+
+# Dirty-rectangle renderer. Instead of redrawing and flipping the whole window,
+# it redraws only the regions that changed since the last frame (with the
+# screen clipped to each region, so the cached court layer restores the
+# background under anything that moved) and pushes just those regions with
+# pygame.display.update(). A full redraw and flip is still used on the first
+# frame, whenever the game state or score changes, and when the dirty area
+# gets too large to be worth it.
+class DirtyRectRenderer:
+    def __init__(self, full_redraw_fraction=0.5):
+        self.full_redraw_fraction = full_redraw_fraction
+        self.previous = []
+        self.scene_key = None
+        # Pixel bandwidth statistics
+        self.frames = 0
+        self.pixels_pushed = 0
+        self.full_redraws = 0
+    
+    def invalidate(self):
+        # Force a full redraw on the next frame (e.g. after the window was exposed)
+        self.scene_key = None
+    
+    def present(self, sim, draw, regions):
+        screen_rect = screen.get_rect()
+        screen_area = screen_rect.width * screen_rect.height
+        self.frames += 1
+        
+        key = (sim.game_state, sim.player_score, sim.computer_score, sim.serving, screen_rect.size)
+        regions = [view_rect(rect) for rect in regions]
+        dirty = []
+        if key == self.scene_key:
+            for rect in merge_rects(self.previous + regions):
+                rect = rect.clip(screen_rect)
+                if rect.width and rect.height:
+                    dirty.append(rect)
+        self.previous = regions
+        
+        dirty_area = sum(rect.width * rect.height for rect in dirty)
+        if key != self.scene_key or dirty_area > screen_area * self.full_redraw_fraction:
+            self.scene_key = key
+            draw()
+            with profiler.section("flip"):
+                present_frame()
+            self.pixels_pushed += screen_area
+            self.full_redraws += 1
+            return
+        
+        for rect in dirty:
+            screen.set_clip(rect)
+            draw()
+        screen.set_clip(None)
+        with profiler.section("flip"):
+            present_frame(dirty)
+        self.pixels_pushed += dirty_area
+
+# Idle scheduler for the static screens. On the menu, between points and
+# after the game the only movement is the pulsing button or the scaled text,
+# so instead of drawing at the full frame rate the loop sleeps in
+# pygame.event.wait() until the next IDLE_FPS frame is due. Any event wakes
+# it at once and is handed back with the rest of the queue by events(). It
+# also charges the CPU and wall time of every frame (sleep included) to the
+# game state the frame started in, for the usage report printed on exit.
+class IdleScheduler:
+    def __init__(self, fps=IDLE_FPS):
+        self.frame_time = 1.0 / fps if fps > 0 else 0.0
+        self.pending = []  # The event that ended the last wait
+        self.usage = {}  # Game state -> [CPU seconds, wall seconds]
+        self.state = None
+        self.frame_cpu = self.frame_start = 0.0
+    
+    def begin_frame(self, state):
+        # Charge the frame that just ended and start timing the next one
+        cpu, now = time.process_time(), time.perf_counter()
+        if self.state is not None:
+            totals = self.usage.setdefault(self.state, [0.0, 0.0])
+            totals[0] += cpu - self.frame_cpu
+            totals[1] += now - self.frame_start
+        self.state, self.frame_cpu, self.frame_start = state, cpu, now
+    
+    def events(self):
+        events = self.pending + pygame.event.get()
+        self.pending = []
+        return events
+    
+    def wait(self):
+        # Sleep until the next idle frame is due or an event arrives
+        timeout = int((self.frame_start + self.frame_time - time.perf_counter()) * 1000)
+        if timeout > 0:  # wait(0) would block until the next event
+            event = pygame.event.wait(timeout)
+            if event.type != pygame.NOEVENT:
+                self.pending.append(event)
+    
+    def report(self):
+        # "state CPU% of wall seconds" for every state the game was in
+        return ", ".join(f"{STATE_NAMES[state]} {cpu / wall * 100:.0f}% of {wall:.1f} s"
+                         for state, (cpu, wall) in sorted(self.usage.items()) if wall > 0)
+
+# The shuttlecock trails are render state, kept by the client: call this
+# before each simulation step to remember where the shuttlecocks were
+def record_trails(sim):
+    if sim.game_state == PLAYING:
+        for shuttle in sim.shuttles:
+            shuttle.shuttle_trail.append((shuttle.x, shuttle.y))
+
+# Positions of everything that moves, used to interpolate between two
+# simulation steps when drawing
+def capture_positions(sim):
+    return (sim.game_state,) + tuple((thing.x, thing.y) for thing in sim.bodies + sim.shuttles)
+
+def _place(sim, positions):
+    for thing, (x, y) in zip(sim.bodies + sim.shuttles, positions):
+        thing.x = x
+        thing.y = y
+
+# Temporarily move the players and shuttlecocks to where they are `alpha` of
+# the way from the previous step to the current one, for drawing
+@contextmanager
+def interpolated(sim, previous, alpha):
+    current = capture_positions(sim)
+    # No blending across a state change (serve resets, new game)
+    if previous is None or previous[0] != current[0] or alpha >= 1:
+        yield
+        return
     
-    # Update display
-    pygame.display.flip()
+    _place(sim, [(prev_x + (x - prev_x) * alpha, prev_y + (y - prev_y) * alpha)
+                 for (prev_x, prev_y), (x, y) in zip(previous[1:], current[1:])])
+    try:
+        yield
+    finally:
+        _place(sim, current[1:])
+
+# Main game loop - a thin client that turns pygame input into FrameInput,
+# steps the simulation and renders the result. The simulation runs on a
+# fixed timestep (SIM_RATE steps per second of real time, however fast the
+# screen refreshes) and frames are drawn interpolated between steps.
+def main(argv=None):
+    main_started = time.perf_counter()
+    import argparse
+    import threading
+    # Client-only modules (they need NumPy), imported here to keep the
+    # simulation import light
+    from trajectory import get_landing_table
+    from particles import ParticleSystem
+    from replay import ReplayRecorder
+    from audio import AudioManager
+    
+    parser = argparse.ArgumentParser(description="Badminton Championship")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="redraw and push only the changed parts of the screen")
+    parser.add_argument("--fps", type=int, default=FPS,
+                        help="frame rate cap for drawing (default %(default)s)")
+    parser.add_argument("--sim-rate", type=float, default=SIM_RATE,
+                        help="simulation steps per second; %(default)s is normal game speed")
+    parser.add_argument("--seed", type=int, help="seed for gameplay randomness")
+    parser.add_argument("--record", metavar="PATH", help="save a replay of the session to PATH")
+    parser.add_argument("--stats", metavar="PATH",
+                        help="append a record of every shot to PATH (see analytics.py)")
+    parser.add_argument("--doubles", action="store_true",
+                        help="two players a side; your partner and both opponents are computer controlled")
+    parser.add_argument("--drill", type=int, default=1, metavar="N",
+                        help="practice with N shuttlecocks in play at once")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="time each part of the frame (F3 toggles the overlay in game) and "
+                             "write the trace to PATH on exit (.json, otherwise CSV)")
+    parser.add_argument("--fast-forward", action="store_true",
+                        help="run the simulation as fast as possible, drawing a few frames a second "
+                             "(TAB toggles it in game)")
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, default="normal",
+                        help="computer opponent: the rule-based AI, a lookahead search, or the "
+                             "lookahead search retuned after every point to give you an even match "
+                             "(default %(default)s)")
+    parser.add_argument("--idle-fps", type=int, default=IDLE_FPS,
+                        help="frame rate on the menu, between points and after the game, where "
+                             "the loop sleeps until input arrives; 0 draws them at --fps "
+                             "(default %(default)s)")
+    parser.add_argument("--mute", action="store_true", help="play without sound")
+    parser.add_argument("--window", type=parse_window_size, default=(WIDTH, HEIGHT), metavar="WxH",
+                        help="window size; the court is scaled to fit (default %dx%d)" % (WIDTH, HEIGHT))
+    parser.add_argument("--fullscreen", action="store_true",
+                        help="fill the screen at the display's native resolution")
+    parser.add_argument("--render-scale", type=float, default=RENDER_SCALE, metavar="SCALE",
+                        help="draw at this fraction of the window's resolution and let the GPU scale "
+                             "up; lower is faster on weak machines (%s to 1, default %%(default)s)"
+                             % MIN_RENDER_SCALE)
+    args = parser.parse_args(argv)
+    if args.drill < 1:
+        parser.error("--drill needs at least 1 shuttlecock")
+    if not MIN_RENDER_SCALE <= args.render_scale <= 1:
+        parser.error(f"--render-scale must be between {MIN_RENDER_SCALE} and 1")
+    
+    init_display(args.window, args.fullscreen, args.render_scale)
+    startup = {"imports": main_started - _import_started,
+               "window": time.perf_counter() - _import_started}
+    
+    # The landing table the computer AI predicts with takes a moment to
+    # build, so it is built in the background while the menu is up and
+    # attached before play starts
+    def build_table():
+        get_landing_table()
+        startup["landing table"] = time.perf_counter() - _import_started
+    table_builder = threading.Thread(target=build_table, daemon=True)
+    table_builder.start()
+    
+    profiler.enabled = args.profile is not None
+    # The lookahead AI plans within a time budget per frame, except in a
+    # recorded session, where only its evaluation cap applies so the replay
+    # is exact
+    ai_budget = None
+    if args.difficulty != "normal" and not args.record:
+        from search_ai import HARD_AI_BUDGET as ai_budget
+    sim = MatchSimulator(seed=args.seed, doubles=args.doubles, shuttles=args.drill, profiler=profiler,
+                         difficulty=args.difficulty, ai_budget=ai_budget)
+    recorder = ReplayRecorder(sim) if args.record else None
+    shot_recorder = None
+    if args.stats:
+        from analytics import ShotRecorder, ShotWriter
+        shot_recorder = ShotRecorder(sim, ShotWriter(args.stats))
+    
+    # Particle system for visual effects
+    particles = ParticleSystem(sprite_atlas)
+    renderer = DirtyRectRenderer() if args.dirty_rects else None
+    clock = pygame.time.Clock()
+    scheduler = IdleScheduler(args.idle_fps)
+    running = True
+    
+    # Fixed-timestep state
+    step_time = 1.0 / args.sim_rate
+    accumulator = 0.0
+    last_time = time.perf_counter()
+    previous_positions = None
+    fast_forward = args.fast_forward
+    
+    # Sound effects, decoded in the background like the landing table;
+    # until they are ready the game is just silent
+    audio = None
+    if not args.mute:
+        audio = AudioManager()
+        if not audio.start():
+            audio = None
+    
+    # Game variables for visual effects
+    combo_display_time = 0
+    
+    # One-shot presses wait here until a simulation step consumes them
+    jump = swing = restart = False
+    
+    while running:
+        profiler.begin_frame()
+        scheduler.begin_frame(sim.game_state)
+        
+        # Event handling
+        with profiler.section("events"):
+            for event in scheduler.events():
+                if event.type == pygame.QUIT:
+                    running = False
+                
+                if event.type == pygame.VIDEOEXPOSE and renderer is not None:
+                    renderer.invalidate()
+                
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        running = False
+                    if event.key == pygame.K_SPACE:
+                        swing = True
+                    if event.key == pygame.K_r:
+                        restart = True
+                    if event.key == pygame.K_UP:
+                        jump = True
+                    if event.key == pygame.K_TAB:
+                        fast_forward = not fast_forward
+                    if event.key == pygame.K_F3:
+                        profiler.enabled = not profiler.enabled
+                        if renderer is not None:
+                            renderer.invalidate()
+                
+                # Mouse click for buttons
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    mouse_pos = mouse_position()
+                    
+                    # Menu start button
+                    if sim.game_state == MENU:
+                        button_width, button_height = 250, 60
+                        button_x = WIDTH // 2 - button_width // 2
+                        button_y = HEIGHT // 2
+                        button_rect = pygame.Rect(button_x, button_y, button_width, button_height)
+                        
+                        if button_rect.collidepoint(mouse_pos):
+                            swing = True
+                    
+                    # Game over restart button
+                    elif sim.game_state == GAME_OVER:
+                        button_width, button_height = 200, 50
+                        button_x = WIDTH // 2 - button_width // 2
+                        button_y = HEIGHT // 2 + 80
+                        button_rect = pygame.Rect(button_x, button_y, button_width, button_height)
+                        
+                        if button_rect.collidepoint(mouse_pos):
+                            restart = True
+        
+        # Get keyboard state for continuous movement
+        keys = pygame.key.get_pressed()
+        
+        # Work out how many simulation steps are due
+        now = time.perf_counter()
+        if fast_forward:
+            # Step flat out until the next (rare) frame is due; a static
+            # screen only needs the one step that takes any press, then
+            # waits like it does at normal speed
+            deadline = now + 1.0 / FAST_FORWARD_FPS
+            steps_due = 1 if sim.game_state in IDLE_STATES else sys.maxsize
+        else:
+            accumulator += min(now - last_time, MAX_FRAME_TIME)
+            steps_due = min(int(accumulator / step_time), MAX_STEPS_PER_FRAME)
+            accumulator -= steps_due * step_time
+            if steps_due == MAX_STEPS_PER_FRAME:
+                # Too far behind to catch up - drop the backlog rather than stall
+                accumulator = min(accumulator, step_time)
+            elif steps_due == 0 and (jump or swing or restart):
+                # Don't leave a press waiting for the next step, which on a
+                # static screen is a whole idle frame away; take it now on
+                # time borrowed from the step after
+                steps_due = 1
+                accumulator -= step_time
+        last_time = now
+        
+        if table_builder is not None and (swing or sim.game_state != MENU):
+            # Leaving the menu - the AI needs the table from here on
+            table_builder.join()
+            sim.set_predictor(get_landing_table())
+            table_builder = None
+        
+        steps = 0
+        while steps < steps_due:
+            if fast_forward and time.perf_counter() >= deadline:
+                break
+            previous_positions = capture_positions(sim)
+            inputs = FrameInput(keys[pygame.K_LEFT], keys[pygame.K_RIGHT], jump, swing, restart)
+            jump = swing = restart = False
+            steps += 1
+            if recorder is not None:
+                recorder.record(inputs)
+            
+            # Game logic
+            record_trails(sim)
+            events = sim.step(inputs)
+            if shot_recorder is not None:
+                shot_recorder.record(events)
+            for event in events:
+                spawn_effects(particles, event)
+                if audio is not None:
+                    audio.play_event(event)
+                
+                # Update combo display
+                if event.kind == "hit" and sim.rally_count >= 3:
+                    combo_display_time = 120  # Show for 2 seconds
+            
+            # Update combo display time
+            if combo_display_time > 0:
+                combo_display_time -= 1
+            
+            # Update particles
+            with profiler.section("particles"):
+                particles.update()
+        
+        # Drawing, interpolated between the last two simulation steps
+        alpha = 1.0 if fast_forward else max(0.0, accumulator / step_time)
+        with interpolated(sim, previous_positions, alpha):
+            if renderer is None:
+                draw_frame(sim, particles, combo_display_time)
+                with profiler.section("flip"):
+                    present_frame()
+            else:
+                renderer.present(sim, lambda: draw_frame(sim, particles, combo_display_time),
+                                 dynamic_regions(sim, particles, combo_display_time))
+        
+        if startup is not None:
+            if "first frame" not in startup:
+                startup["first frame"] = time.perf_counter() - _import_started
+            if "landing table" in startup:
+                # Report once the first frame is up and the table is built
+                print("Startup: " + ", ".join(f"{stage} {seconds * 1000:.0f} ms"
+                                              for stage, seconds in startup.items()))
+                startup = None
+        
+        # Cap the frame rate; static screens wait for input at the idle rate
+        if sim.game_state in IDLE_STATES and scheduler.frame_time and not len(particles):
+            with profiler.section("idle"):
+                scheduler.wait()
+        elif not fast_forward or sim.game_state in IDLE_STATES:
+            with profiler.section("idle"):
+                clock.tick(args.fps)
+        if fast_forward:
+            last_time = time.perf_counter()
+        profiler.end_frame()
     
-    # Cap the frame rate
-    clock.tick(FPS)
+    scheduler.begin_frame(None)
+    print("CPU use: " + scheduler.report())
+    if audio is not None:
+        print("Audio: " + audio.report())
+    if recorder is not None:
+        recorder.save(args.record)
+    if shot_recorder is not None:
+        shot_recorder.writer.close()
+    if args.profile:
+        profiler.export(args.profile)
+    pygame.quit()
+    sys.exit()
 
-pygame.quit()
-sys.exit()
+if __name__ == "__main__":
+    main()
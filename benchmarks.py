@@ -0,0 +1,382 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+# Headless benchmark and regression suite. Benchmarks run through SDL's
+# dummy video driver; run_suite() collects one number per hot path and the
+# CLI saves them as a JSON baseline or compares a run against one, failing
+# when a metric is worse than the baseline by more than the threshold.
+#
+#   python benchmarks.py --save baseline.json
+#   python benchmarks.py --compare baseline.json --threshold 0.15
+
+# Benchmarks run headless through SDL's dummy video driver, and their
+# output is meant for diffing, so without pygame's import banner
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+import badminton_game as bg
+
+
+# Random button mashing: moves, jumps and swings often enough to play
+# through every game state, so all the renderer's code paths get exercised
+def random_inputs(rng):
+    return bg.FrameInput(rng.random() < 0.5, rng.random() < 0.5, rng.random() < 0.05,
+                         rng.random() < 0.1, rng.random() < 0.01)
+
+
+# Pixel bandwidth of the dirty-rect renderer against full-frame flips over the
+# same scripted match
+def bench_dirty_rects(frames=1800, seed=1):
+    from particles import ParticleSystem
+    import numpy as np
+    
+    if bg.screen is None:
+        bg.init_display()
+    rng = random.Random(seed)
+    sim = bg.MatchSimulator(seed=seed)
+    particles = ParticleSystem(bg.sprite_atlas, rng=np.random.default_rng(seed))
+    renderer = bg.DirtyRectRenderer()
+    combo_display_time = 0
+    
+    start = time.perf_counter()
+    for _ in range(frames):
+        for event in sim.step(random_inputs(rng)):
+            bg.spawn_effects(particles, event)
+            if event.kind == "hit" and sim.rally_count >= 3:
+                combo_display_time = 120
+        if combo_display_time > 0:
+            combo_display_time -= 1
+        particles.update()
+        renderer.present(sim, lambda: bg.draw_frame(sim, particles, combo_display_time),
+                         bg.dynamic_regions(sim, particles, combo_display_time))
+    elapsed = time.perf_counter() - start
+    
+    full_pixels = frames * bg.screen.get_width() * bg.screen.get_height()  # Render size, not the logical court
+    return {
+        "frames": frames,
+        "full_redraws": renderer.full_redraws,
+        "pixels_per_frame": renderer.pixels_pushed / frames,
+        "full_flip_pixels_per_frame": full_pixels / frames,
+        "bandwidth_saving": 1 - renderer.pixels_pushed / full_pixels,
+        "ms_per_frame": elapsed / frames * 1000,
+    }
+
+
+# Cost of finding racket/shuttlecock hit pairs as the number of entities
+# grows: every racket against every shuttlecock, against the UniformGrid
+# broad-phase MatchSimulator uses. One racket per four shuttlecocks, all
+# scattered over the court; both paths apply the same exact reach test.
+def bench_broadphase(counts=(4, 16, 64, 256, 1024, 4096), frames=20, seed=1):
+    rng = random.Random(seed)
+    reach = bg.HIT_REACH
+    results = []
+    for count in counts:
+        shuttles = [(rng.uniform(bg.COURT_LEFT, bg.COURT_RIGHT), rng.uniform(bg.COURT_TOP, bg.FLOOR_Y))
+                    for _ in range(count)]
+        rackets = [(rng.uniform(bg.COURT_LEFT, bg.COURT_RIGHT), rng.uniform(bg.COURT_TOP, bg.FLOOR_Y))
+                   for _ in range(max(1, count // 4))]
+        
+        start = time.perf_counter()
+        for _ in range(frames):
+            brute_pairs = 0
+            for rx, ry in rackets:
+                for sx, sy in shuttles:
+                    if abs(sx - rx) < reach and abs(sy - ry) < reach:
+                        brute_pairs += 1
+        brute_time = (time.perf_counter() - start) / frames
+        
+        grid = bg.UniformGrid()
+        start = time.perf_counter()
+        for _ in range(frames):
+            grid_pairs = 0
+            grid.clear()
+            for shuttle in shuttles:
+                grid.insert(shuttle, shuttle[0], shuttle[1])
+            for rx, ry in rackets:
+                for sx, sy in grid.query(rx - reach, ry - reach, rx + reach, ry + reach):
+                    if abs(sx - rx) < reach and abs(sy - ry) < reach:
+                        grid_pairs += 1
+        grid_time = (time.perf_counter() - start) / frames
+        
+        if grid_pairs != brute_pairs:
+            raise AssertionError(f"broad-phase found {grid_pairs} pairs, brute force {brute_pairs}")
+        results.append({
+            "shuttles": count,
+            "rackets": len(rackets),
+            "pairs": grid_pairs,
+            "brute_force_us": brute_time * 1e6,
+            "grid_us": grid_time * 1e6,
+        })
+    return results
+
+
+# Best of several timed runs of fn(), in seconds; the minimum is the least
+# disturbed by whatever else the machine is doing
+def best_time(fn, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Shuttlecock.update() steps per second over ordinary rallies, relaunching
+# the shuttlecock whenever it lands
+def bench_shuttle_update(steps=100000, repeats=3):
+    shuttle = bg.Shuttlecock(bg.GameRNG(1))
+    def run():
+        shuttle.reset(False)
+        update = shuttle.update
+        reset = shuttle.reset
+        for _ in range(steps):
+            if update():
+                reset(False)
+    return steps / best_time(run, repeats)
+
+
+# Mid-rally situations for the AI: the computer somewhere on its half and
+# the shuttlecock anywhere on court, heading either way
+def ai_states(count, seed=1):
+    rng = random.Random(seed)
+    states = []
+    for _ in range(count):
+        states.append((rng.uniform(bg.NET_X + 10, bg.COURT_RIGHT - bg.PLAYER_WIDTH),
+                       rng.uniform(bg.COURT_LEFT, bg.COURT_RIGHT), rng.uniform(100, bg.FLOOR_Y - 20),
+                       rng.uniform(-15, 15), rng.uniform(-15, 10)))
+    return states
+
+
+# computer_ai() decisions per second, with and without the landing table
+def bench_computer_ai(decisions=20000, predictor=None, repeats=3):
+    states = ai_states(decisions)
+    rng = bg.GameRNG(1)
+    shuttle = bg.Shuttlecock(rng)
+    computer = bg.Player(bg.COURT_RIGHT - 50 - bg.PLAYER_WIDTH, bg.FLOOR_Y - bg.PLAYER_HEIGHT,
+                         is_computer=True)
+    def run():
+        for computer_x, x, y, vx, vy in states:
+            computer.x = computer_x
+            computer.swing_cooldown = 0
+            shuttle.x, shuttle.y, shuttle.vx, shuttle.vy = x, y, vx, vy
+            bg.computer_ai(shuttle, computer, predictor, rng)
+    return decisions / best_time(run, repeats)
+
+
+# A mid-rally scene with a full shuttlecock trail and `particles` live
+# particles, frozen so every frame draws the same load
+def render_scene(particles_count, seed=1):
+    from particles import ParticleSystem
+    import numpy as np
+    
+    if bg.screen is None:
+        bg.init_display()
+    sim = bg.MatchSimulator(seed=seed, player_ai=True)
+    while sim.game_state != bg.PLAYING or len(sim.shuttlecock.shuttle_trail) < bg.TRAIL_LENGTH:
+        bg.record_trails(sim)
+        sim.step()
+    particles = ParticleSystem(bg.sprite_atlas, rng=np.random.default_rng(seed))
+    while len(particles) < particles_count:
+        particles.emit(bg.WIDTH / 2, bg.HEIGHT / 2, (255, 165, 0), min(50, particles_count - len(particles)), 6)
+    # Spread them over the court
+    particles.update()
+    return sim, particles
+
+
+# Full-frame draws per second (court, players, shuttlecock, particles, UI
+# and the flip) at a fixed particle load
+def bench_render(particles_count=0, frames=200, repeats=3):
+    sim, particles = render_scene(particles_count)
+    def run():
+        for _ in range(frames):
+            bg.draw_frame(sim, particles, 0)
+            bg.present_frame()
+    return frames / best_time(run, repeats)
+
+
+# Fill-rate saving of the render scale: the same scene drawn in a
+# `window`-sized window at each scale, timing the frame draw and the
+# present (the flip, which stretches a scaled frame on the GPU) separately,
+# plus the dirty-rect renderer over a scripted match. Scale 1.0 draws at the
+# window's native resolution; so does every scale without an accelerated
+# renderer (frame_size shows what was drawn).
+def bench_render_scale(window=(1920, 1080), scales=(0.25, 0.5, 0.75, 1.0), particles_count=500,
+                       frames=100, repeats=3, dirty_frames=600):
+    results = []
+    try:
+        for scale in scales:
+            bg.init_display(window, render_scale=scale)
+            sim, particles = render_scene(particles_count)
+            def draw():
+                for _ in range(frames):
+                    bg.draw_frame(sim, particles, 0)
+            def present():
+                for _ in range(frames):
+                    bg.present_frame()
+            draw_time = best_time(draw, repeats) / frames
+            present_time = best_time(present, repeats) / frames
+            dirty = bench_dirty_rects(dirty_frames) if dirty_frames else None
+            width, height = bg.screen.get_size()
+            results.append({
+                "scale": scale,
+                "frame_size": f"{width}x{height}",
+                "pixels": width * height,
+                "draw_ms": draw_time * 1000,
+                "present_ms": present_time * 1000,
+                "frames_per_s": 1 / (draw_time + present_time),
+                "dirty_rect_ms": dirty["ms_per_frame"] if dirty else None,
+            })
+    finally:
+        # Back to the default window for anything run afterwards
+        bg.init_display()
+    native = results[-1]["frames_per_s"]
+    for result in results:
+        result["speedup"] = result["frames_per_s"] / native
+    return results
+
+
+# Memory churn of a played frame (simulation step, particle update, full
+# draw) under tracemalloc: the mean peak of memory allocated within a frame,
+# the number of memory blocks still held per frame afterwards and the sprite
+# atlas surfaces created after init_display() (all of them are prebaked, so 0)
+def bench_allocations(frames=300, seed=1):
+    sim, particles = render_scene(500, seed)
+    rng = random.Random(seed)
+    sprites_before = bg.sprite_atlas.created
+    # Warm the caches first so only steady-state behaviour is measured
+    for _ in range(60):
+        for event in sim.step(random_inputs(rng)):
+            bg.spawn_effects(particles, event)
+        particles.update()
+        bg.draw_frame(sim, particles, 0)
+    
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        peak_total = 0
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+            for event in sim.step(random_inputs(rng)):
+                bg.spawn_effects(particles, event)
+            particles.update()
+            bg.draw_frame(sim, particles, 0)
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - start
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    retained = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return {"peak_kib_per_frame": peak_total / frames / 1024, "retained_blocks_per_frame": retained / frames,
+            "sprites_created": bg.sprite_atlas.created - sprites_before}
+
+
+# Every benchmark as {metric: (value, unit, higher_is_better)}
+def run_suite(quick=False):
+    from trajectory import get_landing_table
+    
+    scale = 0.2 if quick else 1.0
+    table = get_landing_table()
+    metrics = {}
+    def add(name, value, unit, higher_is_better):
+        metrics[name] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+    
+    add("shuttle_update", bench_shuttle_update(int(100000 * scale)), "steps/s", True)
+    add("computer_ai", bench_computer_ai(int(20000 * scale)), "decisions/s", True)
+    add("computer_ai_landing_table", bench_computer_ai(int(20000 * scale), table), "decisions/s", True)
+    for count in (0, 500, 2000):
+        add(f"render_{count}_particles", bench_render(count, int(200 * scale)), "frames/s", True)
+    allocations = bench_allocations(int(300 * scale))
+    add("frame_alloc_peak", allocations["peak_kib_per_frame"], "KiB/frame", False)
+    add("frame_retained_blocks", allocations["retained_blocks_per_frame"], "blocks/frame", False)
+    if allocations["sprites_created"]:
+        raise AssertionError(f"sprite atlas created {allocations['sprites_created']} sprites after warm-up")
+    add("dirty_rect_pixels", bench_dirty_rects(int(1800 * scale))["pixels_per_frame"], "px/frame", False)
+    grid = bench_broadphase((1024,), frames=max(1, int(10 * scale)))[0]
+    add("broadphase_1024_shuttles", grid["grid_us"], "us/frame", False)
+    for result in bench_render_scale(scales=(0.5, 1.0), frames=max(1, int(100 * scale)), dirty_frames=0):
+        add(f"render_scale_{result['scale']:g}_1080p", result["frames_per_s"], "frames/s", True)
+    return metrics
+
+
+def environment():
+    return {"python": platform.python_version(), "pygame": pygame.version.ver,
+            "platform": platform.platform(), "machine": platform.machine()}
+
+
+# Metrics worse than the baseline by more than `threshold` (a fraction)
+def regressions(baseline, current, threshold):
+    worse = []
+    for name, base in baseline["metrics"].items():
+        if name not in current["metrics"] or not base["value"]:
+            continue
+        value = current["metrics"][name]["value"]
+        change = (value - base["value"]) / abs(base["value"])
+        if base["higher_is_better"]:
+            change = -change
+        if change > threshold:
+            worse.append((name, base["value"], value, change))
+    return worse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless performance benchmarks")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="largest tolerated slowdown as a fraction of the baseline (default %(default)s)")
+    parser.add_argument("--quick", action="store_true", help="shorter runs, noisier numbers")
+    parser.add_argument("--render-scales", type=bg.parse_window_size, nargs="?", const=(1920, 1080),
+                        metavar="WxH", help="only print the render scale table for a window of this "
+                                            "size (default 1920x1080)")
+    args = parser.parse_args(argv)
+    
+    if args.render_scales:
+        print(f"{'scale':>6s} {'frame':>10s} {'pixels':>10s} {'draw ms':>8s} {'present ms':>10s} "
+              f"{'frames/s':>9s} {'speedup':>8s} {'dirty-rect ms':>14s}")
+        for result in bench_render_scale(args.render_scales):
+            print(f"{result['scale']:6g} {result['frame_size']:>10s} {result['pixels']:10,d} "
+                  f"{result['draw_ms']:8.2f} {result['present_ms']:10.2f} "
+                  f"{result['frames_per_s']:9.1f} {result['speedup']:7.2f}x {result['dirty_rect_ms']:14.2f}")
+        return 0
+    
+    current = {"environment": environment(), "metrics": run_suite(args.quick)}
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    
+    for name, metric in current["metrics"].items():
+        line = f"{name:28s} {metric['value']:14,.2f} {metric['unit']}"
+        if baseline is not None and name in baseline["metrics"]:
+            base = baseline["metrics"][name]["value"]
+            if base:
+                line += f"  ({(metric['value'] - base) / abs(base):+.1%} vs baseline)"
+        print(line)
+    
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=2)
+    
+    if baseline is not None:
+        if baseline.get("environment") != current["environment"]:
+            print("note: baseline was recorded in a different environment")
+        worse = regressions(baseline, current, args.threshold)
+        for name, base, value, change in worse:
+            print(f"REGRESSION {name}: {base:,.2f} -> {value:,.2f} ({change:.1%} worse)")
+        if worse:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
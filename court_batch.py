@@ -0,0 +1,274 @@
+import time
+
+import numpy as np
+
+from badminton_game import (
+    OBSERVATION_SIZE, PLAYING, SERVE, POINT_SCORED, GAME_OVER,
+    NET_X, COURT_LEFT, COURT_RIGHT, FLOOR_Y, HEIGHT,
+    PLAYER_WIDTH, PLAYER_HEIGHT, PLAYER_SPEED, COMPUTER_SPEED, winning_score,
+)
+from shuttle_batch import ShuttleBatch
+
+# Many AI-vs-AI matches stepped together. CourtBatch keeps every court's
+# players, shuttle, score and game state in NumPy arrays and runs the same
+# per-frame rules as MatchSimulator.step() with both sides driven by batch
+# controllers (see policies.py), so each frame costs two policy calls and a
+# few dozen array operations however many courts there are.
+#
+# Courts start at the serve (there is no menu) and the hit aim randomness
+# comes from a NumPy generator, so a court does not replay a MatchSimulator
+# match with the same seed move for move; the rules are the same.
+
+LEFT = 0
+RIGHT = 1
+
+# Player bounds along x for each side (see Player.move)
+_MIN_X = np.array([[COURT_LEFT], [NET_X + 10]], dtype=float)
+_MAX_X = np.array([[NET_X - PLAYER_WIDTH - 10], [COURT_RIGHT - PLAYER_WIDTH]], dtype=float)
+_START_X = np.array([COURT_LEFT + 50, COURT_RIGHT - 50 - PLAYER_WIDTH], dtype=float)
+_GROUND_Y = FLOOR_Y - PLAYER_HEIGHT
+
+
+class CourtBatch:
+    def __init__(self, n, left_policy, right_policy, winning_score=winning_score, seed=None,
+                 speeds=(PLAYER_SPEED, COMPUTER_SPEED)):
+        self.n = n
+        self.policies = (left_policy, right_policy)
+        self.winning_score = winning_score
+        self.rng = np.random.default_rng(seed)
+
+        # Per-side player state, shape (2, n): row LEFT is the player, row RIGHT the computer
+        self.x = np.zeros((2, n))
+        self.y = np.zeros((2, n))
+        self.jump_speed = np.zeros((2, n))
+        self.on_ground = np.ones((2, n), dtype=bool)
+        self.swing_cooldown = np.zeros((2, n), dtype=int)
+        self.jump_cooldown = np.zeros((2, n), dtype=int)
+        self.speed = np.empty((2, n))
+        self.speed[LEFT] = speeds[0]
+        self.speed[RIGHT] = speeds[1]
+
+        self.shuttle = ShuttleBatch(n)
+        self.game_state = np.zeros(n, dtype=int)
+        self.scores = np.zeros((2, n), dtype=int)
+        self.serving = np.ones(n, dtype=bool)  # True when the left side serves
+        self.rally_count = np.zeros(n, dtype=int)
+        self.frame = np.zeros(n, dtype=int)
+        self.reset()
+
+    def reset(self, mask=None):
+        # Start new matches on every court (or those where `mask` is True)
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+        self.x[:, mask] = _START_X[:, None]
+        self.y[:, mask] = _GROUND_Y
+        self.jump_speed[:, mask] = 0
+        self.on_ground[:, mask] = True
+        self.swing_cooldown[:, mask] = 0
+        self.jump_cooldown[:, mask] = 0
+        self.scores[:, mask] = 0
+        self.serving[mask] = True
+        self.rally_count[mask] = 0
+        self.frame[mask] = 0
+        self.game_state[mask] = SERVE
+        self._reset_shuttle(mask)
+
+    @property
+    def done(self):
+        return self.game_state == GAME_OVER
+
+    def _reset_shuttle(self, mask):
+        # Serve position for whoever is serving (Shuttlecock.reset)
+        left = self.serving[mask]
+        shuttle = self.shuttle
+        shuttle.x[mask] = np.where(left, COURT_LEFT + 100, COURT_RIGHT - 100)
+        shuttle.vx[mask] = np.where(left, 2, -2)
+        shuttle.y[mask] = HEIGHT // 2
+        shuttle.vy[mask] = -10
+
+    def observations(self, side, courts):
+        # Observation matrix for one side on the given courts, laid out as
+        # OBSERVATION_FIELDS and mirrored for the left side like observe()
+        other = 1 - side
+        obs = np.empty((len(courts), OBSERVATION_SIZE))
+        own_x = self.x[side, courts]
+        opponent_x = self.x[other, courts]
+        shuttle_x = self.shuttle.x[courts]
+        shuttle_vx = self.shuttle.vx[courts]
+        if side == LEFT:
+            obs[:, 0] = -1.0
+            own_x = 2 * NET_X - own_x - PLAYER_WIDTH
+            shuttle_x = 2 * NET_X - shuttle_x
+            shuttle_vx = -shuttle_vx
+            opponent_x = 2 * NET_X - opponent_x - PLAYER_WIDTH
+        else:
+            obs[:, 0] = 1.0
+        obs[:, 1] = own_x
+        obs[:, 2] = self.y[side, courts]
+        obs[:, 3] = self.on_ground[side, courts]
+        obs[:, 4] = self.swing_cooldown[side, courts]
+        obs[:, 5] = self.jump_cooldown[side, courts]
+        obs[:, 6] = self.speed[side, courts]
+        obs[:, 7] = opponent_x
+        obs[:, 8] = self.y[other, courts]
+        obs[:, 9] = shuttle_x
+        obs[:, 10] = self.shuttle.y[courts]
+        obs[:, 11] = shuttle_vx
+        obs[:, 12] = self.shuttle.vy[courts]
+        return obs
+
+    def _swing(self, side, courts):
+        # Player.swing() for each court; returns the courts that swung
+        ready = self.swing_cooldown[side, courts] <= 0
+        courts = courts[ready]
+        self.swing_cooldown[side, courts] = 20
+        return courts
+
+    def _in_reach(self, side, courts):
+        # Hit window checks from MatchSimulator.step()
+        sx = self.shuttle.x[courts]
+        sy = self.shuttle.y[courts]
+        if side == LEFT:
+            reach = (sx < NET_X) & (np.abs(sx - (self.x[LEFT, courts] + PLAYER_WIDTH)) < 60)
+        else:
+            reach = (sx > NET_X) & (np.abs(sx - self.x[RIGHT, courts]) < 60)
+        reach &= np.abs(sy - (self.y[side, courts] + PLAYER_HEIGHT / 2)) < 60
+        return courts[reach]
+
+    def _hit(self, side, courts, power=10, serve=False):
+        # Shuttlecock.hit() for each court
+        n = len(courts)
+        if n == 0:
+            return
+        rng = self.rng
+        sx = self.shuttle.x[courts]
+        if side == RIGHT:
+            target_type = rng.integers(0, 11, n)
+            corner = rng.choice([COURT_LEFT + 30, NET_X - 80], n)
+            anywhere = rng.integers(COURT_LEFT, NET_X - 50 + 1, n)
+            target_x = np.where(target_type < 3, corner,
+                                np.where(target_type < 7, (COURT_LEFT + NET_X) // 2, anywhere))
+            jumping = self.y[RIGHT, courts] < FLOOR_Y - PLAYER_HEIGHT - 20
+            vy = np.where(jumping, -power * 1.2, -power)
+        else:
+            offset = rng.integers(0, 101, n)
+            near_side = sx - self.x[LEFT, courts] < PLAYER_WIDTH // 2
+            target_x = np.where(near_side, NET_X + 50 + offset, COURT_RIGHT - 50 - offset)
+            vy = np.where(self.on_ground[LEFT, courts], -power, -power * 1.3)
+        self.shuttle.vx[courts] = (target_x - sx) * 0.05 + rng.uniform(-0.5, 0.5, n)
+        self.shuttle.vy[courts] = vy + rng.uniform(-0.5, 0.5, n)
+        if not serve:
+            self.rally_count[courts] += 1
+
+    def _apply(self, side, courts, actions):
+        # apply_action() for each court; returns the courts that swung
+        left, right, jump, swing = actions.T
+        direction = np.where(left, -1, np.where(right, 1, 0))
+        if side == LEFT:
+            # Actions are in the mirrored frame
+            direction = -direction
+        x = self.x[side, courts] + direction * self.speed[side, courts]
+        self.x[side, courts] = np.clip(x, _MIN_X[side, 0], _MAX_X[side, 0])
+
+        jumpers = courts[jump & self.on_ground[side, courts] & (self.jump_cooldown[side, courts] <= 0)]
+        self.jump_speed[side, jumpers] = -12
+        self.on_ground[side, jumpers] = False
+        self.jump_cooldown[side, jumpers] = 30
+        return self._swing(side, courts[swing])
+
+    def _update_players(self, courts):
+        # Player.update() for both sides
+        airborne = ~self.on_ground[:, courts]
+        y = self.y[:, courts]
+        jump_speed = self.jump_speed[:, courts]
+        y = np.where(airborne, y + jump_speed, y)
+        jump_speed = np.where(airborne, jump_speed + 0.8, jump_speed)
+        landed = airborne & (y >= _GROUND_Y)
+        y[landed] = _GROUND_Y
+        jump_speed[landed] = 0
+        self.y[:, courts] = y
+        self.jump_speed[:, courts] = jump_speed
+        self.on_ground[:, courts] |= landed
+        for cooldown in (self.swing_cooldown, self.jump_cooldown):
+            values = cooldown[:, courts]
+            cooldown[:, courts] = values - (values > 0)
+
+    def step(self, actions=None):
+        # Advance every unfinished court by one frame. A side whose policy is
+        # None takes its moves from `actions`, an (n, 4) action matrix with a
+        # row per court (rows of courts that are not in play are ignored).
+        # Returns +1 where the left side scored, -1 where the right side
+        # scored and 0 elsewhere.
+        scored = np.zeros(self.n, dtype=int)
+        state = self.game_state
+        live = state != GAME_OVER
+        self.frame[live] += 1
+
+        # Between points both controllers press "swing" to carry on
+        between = np.flatnonzero(state == POINT_SCORED)
+        state[between] = SERVE
+        self._reset_shuttle(between)
+        self.rally_count[between] = 0
+        waiting = np.zeros(self.n, dtype=bool)
+        waiting[between] = True
+
+        # Serves: the left side hits, or the right side's serve is already in the air
+        serving = np.flatnonzero((state == SERVE) & ~waiting)
+        left_serves = serving[self.serving[serving]]
+        self._swing(LEFT, left_serves)
+        self._hit(LEFT, left_serves, 8, serve=True)
+        state[serving] = PLAYING
+        # The same press is a rally swing for the left side
+        self._hit(LEFT, self._in_reach(LEFT, self._swing(LEFT, serving)))
+
+        courts = np.flatnonzero(state == PLAYING)
+        if len(courts) == 0:
+            return scored
+        self._update_players(courts)
+        for side, policy in enumerate(self.policies):
+            if policy is None:
+                moves = np.asarray(actions, dtype=bool)[courts]
+            else:
+                moves = np.asarray(policy.act_batch(self.observations(side, courts)), dtype=bool)
+            self._hit(side, self._in_reach(side, self._apply(side, courts, moves)))
+
+        # Shuttle flight and scoring
+        active = np.zeros(self.n, dtype=bool)
+        active[courts] = True
+        landed = np.flatnonzero(self.shuttle.step(active))
+        if len(landed):
+            right_point = self.shuttle.x[landed] < NET_X
+            scored[landed] = np.where(right_point, -1, 1)
+            self.scores[RIGHT, landed[right_point]] += 1
+            self.scores[LEFT, landed[~right_point]] += 1
+            self.serving[landed] = ~right_point
+            state[landed] = POINT_SCORED
+            over = landed[self.scores[:, landed].max(axis=0) >= self.winning_score]
+            state[over] = GAME_OVER
+        return scored
+
+    def run(self, max_frames=200000):
+        # Step until every court has finished its match
+        for _ in range(max_frames):
+            if self.done.all():
+                break
+            self.step()
+        return self.done
+
+
+if __name__ == "__main__":
+    from policies import RuleBasedPolicy
+    from trajectory import get_landing_table
+
+    courts = 4096
+    table = get_landing_table()
+    batch = CourtBatch(courts, RuleBasedPolicy(table, np.random.default_rng(1)),
+                       RuleBasedPolicy(table, np.random.default_rng(2)), seed=0)
+    start = time.perf_counter()
+    finished = batch.run()
+    elapsed = time.perf_counter() - start
+    frames = int(batch.frame.sum())
+    left_wins = int((batch.scores[LEFT] > batch.scores[RIGHT])[finished].sum())
+    print(f"{courts} courts, {int(finished.sum())} finished in {elapsed:.2f}s "
+          f"({frames / elapsed:,.0f} court-frames/s)")
+    print(f"left wins {left_wins}, right wins {int(finished.sum()) - left_wins}")
@@ -0,0 +1,210 @@
+import time
+
+import numpy as np
+
+from badminton_game import (
+    MatchSimulator, Controller, FrameInput, observe,
+    GAME_OVER, OBSERVATION_SIZE, winning_score,
+)
+from court_batch import CourtBatch, LEFT, RIGHT
+from policies import ACTION_SIZE, RuleBasedPolicy
+
+# Reinforcement learning environments in the Gym style. The agent plays one
+# side of the court, the other side is an opponent controller (the built-in
+# AI unless another one is given). Observations are the controller
+# observations from observe() (see OBSERVATION_FIELDS), actions are four
+# booleans (left, right, jump, swing) and the reward is +1 for each point the
+# agent wins and -1 for each point it loses.
+#
+# BadmintonEnv wraps one MatchSimulator and is exact; VectorEnv runs
+# CourtBatch courts in lockstep and is the one to train with.
+
+MAX_EPISODE_FRAMES = 100000  # Episodes longer than this are truncated
+
+try:
+    from gymnasium import spaces
+except ImportError:
+    spaces = None
+
+
+class Box:
+    # Stand-in for gymnasium.spaces.Box when gymnasium is not installed
+    def __init__(self, low, high, shape, dtype=np.float32, seed=None):
+        self.low = np.full(shape, low, dtype=dtype)
+        self.high = np.full(shape, high, dtype=dtype)
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.np_random = np.random.default_rng(seed)
+
+    def sample(self):
+        low = np.maximum(self.low, -1e6)
+        high = np.minimum(self.high, 1e6)
+        return self.np_random.uniform(low, high).astype(self.dtype)
+
+    def contains(self, x):
+        x = np.asarray(x)
+        return x.shape == self.shape and bool(np.all((x >= self.low) & (x <= self.high)))
+
+
+class MultiBinary:
+    # Stand-in for gymnasium.spaces.MultiBinary when gymnasium is not installed
+    def __init__(self, n, seed=None):
+        self.n = n
+        self.shape = (n,)
+        self.dtype = np.dtype(np.int8)
+        self.np_random = np.random.default_rng(seed)
+
+    def sample(self):
+        return self.np_random.integers(0, 2, self.shape, dtype=self.dtype)
+
+    def contains(self, x):
+        x = np.asarray(x)
+        return x.shape == self.shape and bool(np.all((x == 0) | (x == 1)))
+
+
+def make_spaces():
+    # (observation_space, action_space), gymnasium's own classes when available
+    if spaces is not None:
+        return (spaces.Box(-np.inf, np.inf, (OBSERVATION_SIZE,), np.float32),
+                spaces.MultiBinary(ACTION_SIZE))
+    return Box(-np.inf, np.inf, (OBSERVATION_SIZE,)), MultiBinary(ACTION_SIZE)
+
+
+# Controller that plays back whatever action the environment was last given
+class _ActionSlot(Controller):
+    def __init__(self):
+        self.action = FrameInput()
+        self.used = False
+
+    def act(self, observation):
+        self.used = True
+        return self.action
+
+
+class BadmintonEnv:
+    def __init__(self, side="right", opponent=None, winning_score=winning_score, predictor=None,
+                 max_frames=MAX_EPISODE_FRAMES):
+        if side not in ("left", "right"):
+            raise ValueError(f"side must be 'left' or 'right', not {side!r}")
+        self.side = side
+        self.opponent = opponent
+        self.winning_score = winning_score
+        self.predictor = predictor
+        self.max_frames = max_frames
+        self.observation_space, self.action_space = make_spaces()
+        self.sim = None
+        self._slot = _ActionSlot()
+
+    def reset(self, seed=None, options=None):
+        slot = self._slot = _ActionSlot()
+        if self.side == "right":
+            # player_ai puts the built-in AI on the left when there is no opponent
+            self.sim = MatchSimulator(self.winning_score, self.predictor, seed,
+                                      player_ai=self.opponent is None,
+                                      player_controller=self.opponent, computer_controller=slot)
+            self.agent, self.rival = self.sim.computer, self.sim.player
+        else:
+            self.sim = MatchSimulator(self.winning_score, self.predictor, seed,
+                                      player_controller=slot, computer_controller=self.opponent)
+            self.agent, self.rival = self.sim.player, self.sim.computer
+        return self._observe(), self._info()
+
+    def _observe(self):
+        return np.asarray(observe(self.agent, self.rival, self.sim.shuttlecock), dtype=np.float32)
+
+    def _info(self):
+        sim = self.sim
+        scores = (sim.player_score, sim.computer_score)
+        if self.side == "right":
+            scores = scores[::-1]
+        return {"score": scores, "frame": sim.frame, "rally_count": sim.rally_count}
+
+    def step(self, action):
+        # Runs frames until the agent's action has been used (frames between
+        # points, where nobody moves, are skipped) or the episode ends
+        left, right, jump, swing = (bool(a) for a in action)
+        slot = self._slot
+        slot.action = FrameInput(left, right, jump, swing)
+        slot.used = False
+        sim = self.sim
+        reward = 0.0
+        while True:
+            for event in sim.step():
+                if event.kind == "point":
+                    reward += 1.0 if event.who is self.agent else -1.0
+            terminated = sim.game_state == GAME_OVER
+            truncated = not terminated and sim.frame >= self.max_frames
+            if slot.used or terminated or truncated:
+                break
+        return self._observe(), reward, terminated, truncated, self._info()
+
+
+class VectorEnv:
+    # num_envs courts stepped together with batched arrays. step() takes an
+    # (num_envs, 4) action matrix and returns (observations, rewards,
+    # terminated, truncated, info); courts whose match ended are reset at
+    # once, and info carries the "final_observation" and "final_score" of
+    # those courts (indexed by info["done_index"]). One step is one frame on
+    # every court; the action of a court that is between points is ignored.
+    def __init__(self, num_envs, side="right", opponent=None, winning_score=winning_score,
+                 predictor=None, seed=None, max_frames=MAX_EPISODE_FRAMES):
+        if side not in ("left", "right"):
+            raise ValueError(f"side must be 'left' or 'right', not {side!r}")
+        self.num_envs = num_envs
+        self.side = RIGHT if side == "right" else LEFT
+        self.max_frames = max_frames
+        batch_seed, opponent_seed = np.random.SeedSequence(seed).spawn(2)
+        if opponent is None:
+            opponent = RuleBasedPolicy(predictor, np.random.default_rng(opponent_seed))
+        policies = (opponent, None) if self.side == RIGHT else (None, opponent)
+        self.batch = CourtBatch(num_envs, *policies, winning_score=winning_score,
+                                seed=batch_seed)
+        self.observation_space, self.action_space = make_spaces()
+        self._courts = np.arange(num_envs)
+        self._sign = 1.0 if self.side == LEFT else -1.0
+
+    def _observe(self, courts=None):
+        courts = self._courts if courts is None else courts
+        return self.batch.observations(self.side, courts).astype(np.float32)
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.batch.rng = np.random.default_rng(seed)
+        self.batch.reset()
+        return self._observe(), {}
+
+    def step(self, actions):
+        batch = self.batch
+        reward = (batch.step(actions) * self._sign).astype(np.float32)
+        terminated = batch.done
+        truncated = ~terminated & (batch.frame >= self.max_frames)
+        obs = self._observe()
+        info = {}
+        finished = np.flatnonzero(terminated | truncated)
+        if len(finished):
+            info["done_index"] = finished
+            info["final_observation"] = obs[finished]
+            info["final_score"] = batch.scores[:, finished][[self.side, 1 - self.side]].T
+            batch.reset(finished)
+            obs[finished] = self._observe(finished)
+        return obs, reward, terminated, truncated, info
+
+
+if __name__ == "__main__":
+    # Throughput with random actions and the built-in AI as the opponent
+    from trajectory import get_landing_table
+
+    num_envs = 4096
+    env = VectorEnv(num_envs, predictor=get_landing_table(), seed=0)
+    env.reset()
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, 2, (64, num_envs, ACTION_SIZE)).astype(bool)
+    steps = episodes = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 10:
+        _, _, terminated, truncated, _ = env.step(actions[steps % 64])
+        episodes += int(np.count_nonzero(terminated | truncated))
+        steps += 1
+    elapsed = time.perf_counter() - start
+    print(f"{num_envs} envs: {steps * num_envs / elapsed * 60:,.0f} env steps/min, "
+          f"{episodes} episodes finished")
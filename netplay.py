@@ -0,0 +1,511 @@
+import argparse
+import asyncio
+import random
+import struct
+import sys
+import time
+
+from badminton_game import (
+    MatchSimulator, Controller, FrameInput, NO_INPUT, RuleBasedController,
+    observe, MENU, PLAYING, SERVE, POINT_SCORED, GAME_OVER, SIM_RATE, MAX_FRAME_TIME,
+    winning_score,
+)
+from replay import encode_input, decode_input
+
+# Online versus play. Two game instances run the same deterministic
+# MatchSimulator and exchange nothing but their players' per-frame key state
+# over UDP. The host plays the left side, the guest the right.
+#
+# Each side steps ahead on its own input (held back INPUT_DELAY frames) and a
+# guess of the other side's: the last held left/right keys, with no jump or
+# swing. When the real input for a frame arrives and differs from the guess,
+# the match is rolled back to the snapshot taken before that frame and
+# re-simulated with the real inputs. A side that gets MAX_ROLLBACK frames
+# ahead of the last input it has from its peer waits for it.
+#
+# Every packet carries all the inputs the peer has not acknowledged yet, so a
+# lost packet is made good by the next one and nothing is retransmitted.
+#
+#   python netplay.py --host 7777              wait for a player on port 7777
+#   python netplay.py --join 192.168.1.5:7777  join a hosted game
+#   python netplay.py --loopback               headless check of two peers over 127.0.0.1
+
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 7777
+INPUT_DELAY = 2  # Frames between a key press and the frame it applies to
+MAX_ROLLBACK = 8  # Furthest a side runs ahead of its peer's confirmed input
+MAX_PACKET_INPUTS = 64  # Unacknowledged inputs sent per packet, oldest first
+HELLO_INTERVAL = 0.25  # Seconds between join attempts
+PEER_TIMEOUT = 5.0  # Seconds without the peer's input before giving up
+
+LEFT = 0
+RIGHT = 1
+
+# Packets, little endian: a kind byte followed by
+#   hello    protocol version u16                                    guest -> host
+#   welcome  protocol version u16, seed u64, winning score u16       host -> guest
+#   inputs   inputs received so far u32, first frame u32, count u8,
+#            then one byte per frame of key bits (see replay.encode_input)
+HELLO = 1
+WELCOME = 2
+INPUTS = 3
+_HELLO = struct.Struct("<BH")
+_WELCOME = struct.Struct("<BHQH")
+_INPUTS = struct.Struct("<BIIB")
+
+
+# The remote player's controller: plays whatever input the session gives it
+class _RemoteSlot(Controller):
+    def __init__(self):
+        self.action = NO_INPUT
+
+    def act(self, observation):
+        return self.action
+
+
+# One step's inputs for MatchSimulator.step(). Either player's SPACE starts,
+# serves and continues and either player's R restarts; during a rally the
+# left player's SPACE is a swing and the right player swings through its
+# controller.
+def merge_inputs(game_state, left, right):
+    if game_state == PLAYING:
+        swing = left.swing
+    else:
+        swing = left.swing or right.swing
+    return FrameInput(left.left, left.right, left.jump, swing,
+                      game_state == GAME_OVER and (left.restart or right.restart))
+
+
+# Guess at the peer's input for a frame it has not sent yet: keys held on the
+# last frame we know stay held, one-shot presses are not repeated
+def predict_input(last):
+    return FrameInput(last.left, last.right)
+
+
+class RollbackSession:
+    def __init__(self, side, seed, winning_score=winning_score, input_delay=INPUT_DELAY,
+                 max_rollback=MAX_ROLLBACK):
+        self.side = side
+        self.max_rollback = max_rollback
+        self._slot = _RemoteSlot()
+        # Both sides are players; the right one is driven through the slot
+        self.sim = MatchSimulator(winning_score, seed=seed, computer_controller=self._slot)
+        self.local_inputs = [NO_INPUT] * input_delay
+        self.remote_inputs = []  # Confirmed, one per frame from frame 0
+        self._size = max_rollback + 1
+        # State before each unconfirmed frame, packed into buffers allocated once
+        self._snapshots = [bytearray(self.sim.snapshot_size) for _ in range(self._size)]
+        self._guesses = [None] * self._size  # Remote input each unconfirmed frame was run with
+        self._events = [()] * self._size  # Events each unconfirmed frame produced
+        self._late_events = []  # From re-simulated frames, not yet handed out by tick()
+        self._rollback_from = None
+        # Statistics
+        self.rollbacks = 0
+        self.frames_resimulated = 0
+        self.rollback_time = 0.0
+        self.max_rollback_time = 0.0
+        self.rollback_times = []  # Seconds, one per rollback
+
+    @property
+    def frame(self):
+        # Frames simulated so far
+        return self.sim.frame
+
+    @property
+    def confirmed_frame(self):
+        # Frames whose inputs from both sides are known
+        return min(len(self.remote_inputs), len(self.local_inputs))
+
+    @property
+    def stalled(self):
+        return self.frame - len(self.remote_inputs) >= self.max_rollback
+
+    def add_remote_inputs(self, first, inputs):
+        # Inputs the peer sent for frames first, first + 1, ...; anything
+        # already known is skipped and a gap (a lost packet) waits for a resend
+        known = len(self.remote_inputs)
+        if first > known:
+            return
+        for frame in range(known, first + len(inputs)):
+            remote = inputs[frame - first]
+            self.remote_inputs.append(remote)
+            if frame < self.frame and remote != self._guesses[frame % self._size]:
+                if self._rollback_from is None or frame < self._rollback_from:
+                    self._rollback_from = frame
+
+    def rollback(self):
+        # Re-simulate from the first frame that was run with a wrong guess
+        start = self._rollback_from
+        if start is None:
+            return
+        self._rollback_from = None
+        started = time.perf_counter()
+        target = self.frame
+        # Events already shown for these frames, by kind and player; a
+        # re-simulated one with no match here (a corrected hit, a point the
+        # guess missed) is handed out late by tick()
+        shown = {}
+        for frame in range(start, target):
+            for event in self._events[frame % self._size]:
+                key = event.kind, event.who
+                shown[key] = shown.get(key, 0) + 1
+        self.sim.restore(self._snapshots[start % self._size])
+        while self.frame < target:
+            for event in self._step():
+                key = event.kind, event.who
+                if shown.get(key):
+                    shown[key] -= 1
+                else:
+                    self._late_events.append(event)
+        elapsed = time.perf_counter() - started
+        self.rollbacks += 1
+        self.frames_resimulated += target - start
+        self.rollback_time += elapsed
+        self.max_rollback_time = max(self.max_rollback_time, elapsed)
+        self.rollback_times.append(elapsed)
+
+    def _step(self):
+        frame = self.frame
+        slot = frame % self._size
+        self.sim.snapshot(self._snapshots[slot])
+        if frame < len(self.remote_inputs):
+            remote = self.remote_inputs[frame]
+        else:
+            last = self.remote_inputs[-1] if self.remote_inputs else NO_INPUT
+            remote = self._guesses[slot] = predict_input(last)
+        local = self.local_inputs[frame]
+        left, right = (local, remote) if self.side == LEFT else (remote, local)
+        self._slot.action = right
+        events = self._events[slot] = self.sim.step(merge_inputs(self.sim.game_state, left, right))
+        return events
+
+    def tick(self, local_input):
+        # Queue this frame's local input and advance one frame. Returns the
+        # new frame's events, after any that a rollback turned up in earlier
+        # frames, or None (and the input is not taken) while waiting for the
+        # peer.
+        self.rollback()
+        if self.stalled:
+            return None
+        self.local_inputs.append(local_input)
+        events = self._step()
+        if self._late_events:
+            events = self._late_events + events
+            self._late_events = []
+        return events
+
+    def settle(self):
+        # Apply any late corrections; once the peer's inputs up to the
+        # current frame are in, the state is final
+        self.rollback()
+        return self.confirmed_frame >= self.frame
+
+
+class NetPeer(asyncio.DatagramProtocol):
+    # UDP endpoint for one side of a match. latency (seconds), jitter and
+    # loss (a probability) simulate a bad network on outgoing packets.
+    def __init__(self, session=None, latency=0.0, jitter=0.0, loss=0.0, seed=None):
+        self.session = session
+        self.remote = None
+        self.transport = None
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.acked = 0  # Local inputs the peer has confirmed receiving
+        self.welcomed = None  # Future set when a hello or welcome arrives
+        self.delayed = {}  # Packet number -> timer handle of a send held back by the simulated latency
+        self.packets_sent = 0
+        self.bytes_sent = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.welcomed = asyncio.get_running_loop().create_future()
+
+    def send(self, data):
+        if self.remote is None:
+            return
+        self.packets_sent += 1
+        self.bytes_sent += len(data)
+        if self.loss and self.rng.random() < self.loss:
+            return
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay > 0:
+            self.delayed[self.packets_sent] = asyncio.get_running_loop().call_later(
+                delay, self._send_delayed, self.packets_sent, data)
+        else:
+            self.transport.sendto(data, self.remote)
+
+    def _send_delayed(self, number, data):
+        # A held-back send coming due; dropped if the socket closed meanwhile
+        del self.delayed[number]
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.sendto(data, self.remote)
+
+    def close(self):
+        # Drop the sends still held back and close the socket
+        for handle in self.delayed.values():
+            handle.cancel()
+        self.delayed.clear()
+        if self.transport is not None:
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        self.transport = None
+
+    def send_inputs(self):
+        session = self.session
+        first = self.acked
+        inputs = session.local_inputs[first:first + MAX_PACKET_INPUTS]
+        self.send(_INPUTS.pack(INPUTS, len(session.remote_inputs), first, len(inputs)) +
+                  bytes(encode_input(inputs) for inputs in inputs))
+
+    def datagram_received(self, data, addr):
+        if not data:
+            return
+        kind = data[0]
+        if kind == INPUTS and self.session is not None and addr == self.remote:
+            if len(data) < _INPUTS.size:
+                return
+            _, acked, first, count = _INPUTS.unpack_from(data)
+            self.acked = max(self.acked, acked)
+            bits = data[_INPUTS.size:_INPUTS.size + count]
+            self.session.add_remote_inputs(first, [decode_input(b) for b in bits])
+        elif kind == HELLO and len(data) == _HELLO.size:
+            # A guest; the first one to arrive plays
+            _, version = _HELLO.unpack(data)
+            if version == PROTOCOL_VERSION and self.remote in (None, addr):
+                self.remote = addr
+                if not self.welcomed.done():
+                    self.welcomed.set_result(addr)
+                if self.session is not None:
+                    # Our welcome may have been lost; say it again
+                    sim = self.session.sim
+                    self.send(_WELCOME.pack(WELCOME, PROTOCOL_VERSION, sim.seed, sim.winning_score))
+        elif kind == WELCOME and len(data) == _WELCOME.size and addr == self.remote:
+            _, version, seed, score = _WELCOME.unpack(data)
+            if version == PROTOCOL_VERSION and not self.welcomed.done():
+                self.welcomed.set_result((seed, score))
+
+    def error_received(self, exc):
+        # ICMP port unreachable and the like - the peer may not be up yet
+        pass
+
+
+async def open_host(port, bind="0.0.0.0", **network):
+    # Bind the host's socket; a guest can say hello from here on
+    loop = asyncio.get_running_loop()
+    transport, peer = await loop.create_datagram_endpoint(
+        lambda: NetPeer(**network), local_addr=(bind, port))
+    return peer
+
+
+async def accept(peer, seed=None, winning_score=winning_score):
+    # Wait for a guest; returns (peer, session) with us on the left
+    await peer.welcomed
+    seed = seed if seed is not None else random.getrandbits(64)
+    peer.session = RollbackSession(LEFT, seed, winning_score)
+    peer.send(_WELCOME.pack(WELCOME, PROTOCOL_VERSION, seed, winning_score))
+    return peer, peer.session
+
+
+async def host(port, seed=None, winning_score=winning_score, bind="0.0.0.0", **network):
+    return await accept(await open_host(port, bind, **network), seed, winning_score)
+
+
+async def join(address, port, **network):
+    # Join the game hosted at (address, port); returns (peer, session) with us on the right
+    loop = asyncio.get_running_loop()
+    transport, peer = await loop.create_datagram_endpoint(
+        lambda: NetPeer(**network), remote_addr=(address, port))
+    peer.remote = transport.get_extra_info("peername")
+    while not peer.welcomed.done():
+        peer.send(_HELLO.pack(HELLO, PROTOCOL_VERSION))
+        await asyncio.wait([peer.welcomed], timeout=HELLO_INTERVAL)
+    seed, score = peer.welcomed.result()
+    peer.session = RollbackSession(RIGHT, seed, score)
+    return peer, peer.session
+
+
+# Headless stand-in for a player: the built-in AI, on its own random stream,
+# playing the local side of the (possibly speculative) local match
+def bot_input(session, controller):
+    sim = session.sim
+    if sim.game_state in (MENU, SERVE, POINT_SCORED, GAME_OVER):
+        return FrameInput(swing=True, restart=True)
+    me, them = (sim.player, sim.computer) if session.side == LEFT else (sim.computer, sim.player)
+    action = controller.act(observe(me, them, sim.shuttlecock))
+    if session.side == LEFT:
+        # Controller actions are mirrored for the left side, keys are not
+        action = FrameInput(action.right, action.left, action.jump, action.swing)
+    return action
+
+
+async def run_bot(peer, frames, rate, seed):
+    session = peer.session
+    controller = RuleBasedController(rng=random.Random(seed))
+    interval = 1.0 / rate
+    next_tick = time.perf_counter()
+    while session.frame < frames:
+        session.tick(bot_input(session, controller))
+        peer.send_inputs()
+        next_tick += interval
+        await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+    # Keep acknowledging until both sides have every input
+    while not session.settle() or peer.acked < len(session.local_inputs):
+        peer.send_inputs()
+        await asyncio.sleep(interval)
+    for _ in range(3):
+        peer.send_inputs()
+        await asyncio.sleep(interval)
+
+
+async def run_loopback(frames, rate, latency, jitter, loss, seed):
+    network = {"latency": latency, "jitter": jitter, "loss": loss}
+    host_peer = await open_host(0, "127.0.0.1", seed=1, **network)
+    port = host_peer.transport.get_extra_info("sockname")[1]
+    (host_peer, _), (guest_peer, _) = await asyncio.gather(
+        accept(host_peer, seed), join("127.0.0.1", port, seed=2, **network))
+
+    started = time.perf_counter()
+    await asyncio.gather(run_bot(host_peer, frames, rate, seed + 1),
+                         run_bot(guest_peer, frames, rate, seed + 2))
+    elapsed = time.perf_counter() - started
+    for peer in (host_peer, guest_peer):
+        peer.close()
+    return host_peer, guest_peer, elapsed
+
+
+# The game window for one side of an online match
+async def play(connecting):
+    import pygame
+    import badminton_game as game
+    from particles import ParticleSystem
+    from audio import AudioManager
+
+    game.init_display()
+    audio = AudioManager()
+    if not audio.start():
+        audio = None
+    pygame.display.set_caption("Badminton Championship - waiting for the other player")
+    connection = asyncio.ensure_future(connecting)
+    while not connection.done():
+        game.draw_frame(MatchSimulator(), ParticleSystem(game.sprite_atlas), 0)
+        game.present_frame()
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            connection.cancel()
+            pygame.quit()
+            return 0
+        await asyncio.sleep(0.05)
+    peer, session = connection.result()
+    side = "left" if session.side == LEFT else "right"
+    pygame.display.set_caption(f"Badminton Championship - online, you play on the {side}")
+
+    particles = ParticleSystem(game.sprite_atlas)
+    combo_display_time = 0
+    jump = swing = restart = False
+    interval = 1.0 / SIM_RATE
+    next_tick = last_progress = time.perf_counter()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and
+                                             event.key == pygame.K_ESCAPE):
+                peer.close()
+                pygame.quit()
+                return 0
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    swing = True
+                if event.key == pygame.K_r:
+                    restart = True
+                if event.key == pygame.K_UP:
+                    jump = True
+
+        keys = pygame.key.get_pressed()
+        game.record_trails(session.sim)
+        events = session.tick(FrameInput(keys[pygame.K_LEFT], keys[pygame.K_RIGHT],
+                                         jump, swing, restart))
+        peer.send_inputs()
+        now = time.perf_counter()
+        if events is None:
+            # Waiting for the peer; presses stay queued
+            if now - last_progress > PEER_TIMEOUT:
+                print("Lost connection to the other player")
+                peer.close()
+                pygame.quit()
+                return 1
+        else:
+            last_progress = now
+            jump = swing = restart = False
+            for event in events:
+                game.spawn_effects(particles, event)
+                if audio is not None:
+                    audio.play_event(event)
+                if event.kind == "hit" and session.sim.rally_count >= 3:
+                    combo_display_time = 120
+            if combo_display_time > 0:
+                combo_display_time -= 1
+            particles.update()
+
+        game.draw_frame(session.sim, particles, combo_display_time)
+        game.present_frame()
+
+        next_tick += interval
+        if next_tick < now - MAX_FRAME_TIME:
+            next_tick = now  # Far behind (window dragged, etc.) - don't race to catch up
+        await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+
+
+def report(name, peer):
+    session = peer.session
+    sim = session.sim
+    mean = session.rollback_time / max(1, session.rollbacks)
+    per_frame = session.rollback_time / max(1, session.frames_resimulated)
+    times = sorted(session.rollback_times) or [0.0]
+    p99 = times[min(len(times) - 1, int(len(times) * 0.99))]
+    print(f"{name}: {session.rollbacks} rollbacks, {session.frames_resimulated} frames re-simulated, "
+          f"{per_frame * 1e6:.0f} us/frame, mean {mean * 1e3:.3f} ms, p99 {p99 * 1e3:.3f} ms, "
+          f"max {session.max_rollback_time * 1e3:.3f} ms; "
+          f"{peer.packets_sent} packets, {peer.bytes_sent / max(1, peer.packets_sent):.0f} bytes avg; "
+          f"score {sim.player_score}-{sim.computer_score}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Online two-player badminton")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--host", type=int, nargs="?", const=DEFAULT_PORT, metavar="PORT",
+                      help="host a game on PORT (default %(const)s)")
+    mode.add_argument("--join", metavar="ADDRESS[:PORT]", help="join a hosted game")
+    mode.add_argument("--loopback", action="store_true",
+                      help="play two AI peers against each other over 127.0.0.1 and check they agree")
+    parser.add_argument("--seed", type=int, help="match seed (host and loopback)")
+    parser.add_argument("--frames", type=int, default=1800, help="loopback match length in frames")
+    parser.add_argument("--rate", type=float, default=SIM_RATE, help="loopback frames per second")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="simulated one-way delay in ms on outgoing packets")
+    parser.add_argument("--jitter", type=float, default=0.0, help="simulated extra random delay in ms")
+    parser.add_argument("--loss", type=float, default=0.0, help="simulated packet loss, 0 to 1")
+    args = parser.parse_args(argv)
+    network = {"latency": args.latency / 1000, "jitter": args.jitter / 1000, "loss": args.loss}
+
+    if args.loopback:
+        seed = args.seed if args.seed is not None else 0
+        host_peer, guest_peer, elapsed = asyncio.run(
+            run_loopback(args.frames, args.rate, seed=seed, **network))
+        frame = host_peer.session.frame
+        print(f"{frame} frames in {elapsed:.1f}s over loopback "
+              f"(latency {args.latency:g} ms, jitter {args.jitter:g} ms, loss {args.loss:.0%})")
+        report("host", host_peer)
+        report("guest", guest_peer)
+        same = host_peer.session.sim.snapshot() == guest_peer.session.sim.snapshot()
+        print("Peers agree" if same else "Peers DESYNCED")
+        return 0 if same else 1
+
+    if args.join:
+        address, _, port = args.join.partition(":")
+        return asyncio.run(play(join(address, int(port or DEFAULT_PORT), **network)))
+    return asyncio.run(play(host(args.host, args.seed, **network)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+import pygame
+
+# Structure-of-arrays particle system for the hit and floor-impact effects.
+# Particles live in fixed-capacity NumPy arrays; dead particles are removed by
+# swapping live ones from the end into their slots, so nothing is reallocated
+# or shifted while the game runs. Drawing goes through a SpriteAtlas and a
+# single Surface.blits() call.
+
+MAX_PARTICLES = 4096
+PARTICLE_GRAVITY = 0.1
+PARTICLE_FADE_FRAMES = 60  # Lifetime at which a particle is fully opaque
+PARTICLE_SIZES = (2, 5)  # Smallest and largest radius of a new particle
+
+
+class ParticleSystem:
+    def __init__(self, atlas, capacity=MAX_PARTICLES, rng=None):
+        self.atlas = atlas
+        self.capacity = capacity
+        # Cosmetic randomness only - never shares a stream with gameplay
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.count = 0
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.size = np.zeros(capacity, dtype=np.int32)
+        self.lifetime = np.zeros(capacity, dtype=np.int32)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+    
+    def __len__(self):
+        return self.count
+    
+    def clear(self):
+        self.count = 0
+    
+    def emit(self, x, y, color, count=10, speed=3, size_range=PARTICLE_SIZES):
+        # Add a burst of particles; anything past the capacity is dropped
+        n = min(count, self.capacity - self.count)
+        if n <= 0:
+            return
+        start, end = self.count, self.count + n
+        angle = self.rng.uniform(0, 2 * math.pi, n)
+        speed_val = self.rng.uniform(1, speed, n)
+        self.x[start:end] = x
+        self.y[start:end] = y
+        self.vx[start:end] = np.cos(angle) * speed_val
+        self.vy[start:end] = np.sin(angle) * speed_val
+        self.size[start:end] = self.rng.integers(size_range[0], size_range[1] + 1, n)
+        self.lifetime[start:end] = self.rng.integers(20, 61, n)  # Frames
+        self.color[start:end] = color[:3]
+        self.count = end
+    
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+        
+        # Update position, then apply gravity and fade
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.vy[:n] += PARTICLE_GRAVITY
+        self.lifetime[:n] -= 1
+        
+        # Swap-remove dead particles: live particles from the tail fill the
+        # holes left in the front, so only the dead slots are touched
+        dead = np.flatnonzero(self.lifetime[:n] <= 0)
+        if len(dead) == 0:
+            return
+        alive = n - len(dead)
+        holes = dead[dead < alive]
+        tail = np.arange(alive, n)
+        sources = tail[self.lifetime[alive:n] > 0]
+        for field in (self.x, self.y, self.vx, self.vy, self.size, self.lifetime, self.color):
+            field[holes] = field[sources]
+        self.count = alive
+    
+    def bounds(self):
+        # Screen area covered by the live particles
+        n = self.count
+        size = self.size[:n].max()
+        left = self.x[:n].min() - size
+        top = self.y[:n].min() - size
+        return pygame.Rect(left - 1, top - 1, self.x[:n].max() + size - left + 2,
+                           self.y[:n].max() + size - top + 2)
+    
+    def draw(self, surface, scale=1.0):
+        # scale: surface pixels per unit of particle coordinates
+        n = self.count
+        if n == 0:
+            return
+        alpha = np.minimum(255, (255 * self.lifetime[:n]) // PARTICLE_FADE_FRAMES)
+        size = self.size[:n]
+        if scale != 1.0:
+            size = np.rint(size * scale).astype(np.int32)
+        left = (self.x[:n] * scale - size).tolist()
+        top = (self.y[:n] * scale - size).tolist()
+        circle = self.atlas.circle
+        
+        blits = []
+        for s, c, a, bx, by in zip(size.tolist(), self.color[:n].tolist(), alpha.tolist(), left, top):
+            sprite = circle(s, c, a)
+            if sprite is not None:
+                blits.append((sprite, (bx, by)))
+        surface.blits(blits, doreturn=False)
@@ -0,0 +1,187 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from badminton_game import (
+    Controller, FrameInput, OBSERVATION_SIZE,
+    NET_X, COURT_RIGHT, FLOOR_Y, HEIGHT, WIDTH,
+    PLAYER_WIDTH, PLAYER_HEIGHT, AI_JITTER, HIT_REACH,
+)
+
+# Batched controllers: act_batch() takes an (N, OBSERVATION_SIZE) matrix of
+# observations (one row per court, laid out as OBSERVATION_FIELDS) and returns
+# an (N, 4) bool matrix of ACTION_FIELDS, so a policy is evaluated for
+# thousands of courts with a handful of NumPy calls. Every batch controller is
+# also a plain Controller and can drive a Player in MatchSimulator.
+
+ACTION_FIELDS = ("left", "right", "jump", "swing")
+ACTION_SIZE = len(ACTION_FIELDS)
+
+# Column indices into an observation matrix
+(SIDE, OWN_X, OWN_Y, OWN_ON_GROUND, OWN_SWING_COOLDOWN, OWN_JUMP_COOLDOWN, OWN_SPEED,
+ OPPONENT_X, OPPONENT_Y, SHUTTLE_X, SHUTTLE_Y, SHUTTLE_VX, SHUTTLE_VY) = range(OBSERVATION_SIZE)
+
+# Rough magnitude of each observation column, used to normalise network inputs
+OBSERVATION_SCALE = np.array([1, WIDTH, HEIGHT, 1, 20, 30, 10,
+                              WIDTH, HEIGHT, WIDTH, HEIGHT, 30, 30], dtype=float)
+
+
+class BatchController(Controller, ABC):
+    @abstractmethod
+    def act_batch(self, observations):
+        pass
+
+    def act(self, observation):
+        left, right, jump, swing = self.act_batch(np.asarray([observation], dtype=float))[0]
+        return FrameInput(bool(left), bool(right), bool(jump), bool(swing))
+
+
+# Vectorized rule_based_action(): the built-in AI for many courts at once.
+# Decisions match the scalar version except for the random aiming jitter,
+# which comes from a NumPy generator instead of the match's GameRNG.
+class RuleBasedPolicy(BatchController):
+    def __init__(self, predictor=None, rng=None, jitter=AI_JITTER, swing_window=HIT_REACH):
+        self.predictor = predictor
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.jitter = jitter
+        self.swing_window = swing_window
+
+    def act_batch(self, observations):
+        obs = np.asarray(observations, dtype=float)
+        side = obs[:, SIDE]
+        own_x = obs[:, OWN_X]
+        own_y = obs[:, OWN_Y]
+        shuttle_x = obs[:, SHUTTLE_X]
+        shuttle_y = obs[:, SHUTTLE_Y]
+        shuttle_vx = obs[:, SHUTTLE_VX]
+        shuttle_vy = obs[:, SHUTTLE_VY]
+
+        # Predicted landing spot for shuttles coming toward this side
+        incoming = shuttle_vx > 0
+        if self.predictor is not None:
+            # The table is built for real court coordinates, so left-side
+            # observations are mirrored back before the lookup. Only the
+            # incoming shuttles are looked up; the rest are never used.
+            mirrored = side[incoming] < 0
+            real_x = np.where(mirrored, 2 * NET_X - shuttle_x[incoming], shuttle_x[incoming])
+            real_vx = np.where(mirrored, -shuttle_vx[incoming], shuttle_vx[incoming])
+            landing, _ = self.predictor.predict_many(real_x, shuttle_y[incoming], real_vx,
+                                                     shuttle_vy[incoming])
+            landing_x = np.zeros(len(obs))
+            landing_x[incoming] = np.where(mirrored, 2 * NET_X - landing, landing)
+            valid = incoming & (landing_x > NET_X)
+        else:
+            time_to_impact = (FLOOR_Y - shuttle_y) / np.maximum(0.1, shuttle_vy)
+            landing_x = shuttle_x + shuttle_vx * time_to_impact
+            valid = incoming & (shuttle_x > NET_X)
+
+        # Strategic positioning, or back to the centre of the half
+        target_x = np.where(valid, landing_x, (NET_X + COURT_RIGHT) / 2)
+        smash = valid & (shuttle_y < HEIGHT * 0.3) & (np.abs(shuttle_vy) > 5)
+        drop = valid & ~smash & (shuttle_y > HEIGHT * 0.6)
+        target_x = np.where(smash, np.minimum(target_x, COURT_RIGHT - 100), target_x)
+        target_x = np.where(drop, np.maximum(target_x, NET_X + 100), target_x)
+        target_x = target_x + self.rng.integers(-self.jitter, self.jitter + 1, len(obs))
+
+        actions = np.empty((len(obs), ACTION_SIZE), dtype=bool)
+        actions[:, 0] = target_x < own_x + PLAYER_WIDTH / 2
+        actions[:, 1] = ~actions[:, 0]
+        actions[:, 2] = ((shuttle_y < own_y - 50) & (shuttle_x > NET_X) &
+                         (np.abs(shuttle_x - own_x) < 100) & (obs[:, OWN_ON_GROUND] > 0))
+        actions[:, 3] = ((shuttle_x > NET_X) &
+                         (np.abs(shuttle_x - (own_x + PLAYER_WIDTH / 2)) < self.swing_window) &
+                         (np.abs(shuttle_y - (own_y + PLAYER_HEIGHT / 3)) < self.swing_window) &
+                         ((shuttle_vy > 0) | (np.abs(shuttle_y - own_y) < 30)))
+        return actions
+
+
+# Small fully connected network: tanh hidden layers, one output per action,
+# an action is taken when its output is positive
+class MLPPolicy(BatchController):
+    def __init__(self, weights, biases):
+        self.weights = [np.asarray(w, dtype=float) for w in weights]
+        self.biases = [np.asarray(b, dtype=float) for b in biases]
+        if self.weights[0].shape[0] != OBSERVATION_SIZE or self.weights[-1].shape[1] != ACTION_SIZE:
+            raise ValueError(f"network must map {OBSERVATION_SIZE} inputs to {ACTION_SIZE} outputs")
+
+    @classmethod
+    def random(cls, hidden=(32,), seed=None, scale=0.5):
+        # Randomly initialised network, e.g. as a starting point for search
+        rng = np.random.default_rng(seed)
+        sizes = (OBSERVATION_SIZE,) + tuple(hidden) + (ACTION_SIZE,)
+        weights = [rng.normal(0, scale, (a, b)) for a, b in zip(sizes, sizes[1:])]
+        biases = [np.zeros(b) for b in sizes[1:]]
+        return cls(weights, biases)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            layers = len(data.files) // 2
+            return cls([data[f"w{i}"] for i in range(layers)], [data[f"b{i}"] for i in range(layers)])
+
+    def save(self, path):
+        arrays = {}
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            arrays[f"w{i}"] = w
+            arrays[f"b{i}"] = b
+        np.savez(path, **arrays)
+
+    def act_batch(self, observations):
+        h = np.asarray(observations, dtype=float) / OBSERVATION_SCALE
+        last = len(self.weights) - 1
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            h = h @ w + b
+            if i < last:
+                np.tanh(h, out=h)
+        return h > 0
+
+
+# Default lookup-table cells: shuttle position relative to the player and the
+# shuttle's velocity, in the controlled player's frame
+LOOKUP_BINS = (
+    np.linspace(-450, 450, 31),   # shuttle_x - player centre
+    np.linspace(-500, 300, 17),   # shuttle_y - player top
+    np.linspace(-25, 25, 11),     # shuttle_vx
+    np.linspace(-25, 25, 11),     # shuttle_vy
+)
+
+
+def _lookup_features(obs):
+    return (obs[:, SHUTTLE_X] - (obs[:, OWN_X] + PLAYER_WIDTH / 2),
+            obs[:, SHUTTLE_Y] - obs[:, OWN_Y],
+            obs[:, SHUTTLE_VX],
+            obs[:, SHUTTLE_VY])
+
+
+# Tabular agent: one action per discretised (relative position, velocity)
+# cell, stored as 4-bit codes (left, right, jump, swing)
+class LookupTablePolicy(BatchController):
+    def __init__(self, table, bins=LOOKUP_BINS):
+        self.bins = [np.asarray(edges, dtype=float) for edges in bins]
+        self.shape = tuple(len(edges) + 1 for edges in self.bins)
+        self.table = np.asarray(table, dtype=np.uint8).reshape(self.shape)
+        self._flat = self.table.ravel()
+
+    def cells(self, observations):
+        # Flat table index of every observation
+        obs = np.asarray(observations, dtype=float)
+        index = [np.digitize(feature, edges) for feature, edges in zip(_lookup_features(obs), self.bins)]
+        return np.ravel_multi_index(index, self.shape)
+
+    @classmethod
+    def distill(cls, policy, observations, bins=LOOKUP_BINS):
+        # Build a table from another batch policy: each cell takes the action
+        # the policy chose most often for the sample observations in it.
+        # Cells no sample reached keep the "do nothing" action.
+        table = cls(np.zeros(int(np.prod([len(edges) + 1 for edges in bins]))), bins)
+        cells = table.cells(observations)
+        codes = np.packbits(policy.act_batch(observations), axis=1, bitorder="little")[:, 0]
+        votes = np.bincount(cells * 16 + codes, minlength=table._flat.size * 16)
+        votes = votes.reshape(-1, 16)
+        seen = votes.any(axis=1)
+        table._flat[seen] = votes[seen].argmax(axis=1)
+        return table
+
+    def act_batch(self, observations):
+        codes = self._flat[self.cells(observations)]
+        return np.unpackbits(codes[:, None], axis=1, count=ACTION_SIZE, bitorder="little").astype(bool)
@@ -0,0 +1,176 @@
+import argparse
+import struct
+import sys
+import time
+from collections import namedtuple
+
+from badminton_game import FrameInput, MatchSimulator, GAME_OVER
+
+# Frame-exact replays. A match is fully determined by its seed, its rules and
+# the human player's key state on every simulation step, so that is all a
+# replay stores. File layout (little endian):
+#
+#   header   "BMRP", version u16, flags u16, seed u64, winning score u16,
+#            frame count u32; flags bits 8-15 hold the number of extra
+#            shuttlecocks in a drill
+#   inputs   run-length encoded key state: (key bits u8, run length varint)
+#            pairs, bits = LEFT, RIGHT, UP, SPACE, R from the lowest bit up
+#   trailer  final player score u16, final computer score u16
+#
+# Adaptive difficulty's state is not stored: it is rebuilt by playing from
+# the first frame, with whatever difficulty_calibration.json is installed,
+# so a replay of an adaptive match only holds with the calibration it was
+# recorded with.
+
+MAGIC = b"BMRP"
+VERSION = 1
+FLAG_LANDING_TABLE = 1  # Computer AI used the trajectory landing table
+FLAG_DOUBLES = 2  # Two players a side
+FLAG_HARD = 4  # Lookahead computer AI (difficulty "hard")
+FLAG_ADAPTIVE = 8  # Lookahead AI retuned between points (difficulty "adaptive")
+_SHUTTLES_SHIFT = 8
+_HEADER = struct.Struct("<4sHHQHI")
+_TRAILER = struct.Struct("<HH")
+
+Replay = namedtuple("Replay", "seed winning_score flags frames runs player_score computer_score")
+
+
+def encode_input(inputs):
+    return (inputs.left | inputs.right << 1 | inputs.jump << 2 |
+            inputs.swing << 3 | inputs.restart << 4)
+
+
+def decode_input(bits):
+    return FrameInput(bool(bits & 1), bool(bits & 2), bool(bits & 4), bool(bits & 8), bool(bits & 16))
+
+
+class ReplayRecorder:
+    def __init__(self, sim):
+        self.sim = sim
+        if len(sim.shuttles) > 256:
+            raise ValueError("replays support at most 256 shuttlecocks")
+        self.seed = sim.seed
+        self.winning_score = sim.winning_score
+        self.frames = 0
+        self.runs = []  # [key bits, run length]
+    
+    def record(self, inputs):
+        # Call once per simulation step with the inputs that step received
+        bits = encode_input(inputs)
+        if self.runs and self.runs[-1][0] == bits:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([bits, 1])
+        self.frames += 1
+    
+    @property
+    def flags(self):
+        # Read from the simulator when saving: the client attaches the
+        # landing table only once play starts
+        sim = self.sim
+        flags = FLAG_LANDING_TABLE if sim.predictor is not None else 0
+        if sim.doubles:
+            flags |= FLAG_DOUBLES
+        if sim.difficulty == "hard":
+            flags |= FLAG_HARD
+        elif sim.difficulty == "adaptive":
+            flags |= FLAG_ADAPTIVE
+        return flags | (len(sim.shuttles) - 1) << _SHUTTLES_SHIFT
+    
+    def to_bytes(self):
+        out = bytearray(_HEADER.pack(MAGIC, VERSION, self.flags, self.seed,
+                                     self.winning_score, self.frames))
+        for bits, length in self.runs:
+            out.append(bits)
+            # Unsigned LEB128 varint
+            while True:
+                byte = length & 0x7F
+                length >>= 7
+                if length:
+                    out.append(byte | 0x80)
+                else:
+                    out.append(byte)
+                    break
+        out += _TRAILER.pack(self.sim.player_score, self.sim.computer_score)
+        return bytes(out)
+    
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+
+def parse_replay(data):
+    magic, version, flags, seed, winning_score, frames = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a badminton replay file")
+    if version != VERSION:
+        raise ValueError(f"unsupported replay version {version}")
+    
+    runs = []
+    pos = _HEADER.size
+    end = len(data) - _TRAILER.size
+    while pos < end:
+        bits = data[pos]
+        pos += 1
+        length = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        runs.append((bits, length))
+    player_score, computer_score = _TRAILER.unpack_from(data, end)
+    return Replay(seed, winning_score, flags, frames, runs, player_score, computer_score)
+
+
+def load_replay(path):
+    with open(path, "rb") as f:
+        return parse_replay(f.read())
+
+
+# Re-run a replay headlessly and return the simulator in its final state
+def simulate_replay(replay):
+    predictor = None
+    if replay.flags & FLAG_LANDING_TABLE:
+        from trajectory import get_landing_table
+        predictor = get_landing_table()
+    difficulty = "normal"
+    if replay.flags & FLAG_HARD:
+        difficulty = "hard"
+    elif replay.flags & FLAG_ADAPTIVE:
+        difficulty = "adaptive"
+    sim = MatchSimulator(replay.winning_score, predictor=predictor, seed=replay.seed,
+                         doubles=bool(replay.flags & FLAG_DOUBLES), difficulty=difficulty,
+                         shuttles=(replay.flags >> _SHUTTLES_SHIFT) + 1)
+    step = sim.step
+    for bits, length in replay.runs:
+        inputs = decode_input(bits)
+        for _ in range(length):
+            step(inputs)
+    return sim
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-simulate a recorded badminton match")
+    parser.add_argument("replay", help="replay file written with badminton_game.py --record")
+    args = parser.parse_args(argv)
+    
+    replay = load_replay(args.replay)
+    start = time.perf_counter()
+    sim = simulate_replay(replay)
+    elapsed = time.perf_counter() - start
+    
+    match = (sim.player_score, sim.computer_score) == (replay.player_score, replay.computer_score)
+    print(f"{replay.frames} frames re-simulated in {elapsed:.3f}s "
+          f"({replay.frames / 60 / max(elapsed, 1e-9):.0f}x real time)")
+    print(f"Recorded score: Player {replay.player_score} - {replay.computer_score} Computer")
+    print(f"Replayed score: Player {sim.player_score} - {sim.computer_score} Computer"
+          f"{'' if sim.game_state != GAME_OVER else ' (game over)'}")
+    print("Replay matches" if match else "Replay DIVERGED")
+    return 0 if match else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import math
+import time
+
+from badminton_game import (
+    RuleBasedController, FrameInput, GameRNG, Shuttlecock,
+    NET_X, COURT_LEFT, COURT_RIGHT, FLOOR_Y, PLAYER_WIDTH, PLAYER_HEIGHT, PLAYER_SPEED, HIT_REACH,
+)
+
+# "Hard" computer opponent. Instead of threshold rules it plans each return:
+# the incoming flight is stepped forward with the real shuttlecock physics,
+# every frame of it the player could get its racket to is a candidate hitting
+# point, and for each of those a set of aim targets is tried. A shot is
+# scored on how far out of the opponent's reach it lands - the frames the
+# opponent would need to get there minus the frames the shuttlecock takes.
+# The best (frame, aim) pair decides where to stand and when to swing, and
+# the swing carries the aim (FrameInput.aim) so the shot goes where planned.
+#
+# Planning is anytime: candidates are tried coarse to fine and the search
+# stops after max_evaluations shots or when the time budget runs out,
+# keeping the best shot found. Shot outcomes are cached across frames (the
+# incoming flight is the same from one frame to the next), so after the first
+# frame of a rally most evaluations are dictionary lookups.
+#
+# With a time budget the plan depends on how fast the machine is, so a match
+# only replays exactly with budget=None (the evaluation cap alone).
+
+HARD_AI_BUDGET = 0.002  # Seconds of planning per frame
+HARD_AI_EVALUATIONS = 512  # Shots evaluated per frame at most
+SHOT_CACHE_SIZE = 8192  # Evaluated shots kept between frames
+PLAN_HORIZON = 120  # Frames of incoming flight considered
+MAX_HIT_FRAMES = 16  # Candidate hitting frames per plan, spread over the reachable ones
+MAX_FLIGHT_FRAMES = 600
+BATCH_MIN_SHOTS = 16  # Cache misses worth one predict_many() call instead of predict() each
+OPPONENT_SPEED = PLAYER_SPEED  # Assumed speed of the other side
+
+# Aim targets on the opponent's half (in the controller's frame, where the
+# opponent is on the left), ordered so that every prefix covers the half
+# evenly: the anytime search tries the first few everywhere before refining
+_AIM_COUNT = 16
+_AIMS = [COURT_LEFT + (NET_X - 20 - COURT_LEFT) * i / (_AIM_COUNT - 1) for i in range(_AIM_COUNT)]
+_AIM_ORDER = [0, 15, 8, 4, 12, 2, 6, 10, 14, 1, 3, 5, 7, 9, 11, 13]
+AIM_PASSES = ([_AIMS[i] for i in _AIM_ORDER[:4]], [_AIMS[i] for i in _AIM_ORDER[4:9]],
+              [_AIMS[i] for i in _AIM_ORDER[9:]])
+
+# Bounds of the player's x in the controller's frame (both sides mirror to these)
+_MIN_X = NET_X + 10
+_MAX_X = COURT_RIGHT - PLAYER_WIDTH
+_GROUND_Y = FLOOR_Y - PLAYER_HEIGHT
+_LANDED_Y = FLOOR_Y - Shuttlecock(GameRNG(0)).radius  # Shuttlecock.update() reports a landing from here
+_LOST = -1000.0  # Score of a shot that lands back on our side
+_NO_FLIGHT = (math.nan,) * 4  # Snapshot's flight state when none is cached
+
+
+def _mirror(side, x, vx):
+    # Controller frame <-> court coordinates (the same map both ways)
+    if side > 0:
+        return x, vx
+    return 2 * NET_X - x, -vx
+
+
+def _hit_speed(side, own_y, on_ground, power=10):
+    # Vertical speed Shuttlecock.hit() gives a shot (smashes hit harder)
+    if side > 0:
+        return -power * 1.2 if own_y < FLOOR_Y - PLAYER_HEIGHT - 20 else -power
+    return -power if on_ground else -power * 1.3
+
+
+class LookaheadController(RuleBasedController):
+    # Falls back to the rule-based AI (and its jump logic) whenever there is
+    # no return to plan, e.g. while the shuttlecock flies away from it
+    def __init__(self, predictor=None, rng=None, budget=HARD_AI_BUDGET,
+                 max_evaluations=HARD_AI_EVALUATIONS):
+        super().__init__(predictor, rng if rng is not None else GameRNG())
+        self.budget = budget
+        self.max_evaluations = max_evaluations
+        self._shots = {}  # (x, y, vx, vy) of a hit -> (landing x, frames)
+        self._shots_predictor = predictor
+        self._flight = []  # Incoming flight in court coordinates, [0] is the current state
+        # Skill knobs (see adaptive.py): swing_window (from RuleBasedController)
+        # is how close the racket must get to a point of the flight for it to
+        # count as a place to hit, misjudge how far off (px per second ahead)
+        # the controller reads where the shuttlecock is going
+        self.misjudge = 0
+        self._drift = 0.0  # Misread of the incoming flight's x speed, px per frame
+        self._scratch = Shuttlecock(GameRNG(0))
+        # Snapshots keep the incoming flight's first state (the rest follows
+        # from it) and the misread: whether the next frame re-rolls it
+        # depends on both
+        self.state_record += "ddddd"
+        # Statistics
+        self.plans = 0
+        self.evaluations = 0
+        self.cache_hits = 0
+        self.cutoffs = 0
+        self.planning_time = 0.0
+        self.max_planning_time = 0.0
+
+    def reset(self):
+        self._flight = []
+
+    def get_state(self):
+        head = self._flight[0] if self._flight else _NO_FLIGHT
+        return super().get_state() + head + (self._drift,)
+
+    def set_state(self, values):
+        super().set_state(values)
+        head = tuple(values[-5:-1])
+        self._flight = [] if head[0] != head[0] else [head] + self._fly(head, PLAN_HORIZON - 1)
+        self._drift = values[-1]
+
+    def _fly(self, state, frames, deadline=None):
+        # States of an untouched shuttlecock from `state` on, stopping at the
+        # floor; None if the deadline passes first
+        shuttle = self._scratch
+        shuttle.x, shuttle.y, shuttle.vx, shuttle.vy = state
+        states = []
+        for _ in range(frames):
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            landed = shuttle.update()
+            states.append((shuttle.x, shuttle.y, shuttle.vx, shuttle.vy))
+            if landed:
+                break
+        return states
+
+    def _incoming(self, state):
+        # The cached flight moves on by one frame when the shuttlecock was
+        # left alone; anything else (a hit, a new serve) starts it again
+        flight = self._flight
+        if len(flight) > 1 and flight[1] == state:
+            del flight[0]
+            last = flight[-1]
+            if len(flight) < PLAN_HORIZON and last[1] + self._scratch.radius < FLOOR_Y:
+                flight += self._fly(last, 1)
+        elif not flight or flight[0] != state:
+            flight[:] = [state] + self._fly(state, PLAN_HORIZON - 1)
+            if self.misjudge:
+                self._drift = self.rng.randint(-self.misjudge, self.misjudge) / 60
+        return flight
+
+    def _shots_for(self, keys, deadline):
+        # Landing x and flight time, in court coordinates, for each shot
+        # (x, y, vx, vy) in keys. Cache misses are looked up in the landing
+        # table (many at once in one vectorized call), or flown one by one
+        # without a table; the list may come back short when the deadline
+        # passes, even part way through a flight or a batch.
+        cache = self._shots
+        if self.predictor is not self._shots_predictor or len(cache) > SHOT_CACHE_SIZE:
+            # Dropped wholesale; the current flight's shots come straight back
+            cache.clear()
+            self._shots_predictor = self.predictor
+        missing = [key for key in keys if key not in cache]
+        self.cache_hits += len(keys) - len(missing)
+        if len(missing) >= BATCH_MIN_SHOTS and self.predictor is not None:
+            landing_x, frames = self.predictor.predict_many(*zip(*missing), deadline=deadline)
+            cache.update(zip(missing, zip(landing_x.tolist(), frames.tolist())))
+        elif missing and self.predictor is not None:
+            for key in missing:
+                if deadline is not None and time.perf_counter() > deadline:
+                    break
+                cache[key] = self.predictor.predict(*key)
+        elif missing:
+            for key in missing:
+                states = self._fly(key, MAX_FLIGHT_FRAMES, deadline)
+                if states is None:
+                    break
+                cache[key] = (states[-1][0], len(states))
+        outcomes = list(map(cache.get, keys))
+        if None in outcomes:
+            del outcomes[outcomes.index(None):]
+        return outcomes
+
+    def plan(self, observation):
+        # Best (score, frames until the swing, aim, x of the hitting point)
+        # in the controller's frame, or None if no return can be made
+        (side, own_x, own_y, on_ground, swing_cooldown, _, speed,
+         opponent_x, _, shuttle_x, shuttle_y, shuttle_vx, shuttle_vy) = observation
+        started = time.perf_counter()
+        deadline = started + self.budget if self.budget is not None else None
+        real_x, real_vx = _mirror(side, shuttle_x, shuttle_vx)
+        flight = self._incoming((real_x, shuttle_y, real_vx, shuttle_vy))
+
+        # Frames at which the racket can meet the shuttlecock on our side:
+        # (frame, x in our frame, y, x in court coordinates, hit vy). The
+        # state it lands in is scored before anyone can swing at it. With
+        # misjudge the x it expects is off, the more so the further ahead.
+        candidates = []
+        window = self.swing_window
+        drift = self._drift
+        for t, (hit_x, y, _, _) in enumerate(flight):
+            x, _ = _mirror(side, hit_x + drift * t, 0)
+            if t < swing_cooldown or x <= NET_X or y >= _LANDED_Y:
+                continue
+            body_y = own_y if t == 0 else _GROUND_Y
+            if abs(y - (body_y + PLAYER_HEIGHT / 2)) >= window:
+                continue
+            reach = speed * (t + 1)
+            lo = max(_MIN_X, own_x - reach)
+            hi = min(_MAX_X, own_x + reach)
+            if lo - window < x < hi + window:
+                candidates.append((t, x, y, hit_x, _hit_speed(side, body_y, on_ground or t > 0)))
+        if not candidates:
+            return None
+        if len(candidates) > MAX_HIT_FRAMES:
+            step = len(candidates) / MAX_HIT_FRAMES
+            candidates = [candidates[int(i * step)] for i in range(MAX_HIT_FRAMES)]
+
+        # Scoring happens in court coordinates, where the opponent's half is
+        # the side of the net `toward` points away from
+        toward = 1.0 if side > 0 else -1.0
+        opponent_racket, _ = _mirror(side, opponent_x + PLAYER_WIDTH, 0)
+        best = None
+        evaluations = 0
+        for aims in AIM_PASSES:
+            # One pass: these aims from every candidate hitting point
+            real_aims = [_mirror(side, aim, 0)[0] for aim in aims]
+            keys = [(hit_x, y, (real_aim - hit_x) * 0.05, vy)
+                    for _, _, y, hit_x, vy in candidates for real_aim in real_aims]
+            del keys[self.max_evaluations - evaluations:]
+            outcomes = self._shots_for(keys, deadline)
+            evaluations += len(outcomes)
+            per_candidate = len(aims)
+            for i, (landing_x, frames) in enumerate(outcomes):
+                if (landing_x - NET_X) * toward >= 0:
+                    score = _LOST
+                else:
+                    chase = abs(landing_x - opponent_racket) - HIT_REACH
+                    score = (chase if chase > 0 else 0.0) / OPPONENT_SPEED - frames
+                if best is None or score > best[0]:
+                    t, x = candidates[i // per_candidate][:2]
+                    best = (score, t, aims[i % per_candidate], x)
+                elif score == best[0] and candidates[i // per_candidate][0] < best[1]:
+                    # Ties go to the earlier swing
+                    t, x = candidates[i // per_candidate][:2]
+                    best = (score, t, aims[i % per_candidate], x)
+            if evaluations >= self.max_evaluations or (
+                    deadline is not None and time.perf_counter() > deadline):
+                if len(outcomes) < len(keys) or aims is not AIM_PASSES[-1]:
+                    self.cutoffs += 1
+                break
+
+        elapsed = time.perf_counter() - started
+        self.plans += 1
+        self.evaluations += evaluations
+        self.planning_time += elapsed
+        self.max_planning_time = max(self.max_planning_time, elapsed)
+        return best
+
+    def act(self, observation):
+        best = self.plan(observation)
+        if best is None or best[0] == _LOST:
+            # The rule-based AI with this controller's jitter and swing window
+            return super().act(observation)
+        _, t, aim, hit_x = best
+        own_x, speed = observation[1], observation[6]
+        # Stand so the racket (the net-side edge, own_x here) meets the shuttlecock
+        gap = hit_x - own_x
+        move_left = gap < -speed / 2
+        move_right = gap > speed / 2
+        return FrameInput(move_left, move_right, False, t == 0, aim=aim)
@@ -0,0 +1,161 @@
+import numpy as np
+
+from badminton_game import (
+    GRAVITY, AIR_RESISTANCE, SHUTTLE_RADIUS, NET_X, NET_WIDTH, NET_RECT,
+    WIDTH, FLOOR_Y, Shuttlecock,
+)
+
+# Vectorized shuttlecock physics: the same per-frame integration, net and wall
+# response and floor test as Shuttlecock.update(), applied to N shuttles at once.
+# Used for Monte Carlo rally sweeps where the scalar class is far too slow.
+
+# Net collision bounds, expressed for the shuttle's rect.x / rect.y
+_NET_LEFT = NET_RECT.left
+_NET_RIGHT = NET_RECT.right
+_NET_TOP = NET_RECT.top
+_NET_BOTTOM = NET_RECT.bottom
+_SIZE = SHUTTLE_RADIUS * 2
+
+
+def _rect_coord(value):
+    # pygame.Rect stores float coordinates rounded half away from zero
+    return np.trunc(value + np.copysign(0.5, value))
+
+
+class ShuttleBatch:
+    def __init__(self, n):
+        self.x = np.zeros(n)
+        self.y = np.zeros(n)
+        self.vx = np.zeros(n)
+        self.vy = np.zeros(n)
+        self.net_hits = np.zeros(n, dtype=int)  # Net bounces so far, as Shuttlecock.net_hits
+        self.radius = SHUTTLE_RADIUS
+    
+    @classmethod
+    def from_arrays(cls, x, y, vx, vy):
+        batch = cls(len(x))
+        batch.x[:] = x
+        batch.y[:] = y
+        batch.vx[:] = vx
+        batch.vy[:] = vy
+        return batch
+    
+    @classmethod
+    def from_shuttles(cls, shuttles):
+        return cls.from_arrays([s.x for s in shuttles], [s.y for s in shuttles],
+                               [s.vx for s in shuttles], [s.vy for s in shuttles])
+    
+    def __len__(self):
+        return len(self.x)
+    
+    def step(self, active=None):
+        # Advance every shuttle (or only those where `active` is True) by one
+        # frame and return the boolean hit-floor mask
+        x, y, vx, vy, net_hits = self.x, self.y, self.vx, self.vy, self.net_hits
+        if active is not None:
+            x, y, vx, vy, net_hits = x[active], y[active], vx[active], vy[active], net_hits[active]
+        
+        # Apply physics
+        vy += GRAVITY
+        vx *= AIR_RESISTANCE
+        vy *= AIR_RESISTANCE
+        
+        # Update position
+        x += vx
+        y += vy
+        
+        # Check for net collision against the shuttle's integer rect
+        rect_x = _rect_coord(x - self.radius)
+        rect_y = _rect_coord(y - self.radius)
+        net = ((rect_x < _NET_RIGHT) & (rect_x + _SIZE > _NET_LEFT) &
+               (rect_y < _NET_BOTTOM) & (rect_y + _SIZE > _NET_TOP))
+        if net.any():
+            # Bounce off net with reduced velocity
+            x[net] = np.where(x[net] < NET_X,
+                              NET_X - NET_WIDTH // 2 - self.radius,
+                              NET_X + NET_WIDTH // 2 + self.radius)
+            vx[net] = -vx[net] * 0.5
+            vy[net] *= 0.8
+            net_hits += net
+        
+        # Check for wall collisions
+        left = x - self.radius < 0
+        right = ~left & (x + self.radius > WIDTH)
+        if left.any():
+            x[left] = self.radius
+            vx[left] = -vx[left] * 0.8
+        if right.any():
+            x[right] = WIDTH - self.radius
+            vx[right] = -vx[right] * 0.8
+        
+        hit_floor = y + self.radius >= FLOOR_Y
+        if active is None:
+            return hit_floor
+        
+        self.x[active] = x
+        self.y[active] = y
+        self.vx[active] = vx
+        self.vy[active] = vy
+        self.net_hits[active] = net_hits
+        mask = np.zeros(len(self.x), dtype=bool)
+        mask[active] = hit_floor
+        return mask
+    
+    def run_to_floor(self, max_frames=600):
+        # Step until every shuttle has landed; returns the landing x and the
+        # number of frames each shuttle took (max_frames if it never landed).
+        # Shuttles still in the air are kept packed in a separate batch, so
+        # each frame works on contiguous arrays instead of gathering and
+        # scattering through a mask, and landed shuttles drop out of it.
+        frames = np.full(len(self.x), max_frames)
+        index = np.arange(len(self.x))
+        flying = ShuttleBatch.from_arrays(self.x, self.y, self.vx, self.vy)
+        flying.net_hits[:] = self.net_hits
+        for frame in range(1, max_frames + 1):
+            landed = flying.step()
+            if landed.any():
+                done = index[landed]
+                frames[done] = frame
+                for name in ("x", "y", "vx", "vy", "net_hits"):
+                    values = getattr(flying, name)
+                    getattr(self, name)[done] = values[landed]
+                    setattr(flying, name, values[~landed])
+                index = index[~landed]
+                if not len(index):
+                    break
+        for name in ("x", "y", "vx", "vy", "net_hits"):
+            getattr(self, name)[index] = getattr(flying, name)
+        return self.x.copy(), frames
+
+
+# Parity check against the scalar engine: steps random shuttles through both
+# implementations and reports the largest difference in position or velocity
+def check_parity(n=512, frames=240, seed=0):
+    rng = np.random.default_rng(seed)
+    shuttles = []
+    for _ in range(n):
+        shuttle = Shuttlecock()
+        shuttle.x = rng.uniform(0, WIDTH)
+        shuttle.y = rng.uniform(0, FLOOR_Y - SHUTTLE_RADIUS)
+        shuttle.vx = rng.uniform(-25, 25)
+        shuttle.vy = rng.uniform(-20, 10)
+        shuttles.append(shuttle)
+    batch = ShuttleBatch.from_shuttles(shuttles)
+    
+    worst = 0.0
+    for _ in range(frames):
+        floor = batch.step()
+        scalar_floor = [s.update() for s in shuttles]
+        if (not np.array_equal(floor, scalar_floor) or
+                not np.array_equal(batch.net_hits, [s.net_hits for s in shuttles])):
+            return float("inf")
+        for name in ("x", "y", "vx", "vy"):
+            expected = np.array([getattr(s, name) for s in shuttles])
+            worst = max(worst, float(np.max(np.abs(getattr(batch, name) - expected))))
+    return worst
+
+
+if __name__ == "__main__":
+    error = check_parity()
+    print(f"ShuttleBatch vs Shuttlecock max difference: {error}")
+    raise SystemExit(0 if error == 0.0 else 1)
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from badminton_game import MatchSimulator, GameRNG, GAME_OVER, COMPUTER_SPEED, winning_score
+
+# Headless AI-vs-AI tournaments. Both sides are driven by the built-in AI and
+# matches are played to winning_score in shards across a process pool. Each
+# shard gets its own seed from the master seed, so results are reproducible
+# whatever the number of workers. Shard results stream back as they finish
+# and are merged into one win-rate and rally-length report per setting.
+
+SHARD_SIZE = 50  # Matches per task handed to a worker
+MAX_FRAMES = 200000  # Safety net for a match that never ends
+
+
+def _init_worker(use_table):
+    # Build the landing table once per worker process rather than per match
+    if use_table:
+        from trajectory import get_landing_table
+        get_landing_table()
+
+
+def play_shard(shard_seed, matches, computer_speed, target_score, use_table):
+    predictor = None
+    if use_table:
+        from trajectory import get_landing_table
+        predictor = get_landing_table()
+    
+    seeds = GameRNG(shard_seed)
+    result = {"matches": 0, "left_wins": 0, "right_wins": 0, "unfinished": 0,
+              "frames": 0, "rallies": Counter()}
+    for _ in range(matches):
+        sim = MatchSimulator(target_score, predictor=predictor, seed=seeds.next64(), player_ai=True)
+        sim.computer.speed = computer_speed
+        step = sim.step
+        rallies = result["rallies"]
+        while sim.game_state != GAME_OVER and sim.frame < MAX_FRAMES:
+            for event in step():
+                if event.kind == "point":
+                    rallies[sim.rally_count] += 1
+        
+        result["matches"] += 1
+        result["frames"] += sim.frame
+        if sim.game_state != GAME_OVER:
+            result["unfinished"] += 1
+        elif sim.player_score > sim.computer_score:
+            result["left_wins"] += 1
+        else:
+            result["right_wins"] += 1
+    return result
+
+
+def merge(total, part):
+    for key, value in part.items():
+        if key == "rallies":
+            total[key].update(value)
+        else:
+            total[key] += value
+
+
+# Rally length at the given fraction of all points, read off the histogram
+def rally_percentile(rallies, fraction):
+    points = sum(rallies.values())
+    seen = 0
+    for length, count in sorted(rallies.items()):
+        seen += count
+        if seen > points * fraction:
+            return length
+    return 0
+
+
+def summarize(total):
+    rallies = total["rallies"]
+    points = sum(rallies.values())
+    decided = max(1, total["left_wins"] + total["right_wins"])
+    return {
+        "matches": total["matches"],
+        "right_win_rate": total["right_wins"] / decided,
+        "left_win_rate": total["left_wins"] / decided,
+        "unfinished": total["unfinished"],
+        "points": points,
+        "mean_rally": sum(length * count for length, count in rallies.items()) / max(1, points),
+        "median_rally": rally_percentile(rallies, 0.5),
+        "p90_rally": rally_percentile(rallies, 0.9),
+        "longest_rally": max(rallies, default=0),
+        "mean_frames_per_match": total["frames"] / max(1, total["matches"]),
+        "rally_histogram": {str(length): count for length, count in sorted(rallies.items())},
+    }
+
+
+def run_tournament(matches, speeds, workers=None, seed=0, target_score=winning_score,
+                   use_table=True, shard_size=SHARD_SIZE, progress=None):
+    totals = {speed: {"matches": 0, "left_wins": 0, "right_wins": 0, "unfinished": 0,
+                      "frames": 0, "rallies": Counter()} for speed in speeds}
+    master = GameRNG(seed)
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(use_table,)) as pool:
+        futures = {}
+        for speed in speeds:
+            remaining = matches
+            while remaining > 0:
+                count = min(shard_size, remaining)
+                remaining -= count
+                future = pool.submit(play_shard, master.next64(), count, speed, target_score, use_table)
+                futures[future] = speed
+        
+        for future in as_completed(futures):
+            speed = futures[future]
+            merge(totals[speed], future.result())
+            if progress is not None:
+                progress(speed, totals[speed])
+    
+    return {speed: summarize(total) for speed, total in totals.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run headless AI-vs-AI badminton matches")
+    parser.add_argument("--matches", type=int, default=1000, help="matches per setting (default %(default)s)")
+    parser.add_argument("--speeds", default=str(COMPUTER_SPEED),
+                        help="comma-separated right-side AI speeds to sweep (default %(default)s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--seed", type=int, default=0, help="master seed (default %(default)s)")
+    parser.add_argument("--winning-score", type=int, default=winning_score)
+    parser.add_argument("--no-landing-table", action="store_true",
+                        help="use the AI's simple landing estimate instead of the trajectory table")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+    
+    speeds = [float(value) for value in args.speeds.split(",")]
+    start = time.perf_counter()
+    
+    def progress(speed, total):
+        print(f"\rspeed {speed:g}: {total['matches']}/{args.matches} matches", end="", file=sys.stderr)
+    
+    report = run_tournament(args.matches, speeds, args.workers, args.seed, args.winning_score,
+                            not args.no_landing_table, progress=progress)
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    
+    print(f"{len(speeds) * args.matches} matches in {elapsed:.1f}s on {args.workers} workers")
+    print(f"{'speed':>6} {'right win':>10} {'mean rally':>11} {'median':>7} {'p90':>5} {'longest':>8} {'frames/match':>13}")
+    for speed, summary in report.items():
+        print(f"{speed:>6g} {summary['right_win_rate']:>10.1%} {summary['mean_rally']:>11.2f} "
+              f"{summary['median_rally']:>7} {summary['p90_rally']:>5} {summary['longest_rally']:>8} "
+              f"{summary['mean_frames_per_match']:>13.0f}")
+    
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"seed": args.seed, "elapsed": elapsed,
+                       "settings": {f"{speed:g}": summary for speed, summary in report.items()}}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+import time
+
+import numpy as np
+
+from badminton_game import WIDTH, FLOOR_Y, NET_X, NET_RECT, SHUTTLE_RADIUS, Shuttlecock
+from shuttle_batch import ShuttleBatch
+
+# Landing prediction for the shuttlecock. The flight follows the discrete
+# GRAVITY / AIR_RESISTANCE recurrence in Shuttlecock.update(), including net
+# and wall bounces, so there is no closed form once collisions are involved.
+# LandingTable precomputes the landing x and frame count over a grid of
+# (x, y, vx, vy) states with ShuttleBatch and interpolates between grid
+# points, making a prediction O(1) no matter how long the flight is.
+#
+# Interpolation only holds where the landing varies smoothly. Across a net
+# bounce it jumps: one corner of a grid cell clears the net and lands deep
+# on the far side, the next one hits it and drops at its foot, and a blend
+# of the two lands nowhere near either, and a wall bounce close to the
+# floor bends the landing too sharply to blend. Cells near the net or
+# touching it, and cells whose centre the blend misses, are flown exactly
+# instead, which is about 40% of the states a rally produces; elsewhere a
+# prediction is within a few pixels (check_accuracy() bounds the worst).
+
+# Default grid - covers every state a rally produces and builds in about a
+# second
+X_AXIS = (0, WIDTH, 21)
+Y_AXIS = (-150, FLOOR_Y, 17)
+VX_AXIS = (-30, 30, 21)
+VY_AXIS = (-25, 25, 21)
+MAX_FRAMES = 600
+CELL_TOLERANCE = 4  # Largest miss (px) at a cell's centre before it is flown exactly
+MAX_ERROR = 64  # Largest miss (px) check_accuracy() accepts anywhere in the grid
+
+
+# Reference prediction: steps a real Shuttlecock until it hits the floor
+def simulate_landing(x, y, vx, vy, max_frames=MAX_FRAMES):
+    shuttle = Shuttlecock()
+    shuttle.x, shuttle.y, shuttle.vx, shuttle.vy = x, y, vx, vy
+    for frame in range(1, max_frames + 1):
+        if shuttle.update():
+            return shuttle.x, frame
+    return shuttle.x, max_frames
+
+
+class LandingTable:
+    def __init__(self, x_axis=X_AXIS, y_axis=Y_AXIS, vx_axis=VX_AXIS, vy_axis=VY_AXIS,
+                 max_frames=MAX_FRAMES):
+        self.max_frames = max_frames
+        axes = [np.linspace(lo, hi, n) for lo, hi, n in (x_axis, y_axis, vx_axis, vy_axis)]
+        self.axes = axes
+        self.shape = tuple(len(axis) for axis in axes)
+        
+        # Fly every grid state to the floor in one batch
+        grid = np.meshgrid(*axes, indexing="ij")
+        batch = ShuttleBatch.from_arrays(*(g.ravel() for g in grid))
+        landing_x, frames = batch.run_to_floor(max_frames)
+        self.landing_x = landing_x.reshape(self.shape)
+        self.frames = frames.reshape(self.shape).astype(float)
+        
+        # Cells (indexed by their lowest corner) that are flown exactly: the
+        # shuttle can reach the net within a frame from inside the cell (a
+        # corner can skip past the net that the states between them hit), a
+        # corner touches the net (a shuttle can hit it twice between two
+        # corners that hit it once), the corners land on both sides of the
+        # net, or the cell's centre lands more than CELL_TOLERANCE from the
+        # blend of its corners, which catches wall bounces near the floor
+        cells = tuple(slice(0, size - 1) for size in self.shape)
+        corners = [tuple(slice(corner >> bit & 1, size - 1 + (corner >> bit & 1))
+                         for bit, size in enumerate(self.shape)) for corner in range(16)]
+        net_hits = batch.net_hits.reshape(self.shape)
+        far_side = self.landing_x > NET_X
+        reach_x = SHUTTLE_RADIUS + max(abs(axes[2][0]), abs(axes[2][-1]))
+        reach_y = SHUTTLE_RADIUS + max(abs(axes[3][0]), abs(axes[3][-1]))
+        near_x = (axes[0][1:] + reach_x > NET_RECT.left) & (axes[0][:-1] - reach_x < NET_RECT.right)
+        near_y = axes[1][1:] + reach_y > NET_RECT.top
+        exact = np.zeros(tuple(size - 1 for size in self.shape), dtype=bool)
+        exact |= (near_x[:, None] & near_y[None, :])[:, :, None, None]
+        blend = np.zeros(exact.shape)
+        for corner in corners:
+            exact |= (net_hits[corner] > 0) | (far_side[corner] != far_side[cells])
+            blend += self.landing_x[corner] / 16
+        check = np.flatnonzero(~exact)
+        centres = np.meshgrid(*((axis[:-1] + axis[1:]) / 2 for axis in axes), indexing="ij")
+        centre_x, _ = ShuttleBatch.from_arrays(*(c.ravel()[check] for c in centres)).run_to_floor(max_frames)
+        exact.flat[check] = np.abs(centre_x - blend.flat[check]) > CELL_TOLERANCE
+        self.exact = np.zeros(self.shape, dtype=bool)
+        self.exact[cells] = exact
+        
+        # Flat lists and strides for the scalar lookup path, which would
+        # spend most of its time boxing NumPy scalars otherwise
+        self._landing_flat = self.landing_x.ravel().tolist()
+        self._frames_flat = self.frames.ravel().tolist()
+        self._lo = [float(axis[0]) for axis in axes]
+        self._step = [float(axis[1] - axis[0]) for axis in axes]
+        self._size = list(self.shape)
+        self._strides = [s // self.landing_x.itemsize for s in self.landing_x.strides]
+        self._landing_array = self.landing_x.ravel()
+        self._frames_array = self.frames.ravel()
+        self._exact_flat = self.exact.ravel().tolist()
+        self._exact_array = self.exact.ravel()
+    
+    def predict(self, x, y, vx, vy):
+        # Interpolated (landing_x, frames) for a single shuttle state; states
+        # outside the grid (a smash faster than VX_AXIS) or in a cell across
+        # a net bounce are simulated
+        base = 0
+        cell = []
+        for value, lo, step, size, stride in zip((x, y, vx, vy), self._lo, self._step,
+                                                 self._size, self._strides):
+            t = (value - lo) / step
+            if not 0 <= t <= size - 1:
+                return simulate_landing(x, y, vx, vy, self.max_frames)
+            index = min(int(t), size - 2)
+            base += index * stride
+            cell.append((t - index, stride))
+        if self._exact_flat[base]:
+            return simulate_landing(x, y, vx, vy, self.max_frames)
+        
+        # Quadrilinear blend of the 16 surrounding grid points
+        landing = frames = 0.0
+        for corner in range(16):
+            weight = 1.0
+            offset = base
+            for bit, (frac, stride) in enumerate(cell):
+                if corner >> bit & 1:
+                    weight *= frac
+                    offset += stride
+                else:
+                    weight *= 1.0 - frac
+            if weight:
+                landing += weight * self._landing_flat[offset]
+                frames += weight * self._frames_flat[offset]
+        return landing, frames
+    
+    def predict_many(self, x, y, vx, vy, deadline=None):
+        # Vectorized predict() for arrays of candidate states. Corners are
+        # gathered from the flattened tables with one take() each, which is
+        # far cheaper than 4-D fancy indexing for small batches. States that
+        # have to be simulated are flown as one ShuttleBatch; with a deadline
+        # (a time.perf_counter() value) they are flown one by one instead and
+        # stop when it passes, and the arrays come back cut short
+        # before the first one left unfinished.
+        base = 0
+        frac = []
+        outside = False
+        for value, lo, step, size, stride in zip((x, y, vx, vy), self._lo, self._step,
+                                                 self._size, self._strides):
+            t = (np.asarray(value, dtype=float) - lo) / step
+            outside = outside | (t < 0) | (t > size - 1)
+            t = np.clip(t, 0, size - 1)
+            i = np.minimum(t.astype(int), size - 2)
+            base = base + i * stride
+            frac.append(t - i)
+        
+        landing = 0.0
+        frames = 0.0
+        for corner in range(16):
+            weight = 1.0
+            offset = 0
+            for bit in range(4):
+                if corner >> bit & 1:
+                    weight = weight * frac[bit]
+                    offset += self._strides[bit]
+                else:
+                    weight = weight * (1.0 - frac[bit])
+            index = base + offset
+            landing = landing + weight * self._landing_array.take(index)
+            frames = frames + weight * self._frames_array.take(index)
+        exact = np.flatnonzero(self._exact_array.take(base) | outside)
+        if len(exact):
+            landing, frames = np.asarray(landing, dtype=float), np.asarray(frames, dtype=float)
+            states = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in (x, y, vx, vy)))
+            if deadline is None:
+                # Flown together; ShuttleBatch lands them exactly where
+                # simulate_landing() would
+                batch = ShuttleBatch.from_arrays(*(state.ravel()[exact] for state in states))
+                landing.flat[exact], frames.flat[exact] = batch.run_to_floor(self.max_frames)
+                return landing, frames
+            for i in exact.tolist():
+                if deadline is not None and time.perf_counter() > deadline:
+                    return landing[:i], frames[:i]
+                landing.flat[i], frames.flat[i] = simulate_landing(
+                    *(float(state.flat[i]) for state in states), self.max_frames)
+        return landing, frames
+
+
+# Shared table, built on first use and reused by every simulator in the process
+_landing_table = None
+
+def get_landing_table():
+    global _landing_table
+    if _landing_table is None:
+        _landing_table = LandingTable()
+    return _landing_table
+
+
+# Accuracy check against the reference: predicts random states inside the
+# grid both ways and returns the largest landing x difference (px)
+def check_accuracy(table=None, n=20000, seed=0):
+    table = table if table is not None else get_landing_table()
+    rng = np.random.default_rng(seed)
+    low = [float(axis[0]) for axis in table.axes]
+    high = [float(axis[-1]) for axis in table.axes]
+    worst = 0.0
+    for state in rng.uniform(low, high, (n, 4)).tolist():
+        landing_x, _ = table.predict(*state)
+        worst = max(worst, abs(landing_x - simulate_landing(*state, table.max_frames)[0]))
+    return worst
+
+
+if __name__ == "__main__":
+    error = check_accuracy()
+    print(f"LandingTable vs simulate_landing max difference: {error:.1f} px")
+    raise SystemExit(0 if error <= MAX_ERROR else 1)